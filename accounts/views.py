@@ -9,7 +9,7 @@ from .forms import UserProfileForm
 @login_required
 def profile(request):
     """User profile page"""
-    user_ratings = Rating.objects.filter(user=request.user).select_related('venue').order_by('-created_at')
+    user_ratings = Rating.objects.filter(user=request.user).select_related('venue__category').order_by('-created_at')
     
     context = {
         'user_ratings': user_ratings,
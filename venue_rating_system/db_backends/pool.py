@@ -0,0 +1,162 @@
+"""
+Bounded, thread-safe connection pool shared by the pooled database backends.
+
+Each worker process keeps one pool per database alias. Django "closes" a
+pooled connection at the end of every request, which hands it back to the
+pool instead of tearing down the server connection.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout"""
+
+
+class PoolStats:
+    """Counters describing pool wait time and connection churn"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.health_check_failures = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'connections_opened': self.connections_opened,
+                'connections_closed': self.connections_closed,
+                'health_check_failures': self.health_check_failures,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': self.wait_seconds_total,
+                'wait_seconds_max': self.wait_seconds_max,
+            }
+
+
+class ConnectionPool:
+    """Hand out at most ``max_size`` connections created by ``connect``.
+
+    Idle connections older than ``max_idle`` seconds are closed instead of
+    reused, and a connection idle for longer than ``health_check_interval``
+    seconds must pass ``check`` before it is handed out again.
+    """
+
+    def __init__(self, connect, check, max_size=10, timeout=10, max_idle=300, health_check_interval=30):
+        self.connect = connect
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.stats = PoolStats()
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.stats.increment('timeouts')
+            raise PoolTimeout(
+                f'No database connection available after {self.timeout}s '
+                f'(pool size {self.max_size})'
+            )
+        self.stats.record_wait(time.perf_counter() - start)
+
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    connection = self.connect()
+                    self.stats.increment('connections_opened')
+                    return connection
+
+                connection, released_at = entry
+                idle_for = time.monotonic() - released_at
+                if idle_for > self.max_idle:
+                    self._discard(connection)
+                    continue
+                if idle_for > self.health_check_interval and not self._healthy(connection):
+                    self.stats.increment('health_check_failures')
+                    self._discard(connection)
+                    continue
+                return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        try:
+            if discard or getattr(connection, 'closed', False):
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _healthy(self, connection):
+        try:
+            return self.check(connection)
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        self.stats.increment('connections_closed')
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Return this process's pool for ``alias``, creating it with ``factory``.
+
+    Pools are keyed by process id so workers forked from a preloaded master
+    never share sockets.
+    """
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = factory()
+    return pool
+
+
+def pool_stats():
+    """Stats of every pool in this process, keyed by database alias"""
+    pid = os.getpid()
+    return {alias: pool.stats.as_dict() for (alias, owner), pool in list(_pools.items()) if owner == pid}
@@ -0,0 +1,53 @@
+"""
+PostgreSQL backend that borrows connections from an in-process pool.
+
+Configure it with ``'ENGINE': 'venue_rating_system.db_backends.postgresql_pool'``
+and an optional ``POOL`` dictionary in the database settings::
+
+    'POOL': {'MAX_SIZE': 10, 'TIMEOUT': 10, 'MAX_IDLE': 300, 'HEALTH_CHECK_INTERVAL': 30}
+
+Keep ``CONN_MAX_AGE`` at 0 so Django returns the connection to the pool at
+the end of each request.
+"""
+
+from django.db.backends.postgresql import base
+
+from ..pool import ConnectionPool, get_pool
+
+
+def _check(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(self.alias, lambda: ConnectionPool(
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            check=_check,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10),
+            max_idle=options.get('MAX_IDLE', 300),
+            health_check_interval=options.get('HEALTH_CHECK_INTERVAL', 30),
+        ))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self._get_pool(conn_params)
+        return self.pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        discard = self.errors_occurred and not self.is_usable()
+        try:
+            # Never hand out a connection with an open transaction
+            if not discard and not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            discard = True
+        self.pool.release(connection, discard=discard)
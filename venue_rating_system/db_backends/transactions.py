@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def write_atomic(using=None, savepoint=True):
+    """``transaction.atomic`` for blocks that write, taking the write lock at BEGIN.
+
+    On the tuned SQLite backend the outermost block starts with ``BEGIN
+    IMMEDIATE``, so a transaction that reads before it writes waits for the
+    lock (up to ``busy_timeout``) instead of failing with "database is
+    locked" when its read lock cannot be upgraded. Read-only ``atomic()``
+    blocks keep a deferred ``BEGIN`` and never queue behind writers. Inside a
+    transaction that is already open, and on other backends, this is a plain
+    ``atomic``.
+    """
+    connection = transaction.get_connection(using)
+    tuned = hasattr(connection, 'begin_immediate')
+    if tuned:
+        connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            if tuned:
+                connection.begin_immediate = False
+            yield
+    finally:
+        if tuned:
+            connection.begin_immediate = False
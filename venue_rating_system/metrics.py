@@ -0,0 +1,227 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .db_backends.pool import pool_stats
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Connection pool stats exported per database alias: key -> (name, type, help)
+POOL_METRICS = {
+    'checkouts': ('db_pool_checkouts_total', 'counter', 'Connections handed out by the pool'),
+    'connections_opened': ('db_pool_connections_opened_total', 'counter', 'Server connections opened'),
+    'connections_closed': ('db_pool_connections_closed_total', 'counter', 'Server connections closed'),
+    'health_check_failures': (
+        'db_pool_health_check_failures_total', 'counter', 'Idle connections that failed their health check'
+    ),
+    'timeouts': ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting for a free connection'),
+    'wait_seconds_total': ('db_pool_wait_seconds_total', 'counter', 'Seconds spent waiting for a free connection'),
+    'wait_seconds_max': ('db_pool_wait_seconds_max', 'gauge', 'Longest wait for a free connection'),
+}
+
+
+class Histogram:
+    """Prometheus-style histogram sharded per thread.
+
+    Each thread writes to its own list of bucket counts, so observing a value
+    never takes a lock; the lock is only held when a thread records its first
+    observation and when shards are merged for export.
+    """
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        counts = shard.get(label_values)
+        if counts is None:
+            # One count per bucket, one for +Inf, then the running sum
+            counts = shard[label_values] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self):
+        """Merged ``{label values: counts}`` over every thread"""
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for label_values, counts in list(shard.items()):
+                total = merged.setdefault(label_values, [0] * len(counts))
+                for position, count in enumerate(counts):
+                    total[position] += count
+        return merged
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, counts in sorted(self.collect().items()):
+            labels = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.labels, label_values))
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {counts[-1]:.6f}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', LATENCY_BUCKETS, ('view', 'method', 'status'),
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries issued per request.', QUERY_COUNT_BUCKETS, ('view',),
+)
+DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS, ('view',),
+)
+TEMPLATE_SECONDS = Histogram(
+    'http_request_template_seconds', 'Time spent rendering templates per request.', LATENCY_BUCKETS, ('view',),
+)
+RESPONSE_BYTES = Histogram(
+    'http_response_size_bytes', 'Size of response bodies; streamed responses are not counted.', SIZE_BUCKETS, ('view',),
+)
+HISTOGRAMS = [REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, TEMPLATE_SECONDS, RESPONSE_BYTES]
+
+
+class RequestTimings(threading.local):
+    """Database and template time of the request running on this thread"""
+
+    def __init__(self):
+        self.active = False
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+timings = RequestTimings()
+
+
+def time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+_template_timing_installed = False
+
+
+def install_template_timing():
+    """Time top-level template renders; nested includes count towards their parent"""
+    global _template_timing_installed
+    if _template_timing_installed:
+        return
+    from django.template.backends.django import Template
+
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        if not timings.active:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timings.template_seconds += time.perf_counter() - started
+
+    Template.render = timed_render
+    _template_timing_installed = True
+
+
+class MetricsMiddleware:
+    """Record latency, query count, DB time, template time and size per view.
+
+    Enabled with ``METRICS_ENABLED``; otherwise Django drops the middleware
+    at startup and requests pay nothing for it.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timing()
+
+    def __call__(self, request):
+        timings.active = True
+        timings.queries = 0
+        timings.db_seconds = 0.0
+        timings.template_seconds = 0.0
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(time_query))
+                response = self.get_response(request)
+        finally:
+            timings.active = False
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_SECONDS.observe(elapsed, view, request.method, str(response.status_code))
+        DB_QUERIES.observe(timings.queries, view)
+        DB_SECONDS.observe(timings.db_seconds, view)
+        TEMPLATE_SECONDS.observe(timings.template_seconds, view)
+        if not response.streaming:
+            RESPONSE_BYTES.observe(len(response.content), view)
+        return response
+
+
+def exposition():
+    """All metrics of this process in the Prometheus text format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.exposition())
+    stats = pool_stats()
+    if stats:
+        for key, (name, kind, help_text) in POOL_METRICS.items():
+            lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+            for alias, values in sorted(stats.items()):
+                lines.append(f'{name}{{alias="{escape(alias)}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, for a bearer token or an admin user"""
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404('Metrics are disabled.')
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized:
+        user = request.user
+        authorized = user.is_authenticated and hasattr(user, 'profile') and user.profile.is_admin
+    if not authorized:
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+from .routers import choose_replica, mark_replica_unhealthy, use_replica, reset_replica
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """Serve read-only views from a replica, with read-your-writes pinning.
+
+    After a user sends a successful write request (rating, profile edit...),
+    a cookie pins their requests to the primary for ``REPLICA_PIN_SECONDS``
+    so they never see a replica that has not caught up with their change.
+
+    A view that fails with an ``OperationalError`` while reading from a
+    replica takes the replica out of rotation and runs again on the primary;
+    only safe methods are routed, so the retry cannot repeat a write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.read_views = set(getattr(settings, 'REPLICA_READ_VIEWS', []))
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+        self.pin_cookie = getattr(settings, 'REPLICA_PIN_COOKIE_NAME', 'primary_pin')
+
+    def __call__(self, request):
+        request.replica_token = None
+        request.replica_alias = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                reset_replica(request.replica_token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                self.pin_cookie,
+                str(int(time.time()) + self.pin_seconds),
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or self.is_pinned(request):
+            return None
+        match = request.resolver_match
+        if match is None or match.view_name not in self.read_views:
+            return None
+        alias = choose_replica()
+        if alias:
+            request.replica_token = use_replica(alias)
+            request.replica_alias = alias
+            request.replica_view = (view_func, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, OperationalError) or request.replica_alias is None:
+            return None
+        alias = request.replica_alias
+        mark_replica_unhealthy(alias)
+        connections[alias].close()
+        reset_replica(request.replica_token)
+        request.replica_token = None
+        request.replica_alias = None
+        view_func, view_args, view_kwargs = request.replica_view
+        return view_func(request, *view_args, **view_kwargs)
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(self.pin_cookie, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,198 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_FILES = {
+    'pstats': ('profile.pstats', 'application/octet-stream'),
+    'collapsed': ('stacks.collapsed.txt', 'text/plain; charset=utf-8'),
+    'sql': ('queries.json', 'application/json'),
+}
+_PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+
+def is_admin(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and hasattr(user, 'profile') and user.profile.is_admin
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'logs', 'profiles'))
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval.
+
+    Only frames called from ``root`` (the profiled request's frame) are kept;
+    samples taken while the thread is outside it are dropped. The result is
+    in the collapsed format (``outer;inner;leaf count``) read by
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, root=None, interval=0.001):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            stack = self.sample()
+            if stack:
+                self.stacks[stack] += 1
+
+    def sample(self):
+        # Other threads' frames are dropped at once rather than kept alive until the next sample
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None and frame is not self.root:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        if self.root is not None and frame is None:
+            return None
+        return ';'.join(reversed(names))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    """Every query of the profiled request with its duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'database': context['connection'].alias,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'sql': sql,
+                'params': repr(params)[:500],
+            })
+
+
+class ProfilingMiddleware:
+    """Profile single requests on demand for admin users.
+
+    An admin adds ``?_profile=1`` or an ``X-Profile: 1`` header to run that
+    request under cProfile and a stack sampler. The pstats file, collapsed
+    stacks and SQL list are stored under ``PROFILE_DIR`` and the response
+    gets an ``X-Profile-Id`` header; ``?_profile=report`` returns a text
+    report instead of the page. Other requests only pay for the flag check.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+        if not mode or not is_admin(request):
+            return self.get_response(request)
+
+        if PROFILE_PARAM in request.GET:
+            # Keep the flag out of pagination and filter links
+            params = request.GET.copy()
+            params.pop(PROFILE_PARAM)
+            params._mutable = False
+            request.GET = params
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), root=sys._getframe())
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            sampler.start()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+                if not response.streaming:
+                    # Render lazy responses while the profiler is still running
+                    response.content
+            finally:
+                profiler.disable()
+                sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        profile_id = self.store(profiler, sampler, recorder, request, elapsed)
+        db_ms = sum(query['duration_ms'] for query in recorder.queries)
+        if mode == 'report':
+            response = HttpResponse(
+                self.report(profiler, recorder, request, elapsed, profile_id),
+                content_type='text/plain; charset=utf-8',
+            )
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Summary'] = (
+            f'total={elapsed * 1000:.1f}ms queries={len(recorder.queries)} db={db_ms:.1f}ms'
+        )
+        return response
+
+    def store(self, profiler, sampler, recorder, request, elapsed):
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        directory = os.path.join(profile_dir(), profile_id)
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, PROFILE_FILES['pstats'][0]))
+        with open(os.path.join(directory, PROFILE_FILES['collapsed'][0]), 'w', encoding='utf-8') as handle:
+            handle.write(sampler.collapsed())
+        with open(os.path.join(directory, PROFILE_FILES['sql'][0]), 'w', encoding='utf-8') as handle:
+            json.dump({
+                'path': request.get_full_path(),
+                'method': request.method,
+                'duration_ms': round(elapsed * 1000, 3),
+                'queries': recorder.queries,
+            }, handle, indent=2)
+        return profile_id
+
+    def report(self, profiler, recorder, request, elapsed, profile_id, limit=40):
+        output = io.StringIO()
+        output.write(f'{request.method} {request.get_full_path()}  {elapsed * 1000:.1f}ms  profile {profile_id}\n\n')
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        output.write(f'\n{len(recorder.queries)} queries\n')
+        for query in recorder.queries:
+            output.write(f'\n[{query["duration_ms"]:.3f}ms {query["database"]}] {query["sql"]}\n')
+        return output.getvalue()
+
+
+def profile_file(request, profile_id, kind):
+    """Download a stored profile file (admin only)"""
+    if not is_admin(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    if kind not in PROFILE_FILES or not _PROFILE_ID.match(profile_id):
+        raise Http404('No such profile.')
+    filename, content_type = PROFILE_FILES[kind]
+    path = os.path.join(profile_dir(), profile_id, filename)
+    if not os.path.exists(path):
+        raise Http404('No such profile.')
+    return FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=kind == 'pstats',
+                        filename=f'{profile_id}-{filename}')
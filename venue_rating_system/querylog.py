@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from hashlib import md5
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('venue_rating_system.querylog')
+
+# Frames from these files say nothing about which of our lines ran the query
+_IGNORED_PATHS = (os.path.dirname(logging.__file__), 'site-packages', os.path.abspath(__file__))
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_SPACE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """SQL with literals and IN-list lengths removed, so repeats of one query compare equal"""
+    shape = _IN_LIST.sub('IN (...)', sql)
+    shape = _NUMBER.sub('N', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def shape_id(shape):
+    return md5(shape.encode('utf-8')).hexdigest()[:12]
+
+
+def python_stack(limit=8):
+    """Innermost project frames as ``path:line in function`` strings"""
+    frames = []
+    frame = sys._getframe(2)
+    base = str(settings.BASE_DIR)
+    while frame is not None and len(frames) < limit:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and not any(part in filename for part in _IGNORED_PATHS):
+            frames.append(f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def template_position():
+    """Name and line of the innermost template node being rendered, if any"""
+    from django.template.base import Node
+
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and node.origin is not None:
+                token = getattr(node, 'token', None)
+                return {
+                    'name': node.origin.template_name or node.origin.name,
+                    'line': token.lineno if token is not None else None,
+                }
+        frame = frame.f_back
+    return None
+
+
+class ShapeTotals:
+    """Process-wide count and time of every slow query shape"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def add(self, key, milliseconds):
+        with self._lock:
+            count, total = self._totals.get(key, (0, 0.0))
+            self._totals[key] = (count + 1, total + milliseconds)
+            return self._totals[key]
+
+
+slow_shapes = ShapeTotals()
+
+
+class RequestQueries:
+    """Queries of one request grouped by shape, with where each shape first ran"""
+
+    def __init__(self, request, threshold_ms):
+        self.request = request
+        self.threshold_ms = threshold_ms
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            milliseconds = (time.perf_counter() - started) * 1000
+            self.record(sql, milliseconds, context['connection'].alias)
+
+    def record(self, sql, milliseconds, alias):
+        shape = query_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            # The first occurrence is the one worth pointing at for N+1 queries
+            entry = self.shapes[shape] = {
+                'count': 0,
+                'total_ms': 0.0,
+                'stack': python_stack(),
+                'template': template_position(),
+            }
+        entry['count'] += 1
+        entry['total_ms'] += milliseconds
+        if milliseconds >= self.threshold_ms:
+            key = shape_id(shape)
+            count, total = slow_shapes.add(key, milliseconds)
+            write_event({
+                'event': 'slow_query',
+                'duration_ms': round(milliseconds, 3),
+                'database': alias,
+                'shape_id': key,
+                'shape_count': count,
+                'shape_total_ms': round(total, 3),
+                'sql': sql,
+                'stack': entry['stack'] if entry['count'] == 1 else python_stack(),
+                'template': entry['template'] if entry['count'] == 1 else template_position(),
+                **self.request_fields(),
+            })
+
+    def request_fields(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return {
+            'method': self.request.method,
+            'path': self.request.path,
+            'view': match.view_name if match else None,
+        }
+
+
+def write_event(event):
+    logger.info(json.dumps(event, default=str, sort_keys=True))
+
+
+class SlowQueryLogMiddleware:
+    """Log slow queries and N+1 patterns as JSON lines.
+
+    Enabled with ``SLOW_QUERY_LOG``. Every query slower than
+    ``SLOW_QUERY_THRESHOLD_MS`` is logged with the project frames and the
+    template line that issued it; at the end of a request every query shape
+    that ran more than ``N_PLUS_ONE_THRESHOLD`` times is logged once with its
+    count and where it first ran.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_LOG', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+        self.repeat_threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 10)
+        if not logger.handlers:
+            # No LOGGING entry for the query log: write plain JSON lines to a file
+            path = getattr(settings, 'SLOW_QUERY_LOG_FILE', os.path.join(settings.BASE_DIR, 'logs', 'slow_queries.log'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.FileHandler(path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    def __call__(self, request):
+        queries = RequestQueries(request, self.threshold_ms)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+
+        for shape, entry in queries.shapes.items():
+            if entry['count'] > self.repeat_threshold:
+                write_event({
+                    'event': 'n_plus_one',
+                    'count': entry['count'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'shape_id': shape_id(shape),
+                    'sql': shape,
+                    'stack': entry['stack'],
+                    'template': entry['template'],
+                    **queries.request_fields(),
+                })
+        return response
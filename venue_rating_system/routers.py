@@ -0,0 +1,103 @@
+"""
+Database routing for read replicas.
+
+Reads issued while a replica-eligible view runs go to a healthy replica; all
+writes, and every read outside those views, go to ``default``. The view
+allow-list and the read-your-writes window are configured in settings.
+"""
+
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+# Alias chosen for the current request, or None to use the primary
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_aliases():
+    """Database aliases configured as replicas"""
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def replica_is_healthy(alias):
+    """Return whether ``alias`` answered its last health check.
+
+    A replica is probed at most once per ``REPLICA_HEALTH_CHECK_INTERVAL``
+    seconds per process; in between the cached result is used.
+    """
+    interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 30)
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (True, None))
+        if checked_at is not None and now - checked_at < interval:
+            return healthy
+        # Mark as checked first so concurrent requests do not all probe
+        _health[alias] = (healthy, now)
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except Exception:
+        connections[alias].close()
+        healthy = False
+
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def mark_replica_unhealthy(alias):
+    """Stop routing to ``alias`` until its next health check"""
+    with _health_lock:
+        _health[alias] = (False, time.monotonic())
+
+
+def choose_replica():
+    """Pick a healthy replica at random, or None when none is usable"""
+    candidates = [alias for alias in replica_aliases() if replica_is_healthy(alias)]
+    return random.choice(candidates) if candidates else None
+
+
+def use_replica(alias):
+    """Route reads to ``alias`` for the current context; returns a reset token"""
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads to the replica selected for the current request.
+
+    Writes go to ``default`` unless a queryset or instance explicitly
+    targets another (non-replica) database.
+    """
+
+    def db_for_read(self, model, **hints):
+        # None falls back to the instance's database, then to default
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica are still written to the primary
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in replica_aliases():
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return db not in replica_aliases()
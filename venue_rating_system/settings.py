@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -58,6 +59,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware; removed when disabled
+    'venue_rating_system.metrics.MetricsMiddleware',
+    'venue_rating_system.querylog.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -68,6 +72,9 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'venue_rating_system.middleware.ReplicaRoutingMiddleware',
+    # Needs request.user; only acts on ?_profile / X-Profile requests from admins
+    'venue_rating_system.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'venue_rating_system.urls'
@@ -96,11 +103,79 @@ WSGI_APPLICATION = 'venue_rating_system.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite with WAL, tuned pragmas and BEGIN IMMEDIATE transactions
+        'ENGINE': 'venue_rating_system.db_backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Optional read replica for local testing: point SQLITE_REPLICA_PATH at a copy
+# of db.sqlite3 to exercise replica routing without PostgreSQL
+if os.getenv('SQLITE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'venue_rating_system.db_backends.sqlite3',
+        'NAME': os.getenv('SQLITE_REPLICA_PATH'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Read replicas
+DATABASE_ROUTERS = ['venue_rating_system.routers.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+# The test runner gets a replica alias mirroring the test database; only the
+# routing tests list it in REPLICA_DATABASES
+if sys.argv[1:2] == ['test'] and 'replica' not in DATABASES:
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+# Views whose GET requests may read from a replica
+REPLICA_READ_VIEWS = [
+    'venues:home',
+    'venues:venue_list',
+    'venues:venue_search',
+    'venues:venue_list_by_category',
+    'venues:venue_detail',
+    'venues:about',
+    'venues:change_feed',
+    'venues:autocomplete',
+]
+# Requests are pinned to the primary for this long after a write
+REPLICA_PIN_SECONDS = 10
+# Seconds between health checks of a replica
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+
+# Seconds a gap in the change-log sequence may wait for its transaction to
+# commit before change-feed consumers skip it (see ChangeLogEntry.changes_since)
+CHANGE_FEED_GAP_TIMEOUT = int(os.getenv('CHANGE_FEED_GAP_TIMEOUT', '60'))
+
+# In-memory bitmap index for venue listings (see venues/bitmaps.py)
+VENUE_BITMAP_INDEX = os.getenv('VENUE_BITMAP_INDEX', 'False') == 'True'
+# In-memory prefix index behind /autocomplete/ (see venues/autocomplete.py);
+# when off, suggestions are queried directly
+VENUE_AUTOCOMPLETE_INDEX = os.getenv('VENUE_AUTOCOMPLETE_INDEX', 'True') == 'True'
+# Seconds between replays of the change log into the indexes
+VENUE_INDEX_SYNC_INTERVAL = 5
+
+# Per-process cache of ranked search results (see venues/searchcache.py)
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '2000'))
+# Venue ids kept per cached search; later pages are queried directly
+SEARCH_CACHE_MAX_IDS = 500
+# Seconds a cached ranking is served; rating changes do not invalidate it
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))
+
+# Per-view latency, query and template metrics served at /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+# Bearer token for Prometheus scrapes; admins can always read /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# JSON log of slow queries and N+1 patterns (see venue_rating_system/querylog.py)
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'False') == 'True'
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE', str(BASE_DIR / 'logs' / 'slow_queries.log'))
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', '100'))
+# A query shape repeated more often than this in one request is reported
+N_PLUS_ONE_THRESHOLD = 10
+
+# On-demand profiling of single requests by admins (see venue_rating_system/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True') == 'True'
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(BASE_DIR / 'logs' / 'profiles'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
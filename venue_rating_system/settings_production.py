@@ -21,6 +21,49 @@ DATABASES = {
     }
 }
 
+# Connection reuse: 'none' opens a connection per request, 'persistent' keeps
+# one connection per worker thread, 'pool' borrows from a bounded per-process pool
+DB_CONN_MODE = config('DB_CONN_MODE', default='persistent')
+if DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONN_MODE == 'pool':
+    DATABASES['default']['ENGINE'] = 'venue_rating_system.db_backends.postgresql_pool'
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {
+        'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'MAX_IDLE': config('DB_POOL_MAX_IDLE', default=300, cast=int),
+        'HEALTH_CHECK_INTERVAL': config('DB_POOL_HEALTH_CHECK_INTERVAL', default=30, cast=int),
+    }
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1.internal,replica2.internal
+for index, host in enumerate(config('DB_REPLICA_HOSTS', default='').split(','), start=1):
+    if host.strip():
+        DATABASES[f'replica{index}'] = dict(
+            DATABASES['default'],
+            HOST=host.strip(),
+            TEST={'MIRROR': 'default'},
+        )
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+# Registers the trigram lookups used for fuzzy search (venues/fuzzy.py)
+INSTALLED_APPS += ['django.contrib.postgres']
+
+# Request metrics for Prometheus, scraped with METRICS_TOKEN as a bearer token
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Slow-query and N+1 log, written as JSON lines to logs/slow_queries.log
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=False, cast=bool)
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=int)
+
+# Admins can profile a request with ?_profile=1; results go to logs/profiles
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_DIR = os.path.join(BASE_DIR, 'logs', 'profiles')
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
@@ -19,11 +19,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics
+from .profiling import profile_file
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path('', include('venues.urls')),
     path('accounts/', include('accounts.urls')),
+    path('metrics', metrics, name='metrics'),
+    path('profiles/<str:profile_id>/<str:kind>/', profile_file, name='profile_file'),
 ]
 
 # Serve media files during development
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'venue_rating_system.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory venue indexes before the first request instead of during it
+from venues.apps import build_venue_indexes  # noqa: E402
+
+build_venue_indexes()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Venue, VenueImage, Rating, UserProfile, ContactMessage, Statistics
+from .models import Category, City, Country, Venue, VenueImage, Rating, UserProfile, ContactMessage, Statistics, VenueSlugHistory, VenueTag
+from .pagination import EstimatedCountPaginator
 
 
 @admin.register(Category)
@@ -19,10 +20,13 @@ class VenueImageInline(admin.TabularInline):
 @admin.register(Venue)
 class VenueAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'city', 'country', 'average_rating', 'total_ratings', 'is_active', 'is_featured', 'created_at']
-    list_filter = ['category', 'is_active', 'is_featured', 'city', 'country', 'created_at']
+    # Filter on the normalized tables: one indexed integer comparison per choice
+    list_filter = ['category', 'is_active', 'is_featured', 'country_ref', 'city_ref', 'created_at']
     search_fields = ['name', 'city', 'country', 'address']
     prepopulated_fields = {'slug': ('name',)}
     inlines = [VenueImageInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['average_rating', 'total_ratings', 'total_reviews', 'created_at', 'updated_at']
     
     fieldsets = (
@@ -58,11 +62,65 @@ class VenueAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('category')
 
 
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'venue_count']
+    search_fields = ['name', 'key']
+    readonly_fields = ['key', 'venue_count']
+
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ['name', 'country', 'key', 'venue_count']
+    list_filter = ['country']
+    search_fields = ['name', 'key']
+    readonly_fields = ['key', 'venue_count']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('country')
+
+
+@admin.register(VenueSlugHistory)
+class VenueSlugHistoryAdmin(admin.ModelAdmin):
+    list_display = ['old_slug', 'venue', 'created_at']
+    search_fields = ['old_slug', 'venue__name', 'venue__slug']
+    raw_id_fields = ['venue']
+    readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('venue')
+
+
+@admin.register(VenueTag)
+class VenueTagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'kind', 'key']
+    list_filter = ['kind']
+    search_fields = ['name', 'key']
+    # Links are derived from the venues' JSON fields, not edited here
+    exclude = ['venues']
+
+
+class RatingValueFilter(admin.SimpleListFilter):
+    """Filter on the 1-5 star value without a DISTINCT scan over all ratings"""
+    title = 'rating'
+    parameter_name = 'rating'
+    
+    def lookups(self, request, model_admin):
+        return [(str(value), f'{value} star{"s" if value > 1 else ""}') for value in range(5, 0, -1)]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(rating=self.value())
+        return queryset
+
+
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
     list_display = ['venue', 'user', 'rating', 'created_at']
-    list_filter = ['rating', 'created_at', 'venue__category']
+    list_filter = [RatingValueFilter, 'created_at', 'venue__category']
     search_fields = ['venue__name', 'user__username', 'user__email', 'comment']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['created_at', 'updated_at']
     
     def get_queryset(self, request):
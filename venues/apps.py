@@ -1,6 +1,35 @@
+import logging
+
 from django.apps import AppConfig
+from django.db import DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
 
 
 class VenuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'venues'
+
+    def ready(self):
+        # Connects the signal receivers that keep the in-memory indexes current
+        from . import autocomplete, bitmaps  # noqa: F401
+
+
+def build_venue_indexes():
+    """Build the enabled in-memory venue indexes before a worker serves requests.
+
+    Called from the WSGI module. If the database is not ready (not migrated
+    yet), the indexes are built on first use instead.
+    """
+    from .autocomplete import get_venue_autocomplete
+    from .bitmaps import get_venue_index
+
+    try:
+        get_venue_autocomplete()
+        get_venue_index()
+    except DatabaseError:
+        logger.warning('Venue indexes not built at startup', exc_info=True)
+    finally:
+        # A preloading server forks workers after this; they must not share the connection
+        connections.close_all()
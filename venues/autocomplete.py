@@ -0,0 +1,276 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .mirrors import VenueMirror
+from .models import Category, City, Venue
+from .text import fold, prefix_q
+
+
+# Sorts after any character that can appear in a folded key
+KEY_END = '\U0010ffff'
+# Words of a venue name that can start a match ("hotel" finds "Grand Hotel")
+MAX_NAME_WORDS = 4
+
+
+class PrefixIndex:
+    """Sorted array of folded keys answering ranked prefix queries.
+
+    Keys live in one sorted list of ``(key, entry_id)`` tuples, so the range
+    of keys sharing a prefix is found with two binary searches. Narrow ranges
+    are ranked on the spot; the best entries of wide ranges (short prefixes)
+    are computed once and kept in a small LRU cache that is invalidated
+    whenever a key under that prefix changes.
+    """
+
+    def __init__(self, scan_limit=64, cache_size=8192, cached_results=30):
+        self.scan_limit = scan_limit
+        self.cache_size = cache_size
+        self.cached_results = cached_results
+        self._keys = []
+        self._entries = {}
+        self._top = OrderedDict()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, entries):
+        """Replace the contents with ``(entry_id, keys, popularity, payload)`` tuples"""
+        self._entries = {}
+        self._top.clear()
+        keys = []
+        for entry_id, entry_keys, popularity, payload in entries:
+            entry_keys = sorted(set(entry_keys))
+            self._entries[entry_id] = (entry_keys, popularity, payload)
+            keys.extend((key, entry_id) for key in entry_keys)
+        keys.sort()
+        self._keys = keys
+
+    def put(self, entry_id, keys, popularity, payload):
+        """Add an entry or replace the existing one with the same id"""
+        self.delete(entry_id)
+        keys = sorted(set(keys))
+        self._entries[entry_id] = (keys, popularity, payload)
+        for key in keys:
+            insort(self._keys, (key, entry_id))
+            self._invalidate(key)
+
+    def delete(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            position = bisect_left(self._keys, (key, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, entry_id):
+                del self._keys[position]
+            self._invalidate(key)
+
+    def _invalidate(self, key):
+        if self._top:
+            for length in range(1, len(key) + 1):
+                self._top.pop(key[:length], None)
+
+    def _ranked(self, prefix, count):
+        low = bisect_left(self._keys, (prefix,))
+        high = bisect_left(self._keys, (prefix + KEY_END,), low)
+        if high - low > self.scan_limit:
+            top = self._top.get(prefix)
+            if top is not None:
+                self._top.move_to_end(prefix)
+                return top
+        best = {}
+        for _, entry_id in self._keys[low:high]:
+            best[entry_id] = self._entries[entry_id][1]
+        top = heapq.nlargest(
+            max(count, self.cached_results), best, key=lambda entry_id: (best[entry_id], entry_id)
+        )
+        if high - low > self.scan_limit:
+            self._top[prefix] = top
+            if len(self._top) > self.cache_size:
+                self._top.popitem(last=False)
+        return top
+
+    def search(self, prefix, limit=8):
+        """Return the payloads of the ``limit`` most popular entries under ``prefix``"""
+        if not prefix:
+            return []
+        return [self._entries[entry_id][2] for entry_id in self._ranked(prefix, limit)[:limit]]
+
+
+def name_keys(name):
+    """Keys a venue name is found under: the full name and its later words"""
+    folded = fold(name)
+    words = folded.split(' ')
+    return [' '.join(words[start:]) for start in range(min(len(words), MAX_NAME_WORDS))]
+
+
+class VenueAutocomplete(VenueMirror):
+    """Suggestions over active venue names, cities and categories.
+
+    Venues rank by number of ratings; cities and categories by how many
+    active venues they hold.
+    """
+
+    fields = ['id', 'name', 'slug', 'city', 'category_id', 'is_active', 'total_ratings']
+    related_models = ('category',)
+
+    def reset(self):
+        self.index = PrefixIndex()
+        self._venues = {}
+        self._cities = {}
+        self._categories = {}
+        self._category_names = {}
+
+    def load(self, rows):
+        self._category_names = {
+            pk: (name, slug) for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug')
+        }
+        entries = []
+        for row in rows:
+            if not row['is_active']:
+                continue
+            entries.append(self._venue_entry(row))
+            self._venues[row['id']] = row
+            self._track(row, 1)
+        for key, (label, count) in self._cities.items():
+            entries.append((('city', key), [key], count, ('city', label, label)))
+        for category_id, count in self._categories.items():
+            entries.append(self._category_entry(category_id, count))
+        self.index.load(entries)
+
+    def _venue_entry(self, row):
+        payload = ('venue', row['name'], row['slug'])
+        return (('venue', row['id']), name_keys(row['name']), row['total_ratings'], payload)
+
+    def _category_entry(self, category_id, count):
+        if category_id not in self._category_names:
+            category = Category.objects.filter(pk=category_id).values_list('name', 'slug').first()
+            self._category_names[category_id] = category or ('', '')
+        name, slug = self._category_names[category_id]
+        return (('category', category_id), [fold(name)], count, ('category', name, slug))
+
+    def _track(self, row, delta):
+        """Adjust the venue counts of a row's city and category, returning what changed"""
+        key = fold(row['city'])
+        label, count = self._cities.get(key, (row['city'], 0))
+        self._cities[key] = (label, count + delta)
+        if not self._cities[key][1]:
+            del self._cities[key]
+        count = self._categories.get(row['category_id'], 0) + delta
+        self._categories[row['category_id']] = count
+        if not count:
+            del self._categories[row['category_id']]
+        return key, row['category_id']
+
+    def _put_counts(self, city_key, category_id):
+        if city_key in self._cities:
+            label, count = self._cities[city_key]
+            self.index.put(('city', city_key), [city_key], count, ('city', label, label))
+        else:
+            self.index.delete(('city', city_key))
+        if category_id in self._categories:
+            self.index.put(*self._category_entry(category_id, self._categories[category_id]))
+        else:
+            self.index.delete(('category', category_id))
+
+    def add_row(self, row):
+        if not row['is_active']:
+            return
+        self.index.put(*self._venue_entry(row))
+        self._venues[row['id']] = row
+        self._put_counts(*self._track(row, 1))
+
+    def remove_row(self, pk):
+        row = self._venues.pop(pk, None)
+        if row is None:
+            return
+        self.index.delete(('venue', pk))
+        self._put_counts(*self._track(row, -1))
+
+    def refresh_related(self, model, pks):
+        """Relabel renamed categories and forget deleted ones"""
+        categories = Category.objects.filter(pk__in=pks).values_list('pk', 'name', 'slug')
+        names = {pk: (name, slug) for pk, name, slug in categories}
+        for pk in pks:
+            if pk in names:
+                self._category_names[pk] = names[pk]
+            else:
+                self._category_names.pop(pk, None)
+            if pk in self._categories:
+                self.index.put(*self._category_entry(pk, self._categories[pk]))
+
+    def search(self, query, limit=8):
+        """Return ``(kind, label, value)`` suggestions for a partially typed query"""
+        self.ensure_built()
+        with self._lock:
+            return self.index.search(fold(query), limit)
+
+
+venue_autocomplete = VenueAutocomplete()
+
+
+def get_venue_autocomplete():
+    """The shared index when ``VENUE_AUTOCOMPLETE_INDEX`` is enabled, otherwise None"""
+    if not getattr(settings, 'VENUE_AUTOCOMPLETE_INDEX', True):
+        return None
+    venue_autocomplete.ensure_built()
+    return venue_autocomplete
+
+
+def database_suggestions(query, limit=8):
+    """Suggestions queried directly, for when the index is disabled.
+
+    Ranked like the index, but venues are found by the start of their full
+    name only.
+    """
+    folded = fold(query)
+    if not folded:
+        return []
+    ranked = []
+    venues = Venue.objects.filter(prefix_q('name_folded', folded), is_active=True).order_by('-total_ratings')
+    for name, slug, total_ratings in venues.values_list('name', 'slug', 'total_ratings')[:limit]:
+        ranked.append((total_ratings, ('venue', name, slug)))
+    cities = {}
+    matching_cities = City.objects.filter(prefix_q('key', folded), venue_count__gt=0).order_by('-venue_count')
+    for key, name, venue_count in matching_cities.values_list('key', 'name', 'venue_count')[:limit]:
+        label, count = cities.get(key, (name, 0))
+        cities[key] = (label, count + venue_count)
+    ranked.extend((count, ('city', label, label)) for label, count in cities.values())
+    categories = {
+        pk: (name, slug) for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug')
+        if fold(name).startswith(folded)
+    }
+    counts = Venue.objects.filter(category_id__in=categories, is_active=True).values_list('category_id').annotate(
+        count=Count('id')
+    ).order_by()
+    for category_id, count in counts:
+        name, slug = categories[category_id]
+        ranked.append((count, ('category', name, slug)))
+    ranked.sort(key=lambda item: -item[0])
+    return [suggestion for _, suggestion in ranked[:limit]]
+
+
+@receiver(post_save, sender=Venue)
+def autocomplete_venue_save(sender, instance, raw=False, **kwargs):
+    """Keep suggestions current when a venue is saved in this process"""
+    if not raw:
+        venue_autocomplete.update(instance, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Venue)
+def autocomplete_venue_delete(sender, instance, **kwargs):
+    """Drop suggestions for a deleted venue"""
+    venue_autocomplete.remove(instance.pk, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def autocomplete_category_change(sender, instance, raw=False, **kwargs):
+    """Relabel or drop a category's suggestion when it is renamed or deleted"""
+    if not raw:
+        venue_autocomplete.update_related('category', instance.pk, using=kwargs.get('using'))
@@ -0,0 +1,250 @@
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .facets import price_band, rating_band
+from .mirrors import VenueMirror
+from .models import Venue
+
+
+# Attributes held as bitmaps, and how each one is read from a venue row
+INDEX_FIELDS = [
+    'id', 'category_id', 'city', 'is_active', 'is_featured',
+    'price_range_min', 'average_rating', 'total_ratings',
+]
+
+
+def _attributes(row):
+    return {
+        'category': row['category_id'],
+        'city': row['city'].casefold(),
+        'active': row['is_active'],
+        'featured': row['is_featured'],
+        'price': price_band(row['price_range_min']),
+        'rating': rating_band(row['average_rating'], row['total_ratings']),
+    }
+
+
+def bitmap_from_positions(positions):
+    """Build an int bitset with the given bit positions set"""
+    positions = list(positions)
+    if not positions:
+        return 0
+    # Setting bits in a byte buffer avoids re-allocating a huge int per bit
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def bit_string(mask):
+    """``mask`` as a string of '0' and '1' indexed by bit position"""
+    return bin(mask)[:1:-1]
+
+
+def iter_bits(mask):
+    """Yield the positions of the set bits of ``mask`` in ascending order"""
+    # Scanning the binary string is much faster than shifting a huge int
+    bits = bit_string(mask)
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+class VenueBitmapIndex(VenueMirror):
+    """In-process index answering listing filters without the database.
+
+    Every attribute value (a category, a city, a price band...) owns a Python
+    int used as a bitset over venue ids, so combining filters is a handful of
+    big-int ANDs. Venues are kept in listing order (best rated first) for
+    paging, in a sorted list that single changes update by bisection.
+    Building and keeping it current is handled by ``VenueMirror``.
+    """
+
+    fields = INDEX_FIELDS
+
+    def reset(self):
+        self._bitmaps = {}
+        self._all = 0
+        self._attributes = {}
+        self._sort_keys = {}
+        # Sort keys in listing order, and the venue id of each position
+        self._order_keys = []
+        self._order = []
+
+    def load(self, rows):
+        positions = {}
+        for row in rows:
+            pk = row['id']
+            attributes = _attributes(row)
+            for name, value in attributes.items():
+                positions.setdefault(name, {}).setdefault(value, []).append(pk)
+            self._attributes[pk] = attributes
+            self._sort_keys[pk] = (-row['average_rating'], -row['total_ratings'], pk)
+        for name, values in positions.items():
+            self._bitmaps[name] = {
+                value: bitmap_from_positions(pks) for value, pks in values.items()
+            }
+        self._all = bitmap_from_positions(self._attributes)
+        self._order_keys = sorted(self._sort_keys.values())
+        self._order = [key[2] for key in self._order_keys]
+
+    def add_row(self, row):
+        pk = row['id']
+        bit = 1 << pk
+        attributes = _attributes(row)
+        for name, value in attributes.items():
+            values = self._bitmaps.setdefault(name, {})
+            values[value] = values.get(value, 0) | bit
+        self._all |= bit
+        self._attributes[pk] = attributes
+        key = (-row['average_rating'], -row['total_ratings'], pk)
+        self._sort_keys[pk] = key
+        position = bisect_left(self._order_keys, key)
+        self._order_keys.insert(position, key)
+        self._order.insert(position, pk)
+
+    def remove_row(self, pk):
+        attributes = self._attributes.pop(pk, None)
+        if attributes is None:
+            return
+        bit = 1 << pk
+        for name, value in attributes.items():
+            values = self._bitmaps[name]
+            values[value] &= ~bit
+            if not values[value]:
+                del values[value]
+        self._all &= ~bit
+        position = bisect_left(self._order_keys, self._sort_keys.pop(pk))
+        del self._order_keys[position]
+        del self._order[position]
+
+    def filter(self, **filters):
+        """Return the bitmap of venues matching every ``attribute=value`` given.
+
+        ``None`` values are ignored; a value may also be a list, matching any
+        of its members.
+        """
+        with self._lock:
+            mask = None
+            for name, value in filters.items():
+                if value is None:
+                    continue
+                values = self._bitmaps.get(name, {})
+                if isinstance(value, (list, tuple, set)):
+                    bitmap = 0
+                    for item in value:
+                        bitmap |= values.get(item, 0)
+                else:
+                    bitmap = values.get(value, 0)
+                mask = bitmap if mask is None else mask & bitmap
+            return self._all if mask is None else mask
+
+    @staticmethod
+    def count(mask):
+        return bin(mask).count('1')
+
+    def ordered(self, mask, offset=0, limit=None):
+        """Return venue ids in ``mask`` in listing order, sliced"""
+        with self._lock:
+            end = None if limit is None else offset + limit
+            matched = self.count(mask)
+            if not matched:
+                return []
+            # Walking the listing order touches about end * total / matched
+            # venues before the page is full, and each step is far cheaper
+            # than sorting one match, so only very sparse masks are sorted
+            if end is None or end * len(self._order) > 20 * matched * matched:
+                pks = sorted(iter_bits(mask), key=self._sort_keys.__getitem__)
+                return pks[offset:end]
+            bits = bit_string(mask)
+            pks = []
+            for pk in self._order:
+                if pk < len(bits) and bits[pk] == '1':
+                    pks.append(pk)
+                    if end is not None and len(pks) >= end:
+                        break
+            return pks[offset:end]
+
+    def verify(self):
+        """Compare the index with the database and return a list of differences"""
+        with self._lock:
+            problems = []
+            indexed = set(self._attributes)
+            rows = {row['id']: row for row in Venue.objects.values(*INDEX_FIELDS)}
+            bits = {
+                (name, value): bit_string(bitmap)
+                for name, values in self._bitmaps.items() for value, bitmap in values.items()
+            }
+            for pk in indexed - set(rows):
+                problems.append(f'venue {pk} is indexed but no longer exists')
+            for pk, row in rows.items():
+                if pk not in indexed:
+                    problems.append(f'venue {pk} is missing from the index')
+                    continue
+                expected = _attributes(row)
+                for name, value in expected.items():
+                    if bits.get((name, value), '')[pk:pk + 1] != '1':
+                        problems.append(f'venue {pk}: {name} bitmap does not contain {value!r}')
+                if self._attributes[pk] != expected:
+                    problems.append(f'venue {pk}: indexed as {self._attributes[pk]}, expected {expected}')
+            for (name, value), value_bits in bits.items():
+                position = value_bits.find('1')
+                while position != -1:
+                    if self._attributes.get(position, {}).get(name) != value:
+                        problems.append(f'venue {position}: stale bit in {name}={value!r}')
+                    position = value_bits.find('1', position + 1)
+            return problems
+
+
+class IndexedVenueList:
+    """Sequence of venues backed by the bitmap index, for use with a paginator.
+
+    Only the venues on the requested page are loaded from the database, by
+    primary key.
+    """
+
+    def __init__(self, index, mask, queryset):
+        self.index = index
+        self.mask = mask
+        self.queryset = queryset
+        self._count = index.count(mask)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = self._count if item.stop is None else item.stop
+        pks = self.index.ordered(self.mask, start, max(stop - start, 0))
+        venues = self.queryset.in_bulk(pks)
+        return [venues[pk] for pk in pks if pk in venues]
+
+
+venue_index = VenueBitmapIndex()
+
+
+def get_venue_index():
+    """The shared index when ``VENUE_BITMAP_INDEX`` is enabled, otherwise None"""
+    if not getattr(settings, 'VENUE_BITMAP_INDEX', False):
+        return None
+    venue_index.ensure_built()
+    return venue_index
+
+
+@receiver(post_save, sender=Venue)
+def index_venue_save(sender, instance, raw=False, **kwargs):
+    """Keep the in-process index current when a venue is saved here"""
+    if not raw:
+        venue_index.update(instance, using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Venue)
+def index_venue_delete(sender, instance, **kwargs):
+    """Drop a deleted venue from the in-process index"""
+    venue_index.remove(instance.pk, using=kwargs.get('using'))
@@ -0,0 +1,144 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from .models import Venue, Rating
+from .text import fold
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+VENUE_EXPORT_FIELDS = [
+    'id', 'name', 'slug', 'category__slug', 'address', 'city', 'country',
+    'latitude', 'longitude', 'phone', 'email', 'website',
+    'price_range_min', 'price_range_max', 'currency',
+    'booking_com_link', 'trip_com_link', 'facilities', 'languages_spoken',
+    'amenities', 'is_active', 'is_featured', 'average_rating',
+    'total_ratings', 'total_reviews', 'created_at', 'updated_at',
+]
+
+RATING_EXPORT_FIELDS = [
+    'id', 'venue_id', 'venue__slug', 'user_id', 'rating', 'comment',
+    'created_at', 'updated_at',
+]
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def parse_since(value):
+    """Parse an ISO date or datetime used for the ``since`` filter"""
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        since = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def venue_export_queryset(category=None, city=None, since=None):
+    """Venues to export, filtered by category slug, city and last update"""
+    venues = Venue.objects.order_by('id')
+    if category:
+        venues = venues.filter(category__slug=category)
+    if city:
+        venues = venues.filter(city_ref__key=fold(city))
+    if since:
+        venues = venues.filter(updated_at__gte=since)
+    return venues.values_list(*VENUE_EXPORT_FIELDS)
+
+
+def rating_export_queryset(category=None, city=None, since=None):
+    """Ratings to export, filtered through their venue and by last update"""
+    ratings = Rating.objects.order_by('id')
+    if category:
+        ratings = ratings.filter(venue__category__slug=category)
+    if city:
+        ratings = ratings.filter(venue__city_ref__key=fold(city))
+    if since:
+        ratings = ratings.filter(updated_at__gte=since)
+    return ratings.values_list(*RATING_EXPORT_FIELDS)
+
+
+EXPORTS = {
+    'venues': (VENUE_EXPORT_FIELDS, venue_export_queryset),
+    'ratings': (RATING_EXPORT_FIELDS, rating_export_queryset),
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer wrote"""
+
+    def write(self, value):
+        return value
+
+
+def _header_name(field):
+    return field.replace('__', '_')
+
+
+def iter_export_lines(fields, rows, export_format):
+    """Yield the export one line at a time as text"""
+    headers = [_header_name(field) for field in fields]
+    if export_format == 'csv':
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow([
+                json.dumps(value) if isinstance(value, (list, dict)) else value
+                for value in row
+            ])
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), default=_json_default) + '\n'
+
+
+def iter_export(name, export_format='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Stream an export as bytes, optionally gzip-compressed on the fly.
+
+    Rows are read with ``iterator(chunk_size=...)`` so PostgreSQL uses a
+    server-side cursor and memory stays flat however large the table is.
+    """
+    fields, build_queryset = EXPORTS[name]
+    rows = build_queryset(**filters).iterator(chunk_size=chunk_size)
+    lines = iter_export_lines(fields, rows, export_format)
+
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_BUFFER_SIZE:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
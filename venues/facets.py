@@ -0,0 +1,189 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import ChangeLogEntry, VenueTag
+
+
+FACET_CACHE_TIMEOUT = 300
+FACET_LIMIT = 20
+
+# (key, label, lower bound, upper bound) on the venue's minimum price
+PRICE_BANDS = [
+    ('budget', 'Under 50', None, 50),
+    ('moderate', '50 - 150', 50, 150),
+    ('upscale', '150 - 300', 150, 300),
+    ('luxury', '300 and up', 300, None),
+]
+
+# (key, label, lower bound, upper bound) on the average rating of rated venues
+RATING_BANDS = [
+    ('4', '4 stars and up', 4, None),
+    ('3', '3 - 4 stars', 3, 4),
+    ('2', '2 - 3 stars', 2, 3),
+    ('1', 'Under 2 stars', None, 2),
+]
+
+# Grouping columns of the facets counted in one grouped query
+GROUP_FIELDS = {
+    'category': ('category__slug', 'category__name'),
+    'city': ('city_ref__name',),
+    'price': ('price_band',),
+    'rating': ('rating_band',),
+}
+
+
+def _range_q(field, low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        q &= Q(**{f'{field}__lt': high})
+    return q
+
+
+def price_band_q(key):
+    """Q object matching venues in a price band, or None for an unknown band"""
+    if key == 'unlisted':
+        return Q(price_range_min__isnull=True)
+    for band, _, low, high in PRICE_BANDS:
+        if band == key:
+            return _range_q('price_range_min', low, high)
+    return None
+
+
+def rating_band_q(key):
+    """Q object matching venues in a rating band, or None for an unknown band"""
+    if key == 'unrated':
+        return Q(total_ratings=0)
+    for band, _, low, high in RATING_BANDS:
+        if band == key:
+            return Q(total_ratings__gt=0) & _range_q('average_rating', low, high)
+    return None
+
+
+def price_band(price):
+    """Key of the price band a minimum price falls in"""
+    if price is None:
+        return 'unlisted'
+    for key, _, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return ''
+
+
+def rating_band(average_rating, total_ratings):
+    """Key of the rating band a venue's rating statistics fall in"""
+    if not total_ratings:
+        return 'unrated'
+    for key, _, low, high in RATING_BANDS:
+        if (low is None or average_rating >= low) and (high is None or average_rating < high):
+            return key
+    return ''
+
+
+def _band_case(field, bands, outside_key, outside_q):
+    # Venues matching ``outside_q`` (no price, no ratings) are kept out of the ranges
+    whens = [When(outside_q, then=Value(outside_key))]
+    whens += [When(_range_q(field, low, high), then=Value(key)) for key, _, low, high in bands]
+    return Case(*whens, default=Value(''), output_field=CharField())
+
+
+def normalize_filters(**filters):
+    """Canonical form of a filter set, so equivalent requests share a cache entry"""
+    normalized = {}
+    for name, value in filters.items():
+        if isinstance(value, (list, tuple)):
+            value = sorted(':'.join(item) if isinstance(item, tuple) else str(item) for item in value)
+        elif isinstance(value, str):
+            value = ' '.join(value.split()).lower()
+        if value:
+            normalized[name] = value
+    return normalized
+
+
+def facet_cache_key(filters):
+    # The newest change-log entry identifies the catalogue version, so any
+    # catalogue write (including bulk ones) invalidates every cached facet set
+    version = ChangeLogEntry.latest_seq()
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'venue-facets:{version}:{digest}'
+
+
+def _grouped_counts(venues, kinds):
+    """Venue counts grouped by the columns of the facets in ``kinds``"""
+    return venues.order_by().select_related(None).prefetch_related(None).annotate(
+        price_band=_band_case('price_range_min', PRICE_BANDS, 'unlisted', Q(price_range_min__isnull=True)),
+        rating_band=_band_case('average_rating', RATING_BANDS, 'unrated', Q(total_ratings=0)),
+    ).values(*(field for kind in kinds for field in GROUP_FIELDS[kind])).annotate(venue_count=Count('pk'))
+
+
+def compute_facets(venues, selected=None):
+    """Count venues per category, city, price band, rating band and tag.
+
+    ``venues`` holds the restrictions that are not facets (active venues,
+    tags, a search) and ``selected`` maps the facets a value is chosen in
+    ('category', 'city', 'price', 'rating') to the Q object of that choice.
+    Each of those facets is counted with every other choice applied but not
+    its own, so the alternatives keep their counts; the facets without a
+    choice share one grouped query over the full results. Tags all have to
+    match, so tag counts take one more query over the full results. The
+    result only holds plain values so it can be cached.
+    """
+    selected = selected or {}
+    results = venues.filter(*selected.values())
+    unselected = [kind for kind in GROUP_FIELDS if kind not in selected]
+    groups = [(unselected, results)] if unselected else []
+    for kind in GROUP_FIELDS:
+        if kind in selected:
+            others = [q for other, q in selected.items() if other != kind]
+            groups.append(([kind], venues.filter(*others)))
+
+    categories, cities, prices, ratings = {}, {}, {}, {}
+    for kinds, queryset in groups:
+        for row in _grouped_counts(queryset, kinds):
+            count = row['venue_count']
+            if 'category' in kinds:
+                category = categories.setdefault(
+                    row['category__slug'], {'slug': row['category__slug'], 'name': row['category__name'], 'count': 0}
+                )
+                category['count'] += count
+            if 'city' in kinds and row['city_ref__name']:
+                cities[row['city_ref__name']] = cities.get(row['city_ref__name'], 0) + count
+            if 'price' in kinds:
+                prices[row['price_band']] = prices.get(row['price_band'], 0) + count
+            if 'rating' in kinds:
+                ratings[row['rating_band']] = ratings.get(row['rating_band'], 0) + count
+
+    price_bands = PRICE_BANDS + [('unlisted', 'Price not listed', None, None)]
+    rating_bands = RATING_BANDS + [('unrated', 'Not rated yet', None, None)]
+    facets = {
+        'category': sorted(categories.values(), key=lambda item: item['name']),
+        'city': [
+            {'value': city, 'count': count}
+            for city, count in sorted(cities.items(), key=lambda item: (-item[1], item[0]))[:FACET_LIMIT]
+        ],
+        'price': [
+            {'key': key, 'label': label, 'count': prices.get(key, 0)} for key, label, _, _ in price_bands
+        ],
+        'rating': [
+            {'key': key, 'label': label, 'count': ratings.get(key, 0)} for key, label, _, _ in rating_bands
+        ],
+    }
+    for kind, tags in VenueTag.facets(results, limit=FACET_LIMIT).items():
+        facets[kind] = [
+            {'kind': tag.kind, 'key': tag.key, 'name': tag.name, 'count': tag.venue_count} for tag in tags
+        ]
+    return facets
+
+
+def venue_facets(venues, filters, selected=None):
+    """Facet counts (see ``compute_facets``), cached per normalized filter set and catalogue version"""
+    key = facet_cache_key(filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(venues, selected)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
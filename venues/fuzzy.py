@@ -0,0 +1,160 @@
+import math
+import re
+
+from django.db import connections, router
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .text import fold
+
+
+# Searches with fewer exact matches than this also look for close spellings
+FUZZY_MIN_RESULTS = 5
+# Most candidates a fuzzy search considers, however common the trigrams are
+FUZZY_CANDIDATE_LIMIT = 200
+# Share of the query's trigrams a venue must contain to count as a match
+FUZZY_THRESHOLD = 0.5
+# Most trigram postings read to pre-select candidates, and the frequency at
+# which a trigram counts as common
+FUZZY_SCAN_LIMIT = 2000
+
+# Venue fields whose words are indexed
+FUZZY_FIELDS = ('name', 'city', 'country')
+
+
+def trigrams(text):
+    """Trigrams of the words in ``text``, padded the way pg_trgm pads them"""
+    grams = set()
+    for word in re.findall(r'\w+', fold(text)):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def venue_trigrams(venue):
+    grams = set()
+    for field in FUZZY_FIELDS:
+        grams |= trigrams(getattr(venue, field) or '')
+    return grams
+
+
+def _postgres_candidates(queryset, query, limit):
+    # Word similarity suits short queries against multi-word names, and the
+    # %> operator behind the lookup is served by the gin_trgm_ops indexes
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    similarity = Greatest(*(TrigramWordSimilarity(query, field) for field in FUZZY_FIELDS))
+    matches = Q()
+    for field in FUZZY_FIELDS:
+        matches |= Q(**{f'{field}__trigram_word_similar': query})
+    return list(
+        queryset.filter(matches).annotate(similarity=similarity)
+        .order_by('-similarity').values_list('pk', flat=True)[:limit]
+    )
+
+
+def trigram_frequencies(grams, using='default', cap=None):
+    """Number of venues containing each trigram, counted up to ``cap``.
+
+    One query; each count stops at ``cap`` postings, so common trigrams cost
+    no more than rare ones.
+    """
+    from .models import VenueTrigram
+
+    grams = sorted(grams)
+    if not grams:
+        return {}
+    cap = cap or FUZZY_SCAN_LIMIT
+    table = connections[using].ops.quote_name(VenueTrigram._meta.db_table)
+    counts = ' UNION ALL '.join(
+        f'SELECT %s, (SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE trigram = %s LIMIT %s) AS postings)'
+        for _ in grams
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(counts, [value for gram in grams for value in (gram, gram, cap)])
+        return dict(cursor.fetchall())
+
+
+def _trigram_table_candidates(queryset, query, limit):
+    from .models import VenueTrigram
+
+    grams = trigrams(query)
+    if not grams:
+        return []
+    needed = max(1, math.ceil(len(grams) * FUZZY_THRESHOLD))
+    # A venue sharing ``needed`` trigrams holds at least one of any
+    # len(grams) - needed + 1 of them, so candidates are drawn from the
+    # rarest ones only, reading at most FUZZY_SCAN_LIMIT postings. When even
+    # those are common the candidates are cut short, in index order.
+    frequencies = trigram_frequencies(grams, queryset.db)
+    seeds = sorted(grams, key=frequencies.get)[:len(grams) - needed + 1]
+    # A correlated EXISTS probes each posting by primary key where IN would
+    # materialize the whole queryset first
+    in_queryset = Exists(queryset.order_by().filter(pk=OuterRef('venue_id')))
+    postings = VenueTrigram.objects.using(queryset.db)
+    candidates = postings.filter(trigram__in=seeds).filter(in_queryset).values('venue_id').distinct()
+    hits = postings.filter(trigram__in=grams, venue_id__in=candidates[:FUZZY_SCAN_LIMIT]).values(
+        'venue_id'
+    ).annotate(shared=Count('venue_id')).filter(shared__gte=needed).order_by('-shared').values_list(
+        'venue_id', flat=True
+    )[:limit]
+    return list(hits)
+
+
+def fuzzy_venue_ids(queryset, query, limit=FUZZY_CANDIDATE_LIMIT):
+    """Ids of venues whose names or places resemble ``query``, best first.
+
+    Uses pg_trgm on PostgreSQL and the VenueTrigram table elsewhere. At most
+    ``limit`` candidates are returned, all from ``queryset``.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return _postgres_candidates(queryset, query, limit)
+    return _trigram_table_candidates(queryset, query, limit)
+
+
+def name_contains_q(folded):
+    """Q object for venue names containing the folded text ``folded``.
+
+    PostgreSQL serves the ``LIKE '%...%'`` from the gin_trgm_ops index on
+    ``name_folded``. Elsewhere the match is narrowed to the venues posting the
+    query's rarest trigram: one from inside a word, or the start of a word
+    for words under three letters, which then match at word starts only.
+    """
+    from .models import Venue, VenueTrigram
+
+    contains = Q(name_folded__contains=folded)
+    using = router.db_for_read(Venue)
+    if connections[using].vendor == 'postgresql':
+        return contains
+    grams = set()
+    for word in re.findall(r'\w+', folded):
+        if len(word) < 3:
+            grams.add(f'  {word}'[-3:])
+        else:
+            grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    if not grams:
+        return contains
+    frequencies = trigram_frequencies(grams, using)
+    rarest = min(grams, key=lambda gram: (frequencies[gram], gram))
+    return Q(pk__in=VenueTrigram.objects.filter(trigram=rarest).values('venue_id')) & contains
+
+
+def search_with_fallback(venues, query, exact_q, min_results=FUZZY_MIN_RESULTS):
+    """Filter ``venues`` by ``exact_q``, adding close spellings when that finds too little.
+
+    Returns ``(venues, fuzzy)``. When ``fuzzy`` is true the queryset is
+    already ordered by relevance, exact matches first.
+    """
+    exact = venues.filter(exact_q)
+    exact_ids = list(exact.order_by().values_list('pk', flat=True)[:min_results])
+    if len(exact_ids) >= min_results:
+        return exact, False
+
+    ranked = exact_ids + [pk for pk in fuzzy_venue_ids(venues, query) if pk not in exact_ids]
+    if len(ranked) == len(exact_ids):
+        return exact, False
+    order = Case(
+        *(When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked)),
+        output_field=IntegerField(),
+    )
+    return venues.filter(pk__in=ranked).order_by(order), True
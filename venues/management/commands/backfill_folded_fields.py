@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import ChangeLogEntry, Venue
+
+
+class Command(BaseCommand):
+    help = 'Recompute the accent- and case-folded search copies of venue names and places'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues updated per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        folded_fields = list(Venue.FOLDED_FIELDS.values())
+        venues = Venue.objects.only(*Venue.FOLDED_FIELDS, *folded_fields).order_by('pk')
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(venues.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            changed = []
+            for venue in batch:
+                before = [getattr(venue, field) for field in folded_fields]
+                venue.fold_fields()
+                if [getattr(venue, field) for field in folded_fields] != before:
+                    changed.append(venue)
+            if changed:
+                with write_atomic():
+                    Venue.objects.bulk_update(changed, folded_fields)
+                    # bulk_update bypasses the change-feed signals; cached searches must see the new keys
+                    ChangeLogEntry.record_many(Venue, [venue.pk for venue in changed], 'update')
+            updated += len(changed)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated folded fields for {updated} venues.'))
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from venues.autocomplete import PrefixIndex, VenueAutocomplete, name_keys
+from venues.text import fold
+
+
+SYLLABLES = [
+    'ba', 'ca', 'da', 'el', 'fa', 'go', 'ha', 'in', 'jo', 'ka', 'la', 'mo', 'na',
+    'or', 'pa', 'ri', 'sa', 'ta', 'um', 'va', 'wi', 'yo', 'za', 'lé', 'çu', 'ø',
+]
+KINDS = ['Hotel', 'Cafe', 'Restaurant', 'Bar', 'Museum', 'Park', 'Bistro', 'Inn']
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Measure autocomplete latency per keystroke on a synthetic or the real catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=1000000, help='Synthetic venues to index')
+        parser.add_argument('--queries', type=int, default=2000, help='Names typed one keystroke at a time')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--from-db', action='store_true', help='Index the venues in the database instead')
+
+    def handle(self, *args, **options):
+        if options['entries'] < 1 or options['queries'] < 1:
+            raise CommandError('--entries and --queries must be at least 1')
+        rng = random.Random(options['seed'])
+
+        started = time.perf_counter()
+        if options['from_db']:
+            autocomplete = VenueAutocomplete()
+            autocomplete.build()
+            index = autocomplete.index
+            names = [row['name'] for row in autocomplete._venues.values()]
+        else:
+            names = [self._name(rng) for _ in range(options['entries'])]
+            index = PrefixIndex()
+            index.load(
+                (('venue', i), name_keys(name), int(rng.paretovariate(1.2)), ('venue', name, str(i)))
+                for i, name in enumerate(names)
+            )
+        self.stdout.write(f'Indexed {len(names)} venues ({len(index)} keys) in {time.perf_counter() - started:.2f}s')
+        if not names:
+            raise CommandError('Nothing to index')
+
+        # Type each sampled name one character at a time, as a user would
+        typed = [fold(rng.choice(names))[:rng.randint(3, 12)] for _ in range(options['queries'])]
+        for label in ('cold', 'warm'):
+            latencies = []
+            for text in typed:
+                for length in range(1, len(text) + 1):
+                    prefix = text[:length]
+                    started = time.perf_counter()
+                    index.search(prefix, 8)
+                    latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            self.stdout.write(
+                f'{label}: {len(latencies)} keystrokes  '
+                f'p50 {percentile(latencies, 0.50) * 1e6:.1f}us  '
+                f'p95 {percentile(latencies, 0.95) * 1e6:.1f}us  '
+                f'p99 {percentile(latencies, 0.99) * 1e6:.1f}us  '
+                f'max {latencies[-1] * 1e6:.1f}us'
+            )
+
+    def _name(self, rng):
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.5:
+            return f'{word} {rng.choice(KINDS)}'
+        return f'{rng.choice(KINDS)} {word}'
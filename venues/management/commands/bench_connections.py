@@ -0,0 +1,76 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from venue_rating_system.db_backends.pool import pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure requests/sec through the WSGI handler with the configured '
+        'connection mode; run once per DB_CONN_MODE and compare'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default='/about/', help='Page to request')
+        parser.add_argument('--requests', type=int, default=2000, help='Total number of requests')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of client threads')
+
+    def handle(self, *args, **options):
+        application = get_wsgi_application()
+        factory = RequestFactory(HTTP_HOST='localhost')
+        path = options['path']
+        remaining = [options['requests']]
+        lock = threading.Lock()
+        errors = []
+        opened = []
+
+        def count_connections(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        def start_response(status, headers, exc_info=None):
+            if not status.startswith(('2', '3')):
+                errors.append(status)
+
+        def worker():
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                environ = factory.get(path).environ
+                response = application(environ, start_response)
+                for _ in response:
+                    pass
+                # Fires request_finished, which closes or recycles connections
+                response.close()
+
+        connection_created.connect(count_connections)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        database = settings.DATABASES['default']
+        self.stdout.write(f'Engine: {database["ENGINE"]} (CONN_MAX_AGE={database.get("CONN_MAX_AGE", 0)})')
+        self.stdout.write(
+            f'{options["requests"]} requests to {path} with {options["concurrency"]} threads '
+            f'in {elapsed:.2f}s: {options["requests"] / elapsed:,.1f} req/s'
+        )
+        self.stdout.write(f'Django connect() calls: {len(opened)}, non-2xx/3xx responses: {len(errors)}')
+        for alias, stats in pool_stats().items():
+            mean_wait = stats['wait_seconds_total'] / stats['checkouts'] if stats['checkouts'] else 0
+            self.stdout.write(
+                f'Pool {alias}: {stats["checkouts"]} checkouts, '
+                f'{stats["connections_opened"]} opened, {stats["connections_closed"]} closed, '
+                f'mean wait {mean_wait * 1000:.3f}ms, max wait {stats["wait_seconds_max"] * 1000:.3f}ms, '
+                f'{stats["timeouts"]} timeouts'
+            )
@@ -0,0 +1,308 @@
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.runner import DiscoverRunner
+from venues.facets import normalize_filters, venue_facets
+from venues.forms import VenueForm
+from venues.fuzzy import search_with_fallback
+from venues.models import Category, Statistics, Venue
+from venues.pagination import EstimatedCountPaginator
+from venues.views import _facet_context, _place_q, _search_q
+
+from .bench_http import git_commit
+
+
+class Rollback(Exception):
+    """Raised to discard the dataset of one size"""
+
+
+BENCHMARKS = []
+
+
+def benchmark(scales=True):
+    """Register ``setup() -> callable``; unscaled ones only run at the first size"""
+    def register(setup):
+        BENCHMARKS.append((setup.__name__, setup, scales))
+        return setup
+    return register
+
+
+@benchmark()
+def venue_save_slug():
+    # A name many generated venues already carry, so the slug needs a suffix
+    category = Category.objects.first()
+
+    def run():
+        Venue(
+            name='The Grand Hotel',
+            description='Benchmark venue',
+            category=category,
+            address='1 Benchmark Street',
+            city='Paris',
+            country='France',
+        ).save()
+    return run
+
+
+@benchmark()
+def update_rating_stats():
+    venue = Venue.objects.order_by('-total_ratings').first()
+    return venue.update_rating_stats
+
+
+@benchmark()
+def statistics_update_all_stats():
+    return Statistics.get_or_create_stats().update_all_stats
+
+
+@benchmark(scales=False)
+def venue_form_clean():
+    category = Category.objects.first()
+    data = {
+        'name': 'Form Benchmark Hotel',
+        'description': 'A venue used to time form cleaning',
+        'category': category.pk,
+        'address': '1 Benchmark Street',
+        'city': 'Paris',
+        'country': 'France',
+        'currency': 'EUR',
+        # Comma-separated text, as the admin form sends it, for the clean_* methods to split
+        'facilities': json.dumps('WiFi, Parking, Air Conditioning, Gym, Bar, Terrace'),
+        'amenities': json.dumps('Pool, Spa, Sauna, Rooftop'),
+        'languages_spoken': json.dumps('English, French, Spanish'),
+        'is_active': True,
+    }
+
+    def run():
+        form = VenueForm(data=data)
+        if not form.is_valid():
+            raise CommandError(f'venue_form_clean: the benchmark form is invalid: {form.errors.as_text()}')
+    return run
+
+
+def venue_list_render(per_page):
+    def setup():
+        request = RequestFactory(HTTP_HOST='localhost').get('/venues/')
+        request.user = AnonymousUser()
+        venues = Venue.objects.filter(is_active=True).select_related('category').prefetch_related('images')
+        facets = venue_facets(venues, normalize_filters())
+        page = EstimatedCountPaginator(venues.order_by('-average_rating', '-total_ratings'), per_page).get_page(1)
+        # Only the template is timed, so the page's rows are loaded up front
+        page.object_list = list(page.object_list)
+        context = {
+            'venues': page,
+            'selected_category': None,
+            'search_query': None,
+            'fuzzy_search': False,
+            'city_filter': None,
+            'selected_tags': [],
+            **_facet_context(request, facets, list(Category.objects.all())),
+        }
+        return lambda: render_to_string('venues/venue_list.html', context, request)
+    setup.__name__ = f'render_venue_list_{per_page}'
+    return setup
+
+
+benchmark()(venue_list_render(12))
+benchmark()(venue_list_render(100))
+
+
+def search_queryset(query, location=''):
+    def setup():
+        def run():
+            venues = Venue.objects.filter(is_active=True)
+            if location:
+                venues = venues.filter(_place_q(location))
+            venues, fuzzy = search_with_fallback(venues, query, _search_q(query))
+            if not fuzzy:
+                venues = venues.order_by('-average_rating', '-total_ratings')
+            # What the results page needs: the first page and the total
+            return list(venues[:12]), venues.count()
+        return run
+    setup.__name__ = f'search_{query.replace(" ", "_").lower()}{"_in_" + location.lower() if location else ""}'
+    return setup
+
+
+benchmark()(search_queryset('hotel'))
+benchmark()(search_queryset('garden', location='Paris'))
+# Misspelt, so the trigram fallback runs
+benchmark()(search_queryset('restuarant'))
+
+
+def measure(function, rounds, min_time):
+    """Per-call timings over ``rounds`` rounds, each long enough to time reliably"""
+    function()
+    started = time.perf_counter()
+    function()
+    single = time.perf_counter() - started
+    iterations = max(1, math.ceil(min_time / single)) if single > 0 else 1000
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        timings.append((time.perf_counter() - started) / iterations)
+    return {
+        'rounds': rounds,
+        'iterations': iterations,
+        'min_ms': round(min(timings) * 1000, 4),
+        'max_ms': round(max(timings) * 1000, 4),
+        'mean_ms': round(statistics.mean(timings) * 1000, 4),
+        'median_ms': round(statistics.median(timings) * 1000, 4),
+        'stddev_ms': round(statistics.stdev(timings) * 1000, 4) if rounds > 1 else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Time model, form, template and search hot paths on generated datasets of several sizes '
+        'in a test database; --save stores a baseline and --compare shows the change against one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='Comma-separated venue counts to generate')
+        parser.add_argument('--ratings-per-venue', type=int, default=10, help='Ratings generated per venue')
+        parser.add_argument('--only', help='Comma-separated benchmark names to run (substring match)')
+        parser.add_argument('--rounds', type=int, default=7, help='Timed rounds per benchmark')
+        parser.add_argument('--min-time', type=float, default=0.05, help='Shortest round, in seconds')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed of the datasets')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+        parser.add_argument('--baseline-dir', default=os.path.join(settings.BASE_DIR, 'benchmarks'),
+                            help='Where baselines are stored')
+        parser.add_argument('--save', metavar='NAME', help='Store the results as baseline NAME')
+        parser.add_argument('--compare', metavar='NAME', help='Compare the results with baseline NAME')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent slowdown of the median reported as a regression')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, _, scales in BENCHMARKS:
+                self.stdout.write(f'{name}{"" if scales else " (first size only)"}')
+            return
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+        if not sizes or min(sizes) < 1 or options['rounds'] < 1:
+            raise CommandError('--sizes and --rounds must be at least 1')
+        selected = [
+            (name, setup, scales) for name, setup, scales in BENCHMARKS
+            if not options['only'] or any(part in name for part in options['only'].split(','))
+        ]
+        if not selected:
+            raise CommandError('No benchmark matches --only')
+        baseline = self._load(options['baseline_dir'], options['compare']) if options['compare'] else None
+
+        # A fresh test database keeps the datasets exactly the requested size
+        runner = DiscoverRunner(verbosity=0, keepdb=options['keepdb'])
+        old_config = runner.setup_databases()
+        try:
+            results = {}
+            for position, size in enumerate(sizes):
+                results.update(self._run_size(size, position == 0, selected, options))
+        finally:
+            runner.teardown_databases(old_config)
+
+        report = {
+            'meta': {
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'sizes': sizes,
+                'ratings_per_venue': options['ratings_per_venue'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        if options['save']:
+            path = self._path(options['baseline_dir'], options['save'])
+            os.makedirs(options['baseline_dir'], exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {path}'))
+        if baseline is not None:
+            self._compare(baseline, report, options['threshold'])
+
+    def _run_size(self, size, first, selected, options):
+        self.stdout.write(f'Generating {size} venues...')
+        results = {}
+        try:
+            with transaction.atomic():
+                call_command(
+                    'generate_dataset',
+                    venues=size,
+                    users=max(100, options['ratings_per_venue'] * 2, size // 10),
+                    ratings=size * options['ratings_per_venue'],
+                    seed=options['seed'],
+                    stdout=io.StringIO(),
+                )
+                for name, setup, scales in selected:
+                    if not scales and not first:
+                        continue
+                    key = f'{name}[{size}]' if scales else name
+                    # Each benchmark gets a savepoint so writes do not leak into the next one
+                    try:
+                        with transaction.atomic():
+                            results[key] = measure(setup(), options['rounds'], options['min_time'])
+                            raise Rollback
+                    except Rollback:
+                        pass
+                    row = results[key]
+                    self.stdout.write(
+                        f'{key:<40} median {row["median_ms"]:>10.3f}ms  min {row["min_ms"]:>10.3f}ms  '
+                        f'stddev {row["stddev_ms"]:>8.3f}ms  ({row["rounds"]}x{row["iterations"]})'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def _path(self, directory, name):
+        return name if name.endswith('.json') else os.path.join(directory, f'{name}.json')
+
+    def _load(self, directory, name):
+        path = self._path(directory, name)
+        try:
+            with open(path, encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+
+    def _compare(self, baseline, report, threshold):
+        self.stdout.write(
+            f'\nAgainst baseline from {baseline["meta"].get("commit")} ({baseline["meta"].get("started_at")}):'
+        )
+        regressions = []
+        for key, row in report['results'].items():
+            old = baseline['results'].get(key)
+            if old is None:
+                self.stdout.write(f'{key:<40} new benchmark')
+                continue
+            change = (row['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0.0
+            regressed = change > threshold
+            self.stdout.write(
+                f'{key:<40} {old["median_ms"]:>10.3f}ms -> {row["median_ms"]:>10.3f}ms {change:>+8.1f}%'
+                f'{"  REGRESSION" if regressed else ""}'
+            )
+            if regressed:
+                regressions.append(f'{key} {old["median_ms"]:.3f}ms -> {row["median_ms"]:.3f}ms ({change:+.1f}%)')
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {threshold:g}%.'))
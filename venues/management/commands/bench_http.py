@@ -0,0 +1,556 @@
+import asyncio
+import http.client
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client, RequestFactory
+from venues.models import Category, Venue
+
+
+# Relative share of each endpoint in the default traffic mix
+DEFAULT_MIX = {
+    'home': 15,
+    'venue_list': 15,
+    'venue_list_page': 5,
+    'category': 10,
+    'search': 15,
+    'detail': 25,
+    'autocomplete': 8,
+    'rate': 4,
+    'rate_post': 2,
+    'admin_dashboard': 1,
+}
+WRITE_ENDPOINTS = {'rate_post'}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, pct):
+    """Linearly interpolated percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': errors,
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 3)
+    return summary
+
+
+class TrafficMix:
+    """Builds requests for the weighted endpoint mix from catalogue samples"""
+
+    def __init__(self, weights, rng, sample_size, sessions, admin_session):
+        self.rng = rng
+        self.sessions = sessions
+        self.admin_session = admin_session
+        self.slugs = self._sample_slugs(sample_size)
+        self.categories = list(Category.objects.values_list('slug', flat=True))
+        if not self.slugs or not self.categories:
+            raise CommandError('The catalogue is empty; run generate_dataset first')
+        # A few venues get most of the detail traffic, as on the real site
+        self.slug_weights = [1 / rank for rank in range(1, len(self.slugs) + 1)]
+        names = Venue.objects.filter(slug__in=self.slugs).values_list('name', 'city')
+        self.words = sorted({word for name, _ in names for word in name.split() if len(word) > 3})
+        self.cities = sorted({city for _, city in names})
+
+        skipped = []
+        if not sessions:
+            skipped += [name for name in ('rate', 'rate_post') if weights.get(name)]
+        if not admin_session and weights.get('admin_dashboard'):
+            skipped.append('admin_dashboard')
+        self.skipped = skipped
+        self.endpoints = [name for name, weight in weights.items() if weight > 0 and name not in skipped]
+        self.weights = [weights[name] for name in self.endpoints]
+        if not self.endpoints:
+            raise CommandError('The traffic mix has no endpoint left to request')
+
+    def _sample_slugs(self, size):
+        """Slugs of up to ``size`` random active venues, without ORDER BY RANDOM()"""
+        bounds = Venue.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+        low, high = bounds.first(), bounds.last()
+        if low is None:
+            return []
+        pks = self.rng.sample(range(low, high + 1), min(size * 2, high - low + 1))
+        slugs = list(Venue.objects.filter(pk__in=pks, is_active=True).values_list('slug', flat=True)[:size])
+        self.rng.shuffle(slugs)
+        return slugs
+
+    def next(self):
+        """(endpoint, method, path, body, cookies)"""
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        return (endpoint, *getattr(self, f'_{endpoint}')())
+
+    def _venue(self):
+        return self.rng.choices(self.slugs, self.slug_weights)[0]
+
+    def _session(self):
+        return self.rng.choice(self.sessions)
+
+    def _home(self):
+        return 'GET', '/', None, {}
+
+    def _venue_list(self):
+        return 'GET', '/venues/', None, {}
+
+    def _venue_list_page(self):
+        return 'GET', f'/venues/?page={self.rng.randint(2, 20)}', None, {}
+
+    def _category(self):
+        return 'GET', f'/venues/category/{self.rng.choice(self.categories)}/', None, {}
+
+    def _search(self):
+        params = {'q': self.rng.choice(self.words)}
+        if self.rng.random() < 0.3:
+            params['location'] = self.rng.choice(self.cities)
+        return 'GET', f'/venues/search/?{urlencode(params)}', None, {}
+
+    def _detail(self):
+        return 'GET', f'/venue/{self._venue()}/', None, {}
+
+    def _autocomplete(self):
+        word = self.rng.choice(self.words)
+        return 'GET', f'/api/autocomplete/?{urlencode({"q": word[:self.rng.randint(2, len(word))]})}', None, {}
+
+    def _rate(self):
+        return 'GET', f'/venue/{self._venue()}/rate/', None, self._session()
+
+    def _rate_post(self):
+        body = urlencode({'rating': self.rng.randint(1, 5), 'comment': 'Load test rating'})
+        return 'POST', f'/venue/{self._venue()}/rate/', body, self._session()
+
+    def _admin_dashboard(self):
+        return 'GET', '/admin-dashboard/', None, self.admin_session
+
+
+class WSGITransport:
+    """Calls the WSGI application in this process"""
+
+    def __init__(self):
+        self.application = get_wsgi_application()
+        self.factory = RequestFactory(HTTP_HOST='localhost')
+
+    def __call__(self, method, path, body, cookies):
+        headers = request_headers(cookies)
+        extra = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in headers.items()}
+        if method == 'POST':
+            environ = self.factory.generic(
+                method, path, body.encode(), 'application/x-www-form-urlencoded', **extra
+            ).environ
+        else:
+            environ = self.factory.generic(method, path, **extra).environ
+        status = []
+
+        def start_response(status_line, response_headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        response = self.application(environ, start_response)
+        size = 0
+        try:
+            for chunk in response:
+                size += len(chunk)
+        finally:
+            # Fires request_finished, which closes or recycles connections
+            response.close()
+        return status[0], size
+
+
+class HTTPTransport:
+    """Sends requests to a running server over one keep-alive connection per thread"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise CommandError(f'Invalid --server URL: {url}')
+        self.parts = parts
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, 'connection', None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.parts.scheme == 'https' else http.client.HTTPConnection
+            conn = self.local.connection = factory(self.parts.hostname, self.parts.port, timeout=60)
+        return conn
+
+    def __call__(self, method, path, body, cookies):
+        headers = request_headers(cookies)
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        conn = self._connection()
+        try:
+            conn.request(method, self.parts.path.rstrip('/') + path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, len(response.read())
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.local.connection = None
+            raise
+
+
+def request_headers(cookies):
+    headers = {}
+    if cookies:
+        headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        # The CSRF cookie doubles as the token; Django accepts the unmasked secret
+        headers['X-CSRFToken'] = cookies[settings.CSRF_COOKIE_NAME]
+    return headers
+
+
+class Recorder:
+    """Latencies and statuses per endpoint, shared by every worker"""
+
+    def __init__(self, total=None, duration=None, warmup=0):
+        self.lock = threading.Lock()
+        self.total = total
+        self.duration = duration
+        self.warmup = warmup
+        self.issued = 0
+        self.started = None
+        self.deadline = None
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def claim(self):
+        """Whether another request may start, and whether it is a warm-up request"""
+        with self.lock:
+            if self.total is not None and self.issued >= self.total + self.warmup:
+                return False, False
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                return False, False
+            self.issued += 1
+            if self.issued <= self.warmup:
+                return True, True
+            if self.started is None:
+                # The clock starts with the first measured request
+                self.started = time.perf_counter()
+                if self.duration:
+                    self.deadline = self.started + self.duration
+            return True, False
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started is not None else 0.0
+
+    def record(self, endpoint, seconds, status=None, error=None):
+        with self.lock:
+            if error is not None:
+                self.errors.setdefault(endpoint, []).append(error)
+                return
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the site with a scripted traffic mix and report throughput and p50/p95/p99 '
+        'per endpoint as JSON; --compare flags regressions between two result files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--target', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='In-process application to drive (ignored with --server)')
+        parser.add_argument('--server', help='Base URL of a running server to drive instead, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Measured requests')
+        parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+        parser.add_argument('--warmup', type=int, default=100, help='Unmeasured requests sent first')
+        parser.add_argument('--mix', help='Endpoint weights, e.g. "home=1,detail=3"; omitted endpoints keep theirs')
+        parser.add_argument('--read-only', action='store_true', help='Leave out endpoints that write to the database')
+        parser.add_argument('--sessions', type=int, default=10, help='Signed-in users for the rating endpoints')
+        parser.add_argument('--sample', type=int, default=1000, help='Venues sampled for detail and rating pages')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--label', default='', help='Free-form label stored with the results')
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                            help='Compare two result files instead of running')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent slowdown (or throughput drop) reported as a regression')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Latency changes smaller than this are never regressions')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'], options['min_delta_ms'])
+        if options['concurrency'] < 1 or options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--concurrency and --requests must be at least 1')
+
+        weights = self._weights(options['mix'], options['read_only'])
+        rng = random.Random(options['seed'])
+        sessions = self._sessions(rng, options['sessions'], admin=False)
+        admin_sessions = self._sessions(rng, 1, admin=True)
+        mix = TrafficMix(weights, rng, options['sample'], sessions, admin_sessions[0] if admin_sessions else None)
+        for endpoint in mix.skipped:
+            self.stderr.write(f'Skipping {endpoint}: no suitable user to sign in as')
+
+        if options['server']:
+            target = options['server']
+            transport = HTTPTransport(options['server'])
+        else:
+            target = options['target']
+            transport = WSGITransport() if target == 'wsgi' else None
+
+        started_at = datetime.now(timezone.utc)
+        recorder = Recorder(
+            total=None if options['duration'] else options['requests'],
+            duration=options['duration'],
+            warmup=options['warmup'],
+        )
+        self.stdout.write(
+            f'Driving {target} with {options["concurrency"]} clients '
+            f'({", ".join(f"{name}={weight}" for name, weight in zip(mix.endpoints, mix.weights))})'
+        )
+        if target == 'asgi':
+            asyncio.run(self._run_asgi(mix, recorder, options['concurrency']))
+        else:
+            self._run_threads(transport, mix, recorder, options['concurrency'])
+        elapsed = recorder.elapsed()
+
+        results = self._results(options, target, started_at, elapsed, recorder)
+        self._print(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def _weights(self, spec, read_only):
+        weights = dict(DEFAULT_MIX)
+        for item in filter(None, (spec or '').split(',')):
+            name, _, value = item.partition('=')
+            if name.strip() not in DEFAULT_MIX:
+                raise CommandError(f'Unknown endpoint "{name.strip()}"; choose from {", ".join(DEFAULT_MIX)}')
+            try:
+                weights[name.strip()] = float(value)
+            except ValueError:
+                raise CommandError(f'Invalid weight in "{item}"')
+        if read_only:
+            for name in WRITE_ENDPOINTS:
+                weights[name] = 0
+        return weights
+
+    def _sessions(self, rng, count, admin):
+        """Cookies of up to ``count`` signed-in users; the server must share the session store"""
+        users = User.objects.filter(is_active=True, profile__is_admin=admin).order_by('pk')
+        pks = list(users.values_list('pk', flat=True)[:max(count * 20, 100)])
+        sessions = []
+        for user in User.objects.filter(pk__in=rng.sample(pks, min(count, len(pks)))):
+            client = Client()
+            client.force_login(user)
+            sessions.append({
+                settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value,
+                settings.CSRF_COOKIE_NAME: _get_new_csrf_string(),
+            })
+        return sessions
+
+    def _run_threads(self, transport, mix, recorder, concurrency):
+        mix_lock = threading.Lock()
+
+        def worker():
+            while True:
+                go, warmup = recorder.claim()
+                if not go:
+                    return
+                with mix_lock:
+                    endpoint, method, path, body, cookies = mix.next()
+                started = time.perf_counter()
+                try:
+                    status, _ = transport(method, path, body, cookies)
+                except Exception as e:
+                    recorder.record(endpoint, 0, error=f'{type(e).__name__}: {e}')
+                    continue
+                if not warmup:
+                    recorder.record(endpoint, time.perf_counter() - started, status)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    async def _run_asgi(self, mix, recorder, concurrency):
+        application = get_asgi_application()
+
+        async def send_request(method, path, body, cookies):
+            path, _, query = path.partition('?')
+            headers = [(b'host', b'localhost')]
+            headers += [(name.lower().encode(), value.encode()) for name, value in request_headers(cookies).items()]
+            if method == 'POST':
+                headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            }
+            request_body = [{'type': 'http.request', 'body': (body or '').encode(), 'more_body': False}]
+            response = {'status': None, 'size': 0}
+
+            async def receive():
+                if request_body:
+                    return request_body.pop()
+                # Only reached once the response is done
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response['status'] = message['status']
+                elif message['type'] == 'http.response.body':
+                    response['size'] += len(message.get('body', b''))
+
+            await application(scope, receive, send)
+            return response['status'], response['size']
+
+        async def worker():
+            while True:
+                go, warmup = recorder.claim()
+                if not go:
+                    return
+                endpoint, method, path, body, cookies = mix.next()
+                started = time.perf_counter()
+                try:
+                    status, _ = await send_request(method, path, body, cookies)
+                except Exception as e:
+                    recorder.record(endpoint, 0, error=f'{type(e).__name__}: {e}')
+                    continue
+                if not warmup:
+                    recorder.record(endpoint, time.perf_counter() - started, status)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    def _results(self, options, target, started_at, elapsed, recorder):
+        endpoints = {}
+        all_latencies = []
+        all_statuses = {}
+        all_errors = 0
+        for endpoint in sorted(set(recorder.latencies) | set(recorder.errors)):
+            latencies = recorder.latencies.get(endpoint, [])
+            statuses = recorder.statuses.get(endpoint, {})
+            errors = recorder.errors.get(endpoint, [])
+            endpoints[endpoint] = summarize(latencies, statuses, len(errors), elapsed)
+            if errors:
+                endpoints[endpoint]['error_samples'] = errors[:5]
+            all_latencies.extend(latencies)
+            for status, count in statuses.items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+            all_errors += len(errors)
+        return {
+            'meta': {
+                'label': options['label'],
+                'started_at': started_at.isoformat(),
+                'target': target,
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+                'duration_s': round(elapsed, 3),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'venues': Venue.objects.count(),
+            },
+            'total': summarize(all_latencies, all_statuses, all_errors, elapsed),
+            'endpoints': endpoints,
+        }
+
+    def _print(self, results):
+        header = f'{"endpoint":<18}{"requests":>9}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}'
+        self.stdout.write(header)
+        rows = list(results['endpoints'].items()) + [('TOTAL', results['total'])]
+        for name, row in rows:
+            self.stdout.write(
+                f'{name:<18}{row["requests"]:>9}{row["throughput_rps"]:>10.1f}{row["p50_ms"]:>10.2f}'
+                f'{row["p95_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["errors"]:>8}'
+            )
+        failed = {
+            status: count for status, count in results['total']['statuses'].items() if int(status) >= 500
+        }
+        if failed:
+            self.stderr.write(f'Server errors: {failed}')
+
+    def compare(self, baseline_path, candidate_path, threshold, min_delta_ms):
+        baseline = load_results(baseline_path)
+        candidate = load_results(candidate_path)
+        self.stdout.write(
+            f'Baseline {baseline["meta"].get("label") or baseline_path} ({baseline["meta"].get("commit")}) vs '
+            f'candidate {candidate["meta"].get("label") or candidate_path} ({candidate["meta"].get("commit")})'
+        )
+        if baseline['meta'].get('concurrency') != candidate['meta'].get('concurrency') or \
+                baseline['meta'].get('target') != candidate['meta'].get('target'):
+            self.stderr.write('Warning: the runs used a different target or concurrency')
+
+        regressions = []
+        rows = [('TOTAL', baseline['total'], candidate['total'])] + [
+            (name, baseline['endpoints'][name], candidate['endpoints'][name])
+            for name in sorted(set(baseline['endpoints']) & set(candidate['endpoints']))
+        ]
+        self.stdout.write(f'{"endpoint":<18}{"metric":<16}{"baseline":>12}{"candidate":>12}{"change":>10}')
+        for name, old, new in rows:
+            metrics = [f'p{pct}_ms' for pct in PERCENTILES]
+            if name == 'TOTAL':
+                # Per-endpoint rates mostly follow the random mix, so only the total is compared
+                metrics.append('throughput_rps')
+            for metric in metrics:
+                before, after = old[metric], new[metric]
+                change = (after - before) / before * 100 if before else 0.0
+                if metric == 'throughput_rps':
+                    regressed = change < -threshold
+                else:
+                    regressed = change > threshold and after - before >= min_delta_ms
+                marker = '  REGRESSION' if regressed else ''
+                self.stdout.write(f'{name:<18}{metric:<16}{before:>12.2f}{after:>12.2f}{change:>+9.1f}%{marker}')
+                if regressed:
+                    regressions.append(f'{name} {metric} {before:.2f} -> {after:.2f} ({change:+.1f}%)')
+            if new['errors'] > old['errors']:
+                regressions.append(f'{name} errors {old["errors"]} -> {new["errors"]}')
+        for name in sorted(set(baseline['endpoints']) ^ set(candidate['endpoints'])):
+            self.stderr.write(f'{name} is only in one of the runs')
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {threshold:g}%.'))
+
+
+def load_results(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            results = json.load(handle)
+    except (OSError, ValueError) as e:
+        raise CommandError(f'Cannot read {path}: {e}')
+    if not {'meta', 'total', 'endpoints'} <= set(results):
+        raise CommandError(f'{path} is not a bench_http result file')
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,96 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+from venues.models import Category, Venue
+from venues.slugs import repair_slugs
+
+
+COMMON_NAMES = ['Grand Hotel', 'Cafe Central', 'Pizza Roma', 'City Museum', 'Sunset Bar']
+
+
+class Rollback(Exception):
+    """Raised to discard everything a benchmark wrote"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark slug repair for many slugless venues sharing a few names (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Venues repaired by the batch allocator')
+        parser.add_argument('--names', type=int, default=len(COMMON_NAMES), help='Distinct names shared by the venues')
+        parser.add_argument('--legacy-count', type=int, default=2000, help='Venues repaired by the old per-venue loop')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Batch size for the allocator')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        names = (COMMON_NAMES * (options['names'] // len(COMMON_NAMES) + 1))[:options['names']]
+        names = [f'{name} {i // len(COMMON_NAMES)}' if i >= len(COMMON_NAMES) else name for i, name in enumerate(names)]
+
+        if options['legacy_count']:
+            elapsed, queries = self._run(rng, names, options['legacy_count'], self._legacy_repair)
+            self._report('per-venue loop', options['legacy_count'], elapsed, queries)
+
+        elapsed, queries = self._run(
+            rng, names, options['count'],
+            lambda venues: repair_slugs(venues, options['batch_size']),
+        )
+        self._report('batch allocator', options['count'], elapsed, queries)
+
+    def _run(self, rng, names, count, repair):
+        """Create slugless venues, time ``repair`` on them and roll everything back"""
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name='Benchmark', slug='benchmark-slugs')
+                # The slug column is unique, so pending venues get placeholders
+                Venue.objects.bulk_create(
+                    [
+                        Venue(
+                            name=rng.choice(names),
+                            slug=f'bench-pending-{i}',
+                            description='Benchmark venue',
+                            category=category,
+                            address='1 Benchmark Street',
+                            city='Benchmark City',
+                            country='Benchmark Country',
+                        )
+                        for i in range(count)
+                    ],
+                    batch_size=1000,
+                )
+                pending = Venue.objects.filter(slug__startswith='bench-pending-')
+                queries = []
+
+                def count_query(execute, sql, params, many, context):
+                    queries.append(sql)
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(count_query):
+                    start = time.perf_counter()
+                    repair(pending)
+                    elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed, len(queries)
+
+    def _legacy_repair(self, pending):
+        """The original fix_venue_slugs loop: one exists() query per collision"""
+        for venue in pending.order_by('pk'):
+            original_slug = slugify(venue.name)
+            venue.slug = original_slug
+            counter = 1
+            while Venue.objects.filter(slug=venue.slug).exclude(pk=venue.pk).exists():
+                venue.slug = f"{original_slug}-{counter}"
+                counter += 1
+            venue.save(update_fields=['slug'])
+
+    def _report(self, label, count, elapsed, queries):
+        rate = count / elapsed if elapsed else float('inf')
+        self.stdout.write(
+            f'{label:>16}: {count} venues in {elapsed:.2f}s '
+            f'({rate:,.0f} venues/s, {queries} queries)'
+        )
@@ -0,0 +1,137 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import Category, Rating, Venue
+
+
+ENGINES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'venue_rating_system.db_backends.sqlite3',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare stock and tuned SQLite under concurrent browsing and rating '
+        'on throwaway database files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Threads browsing the venue list')
+        parser.add_argument('--writers', type=int, default=4, help='Threads submitting ratings')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+        parser.add_argument('--venues', type=int, default=500, help='Venues to seed')
+        parser.add_argument('--users', type=int, default=200, help='Users to seed')
+        parser.add_argument('--mode', choices=['both'] + sorted(ENGINES), default='both', help='Which configuration to run')
+
+    def handle(self, *args, **options):
+        modes = sorted(ENGINES) if options['mode'] == 'both' else [options['mode']]
+        workdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+        try:
+            for mode in modes:
+                result = self.run_mode(mode, os.path.join(workdir, f'{mode}.sqlite3'), options)
+                self.stdout.write(
+                    f'{mode:>6}: reads {result["reads"] / result["elapsed"]:,.1f}/s, '
+                    f'writes {result["writes"] / result["elapsed"]:,.1f}/s, '
+                    f'lock errors {result["locked"]} '
+                    f'({result["locked"] / max(result["writes"] + result["locked"], 1):.1%} of write attempts)'
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_mode(self, mode, path, options):
+        alias = f'bench_{mode}'
+        configured = connections.configure_settings({
+            'default': connections.settings['default'],
+            alias: {'ENGINE': ENGINES[mode], 'NAME': path},
+        })
+        connections.settings[alias] = configured[alias]
+        call_command('migrate', database=alias, verbosity=0)
+        self.seed(alias, options)
+
+        venue_ids = list(Venue.objects.using(alias).values_list('id', flat=True))
+        user_ids = list(User.objects.using(alias).values_list('id', flat=True))
+        counters = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        def reader():
+            rng = random.Random()
+            try:
+                while time.monotonic() < deadline:
+                    venues = Venue.objects.using(alias).filter(is_active=True).order_by('-average_rating', '-total_ratings')
+                    offset = rng.randrange(0, max(len(venue_ids) - 12, 1))
+                    venues.count()
+                    list(venues[offset:offset + 12])
+                    count('reads')
+            finally:
+                connections[alias].close()
+
+        def writer():
+            rng = random.Random()
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        with write_atomic(using=alias):
+                            venue = Venue.objects.using(alias).get(pk=rng.choice(venue_ids))
+                            Rating.objects.using(alias).update_or_create(
+                                venue=venue,
+                                user_id=rng.choice(user_ids),
+                                defaults={'rating': rng.randint(1, 5), 'comment': 'Benchmark'},
+                            )
+                            venue.update_rating_stats()
+                        count('writes')
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        count('locked')
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters['elapsed'] = time.monotonic() - start
+
+        connections[alias].close()
+        del connections.settings[alias]
+        return counters
+
+    def seed(self, alias, options):
+        # bulk_create skips the profile signal, which would write to default
+        User.objects.using(alias).bulk_create(
+            [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(options['users'])]
+        )
+        category = Category.objects.using(alias).create(name='Benchmark', slug='benchmark')
+        Venue.objects.using(alias).bulk_create(
+            [
+                Venue(
+                    name=f'Venue {i}',
+                    slug=f'venue-{i}',
+                    description='Benchmark venue',
+                    category=category,
+                    address=f'{i} Benchmark Street',
+                    city='Benchmark City',
+                    country='Benchmark Country',
+                )
+                for i in range(options['venues'])
+            ],
+            batch_size=500,
+        )
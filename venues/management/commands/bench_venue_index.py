@@ -0,0 +1,106 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from venues.bitmaps import VenueBitmapIndex
+from venues.facets import price_band_q, rating_band_q
+from venues.models import Category, Venue
+
+
+PAGE_SIZE = 12
+
+
+class Command(BaseCommand):
+    help = 'Check the in-memory venue index against the database and benchmark it against querysets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per filter combination')
+        parser.add_argument('--check-only', action='store_true', help='Only run the consistency check')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        index = VenueBitmapIndex()
+        started = time.perf_counter()
+        index.build()
+        self.stdout.write(f'Built index over {index.count(index.filter())} venues in {time.perf_counter() - started:.3f}s')
+
+        problems = index.verify()
+        for problem in problems[:20]:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f'Index is inconsistent with the database ({len(problems)} problems)')
+        self.stdout.write(self.style.SUCCESS('Index matches the database.'))
+        if options['check_only']:
+            return
+
+        mismatches = 0
+        for label, filters in self._combinations():
+            queryset = Venue.objects.filter(queryset_filter(filters)).order_by('-average_rating', '-total_ratings', 'id')
+            orm_seconds, (orm_count, orm_page) = self._time(
+                options['repeat'],
+                lambda: (queryset.count(), list(queryset.values_list('id', flat=True)[:PAGE_SIZE])),
+            )
+
+            def from_index():
+                mask = index.filter(**filters)
+                return index.count(mask), index.ordered(mask, 0, PAGE_SIZE)
+
+            index_seconds, (index_count, index_page) = self._time(options['repeat'], from_index)
+            same = orm_count == index_count and orm_page == index_page
+            mismatches += not same
+            self.stdout.write(
+                f'{label:<32} {orm_count:>8} rows  '
+                f'orm {orm_seconds * 1000:8.2f}ms  index {index_seconds * 1000:8.3f}ms  '
+                f'x{orm_seconds / max(index_seconds, 1e-9):7.1f}'
+                + ('' if same else '  MISMATCH')
+            )
+
+        if mismatches:
+            raise CommandError(f'{mismatches} filter combinations returned different results')
+
+    def _combinations(self):
+        """(label, index filters) pairs for representative listing filters"""
+        combinations = [('all active', {'active': True})]
+        categories = list(Category.objects.order_by('name')[:3])
+        for category in categories:
+            combinations.append((f'category {category.slug}', {'active': True, 'category': category.pk}))
+        combinations += [
+            ('featured', {'active': True, 'featured': True}),
+            ('rating 4+', {'active': True, 'rating': '4'}),
+            ('budget', {'active': True, 'price': 'budget'}),
+        ]
+        if categories:
+            combinations.append((
+                f'category {categories[0].slug} + rating 4+',
+                {'active': True, 'category': categories[0].pk, 'rating': '4'},
+            ))
+        return combinations
+
+    def _time(self, repeat, run):
+        """Return the best time of ``repeat`` runs and the last result"""
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+
+def queryset_filter(filters):
+    """Q object equivalent to a set of index filters"""
+    q = Q()
+    for name, value in filters.items():
+        if name == 'active':
+            q &= Q(is_active=value)
+        elif name == 'featured':
+            q &= Q(is_featured=value)
+        elif name == 'category':
+            q &= Q(category_id=value)
+        elif name == 'price':
+            q &= price_band_q(value)
+        elif name == 'rating':
+            q &= rating_band_q(value)
+    return q
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand
+from venues.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = 'Print catalogue changes after a cursor as JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=int,
+            default=0,
+            help='Sequence number of the last change already processed',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Changes fetched per page',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Keep paging until the feed is exhausted',
+        )
+
+    def handle(self, *args, **options):
+        cursor = options['since']
+        # Entries past an unsettled gap are returned again on the next page
+        printed = set()
+        while True:
+            entries, has_more, next_cursor = ChangeLogEntry.changes_since(cursor, options['limit'])
+            for entry in entries:
+                if entry.seq in printed:
+                    continue
+                printed.add(entry.seq)
+                self.stdout.write(json.dumps({
+                    'seq': entry.seq,
+                    'model': entry.model,
+                    'object_id': entry.object_id,
+                    'action': entry.action,
+                    'created_at': entry.created_at.isoformat(),
+                }))
+            cursor = next_cursor
+            if not (options['all'] and has_more):
+                break
+
+        self.stderr.write(f'Next cursor: {cursor}')
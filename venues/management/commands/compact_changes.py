@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from venues.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = 'Remove superseded change-log entries older than a retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help='Keep every entry newer than this many days',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['keep_days'])
+        deleted = ChangeLogEntry.compact(before)
+        self.stdout.write(
+            self.style.SUCCESS(f'Removed {deleted} superseded change-log entries.')
+        )
@@ -0,0 +1,75 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from venues.exports import EXPORTS, EXPORT_FORMATS, EXPORT_CHUNK_SIZE, iter_export, parse_since
+
+
+class Command(BaseCommand):
+    help = 'Stream venues or ratings to a CSV or NDJSON file in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'dataset',
+            choices=sorted(EXPORTS),
+            help='What to export',
+        )
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            type=str,
+            help='Output file (defaults to stdout)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip',
+        )
+        parser.add_argument('--category', type=str, help='Only export this category slug')
+        parser.add_argument('--city', type=str, help='Only export venues in this city')
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only export rows updated at or after this ISO date/datetime',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = iter_export(
+            options['dataset'],
+            export_format=options['format'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+            category=options['category'],
+            city=options['city'],
+            since=since,
+        )
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(
+                f'Exported {options["dataset"]} to {options["output"]}'
+            ))
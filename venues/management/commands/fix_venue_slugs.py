@@ -1,12 +1,22 @@
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
-from venues.models import Venue
+from django.db.models import Q
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import ChangeLogEntry, Venue
+from venues.slugs import repair_slugs
 
 class Command(BaseCommand):
     help = 'Fix venues with empty or missing slugs'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues updated per query',
+        )
+
     def handle(self, *args, **options):
-        venues_without_slugs = Venue.objects.filter(slug__isnull=True) | Venue.objects.filter(slug='')
+        venues_without_slugs = Venue.objects.filter(Q(slug__isnull=True) | Q(slug=''))
         
         if not venues_without_slugs.exists():
             self.stdout.write(self.style.SUCCESS('No venues with empty slugs found.'))
@@ -14,20 +24,15 @@ class Command(BaseCommand):
         
         self.stdout.write(f'Found {venues_without_slugs.count()} venues with empty slugs. Fixing...')
         
-        fixed_count = 0
-        for venue in venues_without_slugs:
-            original_slug = slugify(venue.name)
-            venue.slug = original_slug
-            
-            # Ensure uniqueness
-            counter = 1
-            while Venue.objects.filter(slug=venue.slug).exclude(pk=venue.pk).exists():
-                venue.slug = f"{original_slug}-{counter}"
-                counter += 1
-            
-            venue.save()
-            fixed_count += 1
-            self.stdout.write(f'Fixed: {venue.name} -> {venue.slug}')
+        def report(batch):
+            # bulk_update bypasses the change-feed signals
+            ChangeLogEntry.record_many(Venue, [venue.pk for venue in batch], 'update', affects_search=False)
+            if options['verbosity'] > 1:
+                for venue in batch:
+                    self.stdout.write(f'Fixed: {venue.name} -> {venue.slug}')
+        
+        with write_atomic():
+            fixed_count = repair_slugs(venues_without_slugs, options['batch_size'], on_batch=report)
         
         self.stdout.write(
             self.style.SUCCESS(f'Successfully fixed {fixed_count} venue slugs.')
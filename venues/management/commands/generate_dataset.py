@@ -0,0 +1,331 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.text import slugify
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import Category, City, Country, Rating, Statistics, UserProfile, Venue, VenueImage
+from venues.slugs import SlugAllocator
+
+
+CATEGORIES = [
+    ('Hotels', 'hotels', 'fas fa-hotel', 'Hotel'),
+    ('Restaurants', 'restaurants', 'fas fa-utensils', 'Restaurant'),
+    ('Cafes', 'cafes', 'fas fa-coffee', 'Cafe'),
+    ('Attractions', 'attractions', 'fas fa-landmark', 'Museum'),
+]
+
+# (city, country, currency, latitude, longitude), roughly in order of popularity
+CITIES = [
+    ('Paris', 'France', 'EUR', 48.8566, 2.3522),
+    ('London', 'United Kingdom', 'GBP', 51.5074, -0.1278),
+    ('New York', 'United States', 'USD', 40.7128, -74.0060),
+    ('Tokyo', 'Japan', 'JPY', 35.6762, 139.6503),
+    ('Rome', 'Italy', 'EUR', 41.9028, 12.4964),
+    ('Barcelona', 'Spain', 'EUR', 41.3874, 2.1686),
+    ('Berlin', 'Germany', 'EUR', 52.5200, 13.4050),
+    ('Amsterdam', 'Netherlands', 'EUR', 52.3676, 4.9041),
+    ('Istanbul', 'Turkey', 'TRY', 41.0082, 28.9784),
+    ('Bangkok', 'Thailand', 'THB', 13.7563, 100.5018),
+    ('Dubai', 'United Arab Emirates', 'AED', 25.2048, 55.2708),
+    ('Singapore', 'Singapore', 'SGD', 1.3521, 103.8198),
+    ('Los Angeles', 'United States', 'USD', 34.0522, -118.2437),
+    ('Madrid', 'Spain', 'EUR', 40.4168, -3.7038),
+    ('Prague', 'Czech Republic', 'CZK', 50.0755, 14.4378),
+    ('Vienna', 'Austria', 'EUR', 48.2082, 16.3738),
+    ('Lisbon', 'Portugal', 'EUR', 38.7223, -9.1393),
+    ('Sydney', 'Australia', 'AUD', -33.8688, 151.2093),
+    ('Lyon', 'France', 'EUR', 45.7640, 4.8357),
+    ('Milan', 'Italy', 'EUR', 45.4642, 9.1900),
+    ('Munich', 'Germany', 'EUR', 48.1351, 11.5820),
+    ('Kyoto', 'Japan', 'JPY', 35.0116, 135.7681),
+    ('Chicago', 'United States', 'USD', 41.8781, -87.6298),
+    ('Edinburgh', 'United Kingdom', 'GBP', 55.9533, -3.1883),
+    ('Marrakesh', 'Morocco', 'MAD', 31.6295, -7.9811),
+    ('Mexico City', 'Mexico', 'MXN', 19.4326, -99.1332),
+    ('Buenos Aires', 'Argentina', 'ARS', -34.6037, -58.3816),
+    ('Cape Town', 'South Africa', 'ZAR', -33.9249, 18.4241),
+    ('Seville', 'Spain', 'EUR', 37.3891, -5.9845),
+    ('Nice', 'France', 'EUR', 43.7102, 7.2620),
+    ('Zürich', 'Switzerland', 'CHF', 47.3769, 8.5417),
+    ('Kraków', 'Poland', 'PLN', 50.0647, 19.9450),
+]
+TOWN_PREFIXES = ['Saint', 'North', 'Old', 'New', 'Upper', 'Lower', 'Port', 'Mount', 'Lake', 'West']
+TOWN_ROOTS = ['Alden', 'Bramble', 'Castel', 'Dunmore', 'Elmwood', 'Fairhaven', 'Glen', 'Harbor', 'Ivy', 'Juniper',
+              'Kings', 'Linden', 'Marlow', 'Norbury', 'Oak', 'Pine', 'Queens', 'Riverside', 'Stone', 'Thorn']
+
+NAME_WORDS = ['Grand', 'Royal', 'Golden', 'Blue', 'Little', 'Old Town', 'Riverside', 'Garden', 'Central', 'Harbor',
+              'Sunset', 'Silver', 'Corner', 'Park', 'Hidden', 'Palace', 'Urban', 'Green', 'Lantern', 'Market']
+STREETS = ['Main Street', 'High Street', 'Market Square', 'Station Road', 'Church Lane', 'Park Avenue',
+           'River Walk', 'Harbor Road', 'Castle Street', 'Garden Row']
+FACILITIES = ['WiFi', 'Parking', 'Air Conditioning', 'Wheelchair Access', 'Restaurant', 'Bar', 'Gym',
+              'Pet Friendly', 'Terrace', 'Room Service', 'Conference Room', 'Laundry']
+AMENITIES = ['Pool', 'Spa', 'Sauna', 'Garden', 'Playground', 'Live Music', 'Rooftop', 'Sea View', 'Library']
+LANGUAGES = ['English', 'French', 'Spanish', 'German', 'Italian', 'Japanese', 'Mandarin', 'Arabic', 'Portuguese']
+DESCRIPTIONS = [
+    'A {word} favourite in {city}, known for friendly staff and a relaxed atmosphere.',
+    'Set in the heart of {city}, this {kind} mixes local character with modern comfort.',
+    'Locals and visitors alike come back to this {kind} for its {word} charm.',
+    'A quiet {kind} a short walk from the busiest streets of {city}.',
+]
+COMMENTS = [
+    'Great place, would come back.',
+    'Friendly staff and a lovely atmosphere.',
+    'Good value for money.',
+    'A bit noisy in the evening but otherwise fine.',
+    'Not what the photos suggested.',
+    'Excellent location, everything within walking distance.',
+    'Service was slow, the rest was good.',
+    'One of the best in town.',
+]
+FIRST_NAMES = ['Alex', 'Sam', 'Maria', 'Chen', 'Fatima', 'Luca', 'Noor', 'Kenji', 'Ana', 'Tom', 'Priya', 'Jonas']
+LAST_NAMES = ['Smith', 'Garcia', 'Müller', 'Rossi', 'Tanaka', 'Kowalski', 'Haddad', 'Silva', 'Nguyen', 'Dubois']
+# Share of each star value, skewed towards the positive end like most review sites
+RATING_WEIGHTS = [5, 8, 17, 35, 35]
+
+
+def zipf_weights(count, exponent):
+    """Weights of ranks 1..count under a Zipf distribution"""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def allocate(total, weights, cap):
+    """Split ``total`` into integers proportional to ``weights``, none above ``cap``.
+
+    Shares cut off by the cap go to the remaining ranks, so the result adds
+    up to ``total`` unless every rank is full.
+    """
+    counts = [0] * len(weights)
+    open_ranks = list(range(len(weights)))
+    remaining = total
+    while remaining > 0 and open_ranks:
+        weight_sum = sum(weights[rank] for rank in open_ranks)
+        still_open = []
+        assigned = 0
+        for rank in open_ranks:
+            share = min(cap - counts[rank], int(remaining * weights[rank] / weight_sum))
+            counts[rank] += share
+            assigned += share
+            if counts[rank] < cap:
+                still_open.append(rank)
+        if not assigned:
+            # Rounding left less than one rating per rank: hand out the rest by rank
+            for rank in still_open[:remaining]:
+                counts[rank] += 1
+                assigned += 1
+        remaining -= assigned
+        open_ranks = still_open
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible synthetic dataset of venues, users and ratings for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--venues', type=int, default=10000, help='Number of venues to create')
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--ratings', type=int, default=100000, help='Number of ratings to create')
+        parser.add_argument('--categories', type=int, default=len(CATEGORIES),
+                            help='Number of categories to use; extra ones are created after the standard four')
+        parser.add_argument('--cities', type=int, default=200,
+                            help='Number of distinct cities; beyond the built-in list, towns are made up')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Zipf exponent for venue popularity and city size (higher is more skewed)')
+        parser.add_argument('--comment-ratio', type=float, default=0.3, help='Share of ratings with a comment')
+        parser.add_argument('--images', type=int, default=3, help='Most image stubs per venue')
+        parser.add_argument('--user-prefix', default='bench', help='Username prefix of the generated users')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per query')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        if min(options['venues'], options['users'], options['ratings'], options['images']) < 0:
+            raise CommandError('Counts cannot be negative')
+        if min(options['categories'], options['cities'], options['batch_size']) < 1:
+            raise CommandError('--categories, --cities and --batch-size must be at least 1')
+        if options['ratings'] and not (options['venues'] and options['users']):
+            raise CommandError('Ratings need at least one venue and one user')
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(f'{connection.vendor} does not return ids from bulk inserts')
+        if User.objects.filter(username__startswith=options['user_prefix']).exists():
+            raise CommandError(
+                f'Users named "{options["user_prefix"]}..." already exist; pass another --user-prefix'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.comment_ratio = options['comment_ratio']
+        started = time.perf_counter()
+
+        categories = self._categories(options['categories'])
+        cities = self._cities(options['cities'])
+        user_ids = self._users(options['users'], options['user_prefix'], options['password'])
+
+        # Popularity ranks are shuffled so the busiest venues are spread over the id range
+        rating_counts = allocate(
+            options['ratings'], zipf_weights(options['venues'], options['zipf']), len(user_ids)
+        )
+        self.rng.shuffle(rating_counts)
+        totals = self._venues(options, categories, cities, user_ids, rating_counts)
+
+        City.recount()
+        Country.recount()
+        Statistics.get_or_create_stats().update_all_stats()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["venues"]} venues, {len(user_ids)} users, {totals["ratings"]} ratings '
+            f'and {totals["images"]} images in {elapsed:.1f}s.'
+        ))
+
+    def _categories(self, count):
+        """(category id, venue noun) pairs, with Zipf-like weights for the venue mix"""
+        specs = CATEGORIES[:count] + [
+            (f'Category {number}', f'category-{number}', 'fas fa-star', 'Place')
+            for number in range(len(CATEGORIES) + 1, count + 1)
+        ]
+        categories = []
+        for name, slug, icon, noun in specs:
+            category, _ = Category.objects.get_or_create(slug=slug, defaults={'name': name, 'icon': icon})
+            categories.append((category.pk, noun))
+        return categories
+
+    def _cities(self, count):
+        """(city, country, currency, latitude, longitude) for ``count`` cities"""
+        cities = list(CITIES[:count])
+        while len(cities) < count:
+            base = CITIES[len(cities) % len(CITIES)]
+            number = len(cities) // len(CITIES)
+            name = f'{TOWN_PREFIXES[number % len(TOWN_PREFIXES)]} {TOWN_ROOTS[number // len(TOWN_PREFIXES) % len(TOWN_ROOTS)]}'
+            if number >= len(TOWN_PREFIXES) * len(TOWN_ROOTS):
+                name = f'{name} {number // (len(TOWN_PREFIXES) * len(TOWN_ROOTS)) + 1}'
+            # Towns sit within a few hundred kilometres of the city they are modelled on
+            cities.append((
+                name, base[1], base[2],
+                base[3] + self.rng.uniform(-2, 2), base[4] + self.rng.uniform(-2, 2),
+            ))
+        return cities
+
+    def _users(self, count, prefix, password):
+        # Hashing once keeps user creation fast; every account can still log in
+        hashed = make_password(password)
+        for start in range(0, count, self.batch_size):
+            with write_atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f'{prefix}{number}',
+                        email=f'{prefix}{number}@example.com',
+                        first_name=self.rng.choice(FIRST_NAMES),
+                        last_name=self.rng.choice(LAST_NAMES),
+                        password=hashed,
+                    )
+                    for number in range(start, min(start + self.batch_size, count))
+                ])
+                # bulk_create skips the post_save handler that creates profiles
+                UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+            self.stdout.write(f'Created {min(start + self.batch_size, count)} users...')
+        return list(
+            User.objects.filter(username__startswith=prefix).order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _venues(self, options, categories, cities, user_ids, rating_counts):
+        category_weights = zipf_weights(len(categories), 0.5)
+        city_weights = zipf_weights(len(cities), options['zipf'])
+        allocator = SlugAllocator(Venue.objects.all())
+        totals = {'ratings': 0, 'images': 0}
+
+        for start in range(0, options['venues'], self.batch_size):
+            stop = min(start + self.batch_size, options['venues'])
+            batch_categories = self.rng.choices(categories, category_weights, k=stop - start)
+            batch_cities = self.rng.choices(cities, city_weights, k=stop - start)
+            venues = [
+                self._venue(number, category, city)
+                for number, category, city in zip(range(start, stop), batch_categories, batch_cities)
+            ]
+            ratings = [self._ratings(venue, rating_counts[number], user_ids)
+                       for number, venue in zip(range(start, stop), venues)]
+
+            with write_atomic():
+                # Places are recounted once every venue exists
+                Venue.bulk_insert(venues, allocator, recount_places=False)
+
+                images = [
+                    VenueImage(
+                        venue_id=venue.pk,
+                        image=f'venues/images/generated/{venue.slug}-{order}.jpg',
+                        caption=venue.name,
+                        is_primary=order == 0,
+                        order=order,
+                    )
+                    for venue in venues for order in range(self.rng.randint(0, options['images']))
+                ]
+                VenueImage.objects.bulk_create(images, batch_size=self.batch_size)
+                totals['images'] += len(images)
+
+                pending = []
+                for venue, venue_ratings in zip(venues, ratings):
+                    for rating in venue_ratings:
+                        rating.venue_id = venue.pk
+                        pending.append(rating)
+                    if len(pending) >= self.batch_size:
+                        Rating.objects.bulk_create(pending)
+                        totals['ratings'] += len(pending)
+                        pending = []
+                Rating.objects.bulk_create(pending)
+                totals['ratings'] += len(pending)
+            self.stdout.write(f'Created {stop} venues, {totals["ratings"]} ratings...')
+        return totals
+
+    def _venue(self, number, category, city):
+        category_id, noun = category
+        city_name, country, currency, latitude, longitude = city
+        word = self.rng.choice(NAME_WORDS)
+        price = self.rng.randint(5, 300)
+        name = f'{word} {noun} {city_name}' if self.rng.random() < 0.5 else f'The {word} {noun}'
+        venue = Venue(
+            name=name,
+            description=self.rng.choice(DESCRIPTIONS).format(word=word.lower(), city=city_name, kind=noun.lower()),
+            category_id=category_id,
+            address=f'{self.rng.randint(1, 250)} {self.rng.choice(STREETS)}',
+            city=city_name,
+            country=country,
+            latitude=Decimal(f'{latitude + self.rng.gauss(0, 0.03):.6f}'),
+            longitude=Decimal(f'{longitude + self.rng.gauss(0, 0.03):.6f}'),
+            phone=f'+{self.rng.randint(1, 99)} {self.rng.randint(100000000, 999999999)}',
+            email=f'contact{number}@example.com',
+            website=f'https://example.com/{slugify(name)}-{number}',
+            price_range_min=Decimal(price),
+            price_range_max=Decimal(price + self.rng.randint(0, 200)),
+            currency=currency,
+            facilities=self.rng.sample(FACILITIES, self.rng.randint(0, 6)),
+            amenities=self.rng.sample(AMENITIES, self.rng.randint(0, 3)),
+            languages_spoken=self.rng.sample(LANGUAGES, self.rng.randint(1, 3)),
+            is_active=self.rng.random() < 0.98,
+            is_featured=self.rng.random() < 0.02,
+        )
+        return venue
+
+    def _ratings(self, venue, count, user_ids):
+        """Unsaved ratings by ``count`` distinct users; also sets the venue's rating totals"""
+        if not count:
+            return []
+        # Each venue has its own typical score so averages spread out
+        bias = self.rng.randint(-1, 1)
+        scores = [min(5, max(1, score + bias)) for score in self.rng.choices(range(1, 6), RATING_WEIGHTS, k=count)]
+        ratings = [
+            Rating(
+                user_id=user_ids[index],
+                rating=score,
+                comment=self.rng.choice(COMMENTS) if self.rng.random() < self.comment_ratio else '',
+            )
+            for index, score in zip(self.rng.sample(range(len(user_ids)), count), scores)
+        ]
+        # Venue.update_rating_stats would cost three queries per venue
+        venue.average_rating = Decimal(sum(scores) / count).quantize(Decimal('0.01'))
+        venue.total_ratings = count
+        venue.total_reviews = sum(1 for rating in ratings if rating.comment)
+        return ratings
@@ -0,0 +1,175 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from venues.forms import VenueForm
+from venues.models import Category, Statistics, Venue
+from venues.slugs import SlugAllocator
+
+
+LIST_FIELDS = ('facilities', 'languages_spoken', 'amenities')
+BOOLEAN_FIELDS = ('is_active', 'is_featured')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'off')
+
+
+class Command(BaseCommand):
+    help = 'Import venues in bulk from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Path to the input file, or "-" to read from stdin',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues inserted per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the input without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        input_format = options['format'] or self._detect_format(path)
+        # Categories are resolved from memory so validating a row costs no queries
+        self.categories = {}
+        for category in Category.objects.all():
+            self.categories[str(category.pk)] = category.pk
+            self.categories[category.slug.lower()] = category.pk
+            self.categories[category.name.lower()] = category.pk
+        self.allocator = SlugAllocator(Venue.objects.all())
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e.strerror or e}')
+        imported = skipped = 0
+        batch = []
+        try:
+            for line_number, row in self._read_rows(stream, input_format):
+                venue = self._build_venue(line_number, row)
+                if venue is None:
+                    skipped += 1
+                    continue
+                batch.append(venue)
+                if len(batch) >= batch_size:
+                    imported += self._flush(batch, options['dry_run'])
+                    batch = []
+            if batch:
+                imported += self._flush(batch, options['dry_run'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Dry run: {imported} valid rows, {skipped} invalid rows.'
+            ))
+            return
+
+        # Statistics are recomputed once rather than after every venue
+        stats = Statistics.get_or_create_stats()
+        stats.update_all_stats()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {imported} venues ({skipped} rows skipped).'
+        ))
+
+    def _detect_format(self, path):
+        if path.endswith('.csv'):
+            return 'csv'
+        if path.endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        raise CommandError('Cannot detect the input format, please pass --format')
+
+    def _read_rows(self, stream, input_format):
+        """Yield (line number, row dict) pairs without loading the whole file"""
+        if input_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                self.stderr.write(f'Line {line_number}: invalid JSON ({e})')
+                continue
+            if not isinstance(row, dict):
+                self.stderr.write(f'Line {line_number}: expected a JSON object')
+                continue
+            yield line_number, row
+
+    def _build_venue(self, line_number, row):
+        """Validate a row with the VenueForm rules and return an unsaved Venue"""
+        data = {}
+        for key, value in row.items():
+            if key is None or value is None:
+                continue
+            if key in LIST_FIELDS:
+                # The form field expects JSON; plain text goes through the
+                # form's own comma-splitting
+                if isinstance(value, str):
+                    try:
+                        json.loads(value)
+                    except ValueError:
+                        value = json.dumps(value)
+                else:
+                    value = json.dumps(value)
+            elif key in BOOLEAN_FIELDS and isinstance(value, str):
+                if not value.strip():
+                    # A blank cell means unset, so the field keeps its default
+                    continue
+                value = value.strip().lower() not in FALSE_VALUES
+            data[key] = value
+        data.setdefault('is_active', True)
+        if not data.get('currency'):
+            data['currency'] = Venue._meta.get_field('currency').default
+
+        category_id = self.categories.get(str(row.get('category') or '').strip().lower())
+        if category_id is None:
+            self.stderr.write(f'Line {line_number}: unknown category "{row.get("category")}"')
+            return None
+
+        form = VenueForm(data=data)
+        del form.fields['category']
+        if not form.is_valid():
+            errors = '; '.join(
+                f'{field}: {" ".join(messages)}' for field, messages in form.errors.items()
+            )
+            self.stderr.write(f'Line {line_number}: {errors}')
+            return None
+
+        venue = form.instance
+        venue.category_id = category_id
+        for field in LIST_FIELDS:
+            if not getattr(venue, field):
+                setattr(venue, field, [])
+        return venue
+
+    def _flush(self, batch, dry_run):
+        """Insert a batch in a single transaction"""
+        if dry_run:
+            return len(batch)
+        Venue.bulk_insert(batch, self.allocator)
+        self.stdout.write(f'Imported {len(batch)} venues...')
+        return len(batch)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.fuzzy import FUZZY_FIELDS, venue_trigrams
+from venues.models import ChangeLogEntry, Venue, VenueTrigram
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram table used for fuzzy search on databases without pg_trgm'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues indexed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if connection.vendor == 'postgresql':
+            self.stdout.write('PostgreSQL searches the venue columns through pg_trgm; nothing to rebuild.')
+            return
+
+        venues = Venue.objects.only(*FUZZY_FIELDS).order_by('pk')
+        indexed = 0
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            batch = list(venues.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            postings = {venue.pk: set() for venue in batch}
+            for venue_id, trigram in VenueTrigram.objects.filter(venue__in=batch).values_list('venue_id', 'trigram'):
+                postings[venue_id].add(trigram)
+            # Only venues whose postings are out of date are rewritten
+            stale = [venue for venue in batch if postings[venue.pk] != venue_trigrams(venue)]
+            if stale:
+                with write_atomic():
+                    VenueTrigram.sync(stale)
+                    # Fuzzy results for these venues change; retire cached searches
+                    ChangeLogEntry.record_many(Venue, [venue.pk for venue in stale], 'update')
+            indexed += len(batch)
+            rebuilt += len(stale)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Checked {indexed} venues...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt trigrams for {rebuilt} of {indexed} venues.'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import ChangeLogEntry, City, Country, Venue
+
+
+class Command(BaseCommand):
+    help = 'Link venues to their City and Country rows and recompute per-place venue counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues linked per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # Only venues written without Venue.save (raw SQL, fixtures) lack links
+        venues = Venue.objects.filter(city_ref__isnull=True).only('city', 'country').order_by('pk')
+        linked = 0
+        last_pk = 0
+        while True:
+            batch = list(venues.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with write_atomic():
+                Venue.assign_places(batch)
+                Venue.objects.bulk_update(batch, ['city', 'country', 'city_ref', 'country_ref'])
+                # bulk_update bypasses the change-feed signals; place filters and search see the new links
+                ChangeLogEntry.record_many(Venue, [venue.pk for venue in batch], 'update')
+            linked += len(batch)
+            last_pk = batch[-1].pk
+
+        cities = City.recount()
+        countries = Country.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Linked {linked} venues; corrected counts for {cities} cities and {countries} countries.'
+        ))
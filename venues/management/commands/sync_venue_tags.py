@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from venue_rating_system.db_backends.transactions import write_atomic
+from venues.models import Venue, VenueTag
+
+
+class Command(BaseCommand):
+    help = 'Rebuild venue tag links from the facilities, amenities and languages fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of venues synced per transaction',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete tags no venue uses any more',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        venues = Venue.objects.only('facilities', 'amenities', 'languages_spoken').order_by('pk')
+        synced = 0
+        last_pk = 0
+        while True:
+            batch = list(venues.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with write_atomic():
+                VenueTag.sync(batch)
+            synced += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Synced {synced} venues...')
+
+        if options['prune']:
+            pruned, _ = VenueTag.objects.filter(venues__isnull=True).delete()
+            self.stdout.write(f'Removed {pruned} unused tags.')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully synced tags for {synced} venues.'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0002_changelogentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueSlugHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_slug', models.SlugField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_history', to='venues.venue')),
+            ],
+            options={
+                'verbose_name_plural': 'Venue slug history',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0003_venueslughistory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['venue', '-created_at'], name='rating_venue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', '-created_at'], name='rating_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['-created_at'], name='rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-average_rating', '-total_ratings'], name='venue_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-average_rating', '-total_ratings'], name='venue_cat_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-created_at'], name='venue_featured_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='venue_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['city', '-created_at'], name='venue_city_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['country'], name='venue_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['category', '-created_at'], name='venue_cat_created_idx'),
+        ),
+    ]
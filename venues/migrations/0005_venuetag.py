@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:52
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+# Copied from venues.tags as it stood when this migration was written, so
+# later changes to the normalization do not change what it creates
+TAG_FIELDS = {
+    'facilities': 'facility',
+    'amenities': 'amenity',
+    'languages_spoken': 'language',
+}
+
+TAG_ALIASES = {
+    'wi-fi': 'wifi',
+    'free-wifi': 'wifi',
+    'free-wi-fi': 'wifi',
+    'wireless-internet': 'wifi',
+    'swimming-pool': 'pool',
+    'car-park': 'parking',
+    'free-parking': 'parking',
+    'ac': 'air-conditioning',
+    'a-c': 'air-conditioning',
+}
+
+
+def canonical_tag(value):
+    name = ' '.join(str(value).split())
+    key = slugify(name)[:100].strip('-')
+    if not key:
+        return None
+    key = TAG_ALIASES.get(key, key)
+    return key, name[:1].upper() + name[1:100]
+
+
+def venue_tags(venue):
+    tags = {}
+    for field, kind in TAG_FIELDS.items():
+        values = getattr(venue, field) or []
+        if isinstance(values, str):
+            values = values.split(',')
+        for value in values:
+            tag = canonical_tag(value)
+            if tag:
+                tags.setdefault((kind, tag[0]), tag[1])
+    return tags
+
+
+def populate_tags(apps, schema_editor):
+    Venue = apps.get_model('venues', 'Venue')
+    VenueTag = apps.get_model('venues', 'VenueTag')
+    Link = VenueTag.venues.through
+    db = schema_editor.connection.alias
+
+    tag_ids = {}
+    links = []
+    venues = Venue.objects.using(db).only('facilities', 'amenities', 'languages_spoken')
+    for venue in venues.iterator(chunk_size=2000):
+        for (kind, key), name in venue_tags(venue).items():
+            if (kind, key) not in tag_ids:
+                tag_ids[(kind, key)] = VenueTag.objects.using(db).create(kind=kind, key=key, name=name).pk
+            links.append(Link(venue_id=venue.pk, venuetag_id=tag_ids[(kind, key)]))
+        if len(links) >= 5000:
+            Link.objects.using(db).bulk_create(links)
+            links = []
+    Link.objects.using(db).bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('facility', 'Facility'), ('amenity', 'Amenity'), ('language', 'Language')], max_length=20)),
+                ('key', models.SlugField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('venues', models.ManyToManyField(blank=True, related_name='tags', to='venues.venue')),
+            ],
+            options={
+                'ordering': ['kind', 'name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='venuetag',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='venuetag_kind_key_uniq'),
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+import unicodedata
+
+
+# Copied from venues.text and venues.fuzzy as they stood when this migration
+# was written, so later changes to them do not change the postings it builds
+FUZZY_FIELDS = ('name', 'city', 'country')
+
+
+def fold(value):
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def venue_trigrams(venue):
+    grams = set()
+    for field in FUZZY_FIELDS:
+        for word in re.findall(r'\w+', fold(getattr(venue, field) or '')):
+            padded = f'  {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def enable_trigram_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for field in FUZZY_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS venue_{field}_trgm_idx '
+                f'ON venues_venue USING gin ({field} gin_trgm_ops)'
+            )
+        return
+
+    Venue = apps.get_model('venues', 'Venue')
+    VenueTrigram = apps.get_model('venues', 'VenueTrigram')
+    db = connection.alias
+    postings = []
+    for venue in Venue.objects.using(db).only(*FUZZY_FIELDS).iterator(chunk_size=2000):
+        postings.extend(VenueTrigram(trigram=gram, venue_id=venue.pk) for gram in venue_trigrams(venue))
+        if len(postings) >= 10000:
+            VenueTrigram.objects.using(db).bulk_create(postings)
+            postings = []
+    VenueTrigram.objects.using(db).bulk_create(postings)
+
+
+def disable_trigram_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in FUZZY_FIELDS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS venue_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0005_venuetag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='venues.venue')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='venuetrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'venue'), name='venuetrigram_trigram_venue_uniq'),
+        ),
+        migrations.RunPython(enable_trigram_search, disable_trigram_search),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:04
+
+from django.db import migrations, models
+import unicodedata
+
+
+# Copied from venues.text as it stood when this migration was written
+def fold(value):
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+FOLDED_FIELDS = {'name': 'name_folded', 'city': 'city_folded', 'country': 'country_folded'}
+
+
+def backfill_folded_fields(apps, schema_editor):
+    Venue = apps.get_model('venues', 'Venue')
+    venues = Venue.objects.using(schema_editor.connection.alias).only(*FOLDED_FIELDS).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(venues.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            break
+        for venue in batch:
+            for field, folded_field in FOLDED_FIELDS.items():
+                setattr(venue, folded_field, fold(getattr(venue, field)))
+        Venue.objects.using(schema_editor.connection.alias).bulk_update(batch, list(FOLDED_FIELDS.values()))
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0006_venuetrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='city_folded',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='country_folded',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='name_folded',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['name_folded'], name='venue_name_folded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['city_folded'], name='venue_city_folded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['country_folded'], name='venue_country_folded_idx'),
+        ),
+        migrations.RunPython(backfill_folded_fields, migrations.RunPython.noop),
+    ]
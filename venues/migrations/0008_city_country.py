@@ -0,0 +1,149 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+import unicodedata
+
+
+# Copied from venues.text as they stood when this migration was written
+def fold(value):
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def clean_place(value):
+    return ' '.join(str(value).split())
+
+
+def populate_places(apps, schema_editor):
+    """Create a City and Country per distinct folded name and link every venue to them"""
+    Venue = apps.get_model('venues', 'Venue')
+    City = apps.get_model('venues', 'City')
+    Country = apps.get_model('venues', 'Country')
+    db = schema_editor.connection.alias
+
+    # The most common spelling of each name becomes its display name
+    country_names = {}
+    city_names = {}
+    counts = Counter()
+    for city, country in Venue.objects.using(db).order_by().values_list('city', 'country').iterator(chunk_size=2000):
+        counts[(clean_place(city), clean_place(country))] += 1
+    for (city, country), count in counts.items():
+        country_names.setdefault(fold(country), Counter())[country] += count
+        city_names.setdefault((fold(country), fold(city)), Counter())[city] += count
+
+    Country.objects.using(db).bulk_create(
+        [Country(key=key, name=names.most_common(1)[0][0]) for key, names in country_names.items()],
+        batch_size=1000,
+    )
+    countries = dict(Country.objects.using(db).values_list('key', 'pk'))
+    City.objects.using(db).bulk_create(
+        [
+            City(country_id=countries[country_key], key=key, name=names.most_common(1)[0][0])
+            for (country_key, key), names in city_names.items()
+        ],
+        batch_size=1000,
+    )
+    cities = {(country_id, key): pk for pk, country_id, key in City.objects.using(db).values_list('pk', 'country_id', 'key')}
+
+    last_pk = 0
+    while True:
+        batch = list(Venue.objects.using(db).only('city', 'country').filter(pk__gt=last_pk).order_by('pk')[:2000])
+        if not batch:
+            break
+        for venue in batch:
+            venue.country_ref_id = countries[fold(venue.country)]
+            venue.city_ref_id = cities[(venue.country_ref_id, fold(venue.city))]
+        Venue.objects.using(db).bulk_update(batch, ['city_ref', 'country_ref'])
+        last_pk = batch[-1].pk
+
+    for model, field in ((City, 'city_ref'), (Country, 'country_ref')):
+        counts = dict(
+            Venue.objects.using(db).filter(is_active=True).order_by()
+            .values_list(field).annotate(count=models.Count('id'))
+        )
+        places = list(model.objects.using(db).all())
+        for place in places:
+            place.venue_count = counts.get(place.pk, 0)
+        model.objects.using(db).bulk_update(places, ['venue_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0007_folded_search_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(editable=False, max_length=100)),
+                ('venue_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'verbose_name_plural': 'Cities',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(editable=False, max_length=100)),
+                ('venue_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'verbose_name_plural': 'Countries',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='country',
+            constraint=models.UniqueConstraint(fields=('key',), name='country_key_uniq'),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='country',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cities', to='venues.country'),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='city_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='venues', to='venues.city'),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='country_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='venues', to='venues.country'),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['city_ref', '-created_at'], name='venue_cityref_created_idx'),
+        ),
+        # Superseded by the city_ref index above and the folded-name indexes
+        migrations.RemoveIndex(
+            model_name='venue',
+            name='venue_city_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='venue',
+            name='venue_country_idx',
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['key'], name='city_key_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='city',
+            constraint=models.UniqueConstraint(fields=('country', 'key'), name='city_country_key_uniq'),
+        ),
+        migrations.RunPython(populate_places, migrations.RunPython.noop),
+    ]
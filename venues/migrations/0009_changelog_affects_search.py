@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0008_city_country'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogentry',
+            name='affects_search',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(condition=models.Q(('affects_search', True)), fields=['seq'], name='venues_chg_search_idx'),
+        ),
+    ]
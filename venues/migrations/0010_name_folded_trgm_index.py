@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:10
+
+from django.db import migrations
+
+
+def add_name_folded_trigram_index(apps, schema_editor):
+    # Serves the name search's LIKE '%...%'; other databases narrow it
+    # through the VenueTrigram postings instead
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS venue_name_folded_trgm_idx '
+            'ON venues_venue USING gin (name_folded gin_trgm_ops)'
+        )
+
+
+def drop_name_folded_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS venue_name_folded_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venues', '0009_changelog_affects_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_name_folded_trigram_index, drop_name_folded_trigram_index),
+    ]
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChangeLogEntry, Venue
+
+
+class VenueMirror:
+    """Base for in-process structures derived from the venue table.
+
+    Subclasses list the ``fields`` they need and implement ``reset``,
+    ``add_row`` and ``remove_row``. The mirror is built on first use, updated
+    from this process's saves once they commit, and replays the change log
+    every ``VENUE_INDEX_SYNC_INTERVAL`` seconds for writes made elsewhere.
+    """
+
+    fields = ['id']
+    # Other change-log models the mirror depends on, see ``refresh_related``
+    related_models = ()
+
+    def __init__(self, sync_interval=None):
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, 'VENUE_INDEX_SYNC_INTERVAL', 5
+        )
+        self._lock = threading.RLock()
+        self.clear()
+
+    def reset(self):
+        """Drop all derived state"""
+        raise NotImplementedError
+
+    def add_row(self, row):
+        """Add one venue, given as a dict of ``fields``"""
+        raise NotImplementedError
+
+    def remove_row(self, pk):
+        """Remove one venue if present"""
+        raise NotImplementedError
+
+    def refresh_related(self, model, pks):
+        """Reload the given objects of one of ``related_models``"""
+        raise NotImplementedError
+
+    def load(self, rows):
+        """Add every venue during a full build"""
+        for row in rows:
+            self.add_row(row)
+
+    def clear(self):
+        with self._lock:
+            self.is_built = False
+            self._cursor = 0
+            self._synced_at = 0
+            self.reset()
+
+    def build(self, chunk_size=2000):
+        """Load every venue from the database"""
+        with self._lock:
+            self.clear()
+            # Recent entries are replayed on the next sync in case an older
+            # transaction commits behind them; re-applying a change is harmless
+            self._cursor = ChangeLogEntry.settled_seq()
+            self.load(Venue.objects.order_by().values(*self.fields).iterator(chunk_size=chunk_size))
+            self.is_built = True
+            self._synced_at = time.monotonic()
+
+    def ensure_built(self):
+        """Build if needed, otherwise apply changes made elsewhere"""
+        with self._lock:
+            if not self.is_built:
+                self.build()
+            elif time.monotonic() - self._synced_at >= self.sync_interval:
+                self.sync()
+
+    def update(self, venue, using=None):
+        """Re-index one saved venue when the transaction saving it commits"""
+        # Taken now: the instance may change again before the commit
+        row = {field: getattr(venue, field) for field in self.fields}
+        transaction.on_commit(lambda: self._replace(row), using=using)
+
+    def remove(self, pk, using=None):
+        """Drop one deleted venue when the transaction deleting it commits"""
+        transaction.on_commit(lambda: self._discard(pk), using=using)
+
+    def update_related(self, model, pk, using=None):
+        """Reload one saved or deleted related object when its transaction commits"""
+        transaction.on_commit(lambda: self._refresh_related(model, pk), using=using)
+
+    def _refresh_related(self, model, pk):
+        with self._lock:
+            if self.is_built:
+                self.refresh_related(model, [pk])
+
+    def _replace(self, row):
+        with self._lock:
+            if self.is_built:
+                self.remove_row(row['id'])
+                self.add_row(row)
+
+    def _discard(self, pk):
+        with self._lock:
+            if self.is_built:
+                self.remove_row(pk)
+
+    def refresh(self, pks):
+        """Reload the given venues from the database, dropping deleted ones"""
+        with self._lock:
+            pks = sorted(set(pks))
+            for pk in pks:
+                self.remove_row(pk)
+            for start in range(0, len(pks), 500):
+                rows = Venue.objects.filter(pk__in=pks[start:start + 500]).values(*self.fields)
+                for row in rows:
+                    self.add_row(row)
+
+    def sync(self):
+        """Apply venue changes recorded in the change log since the last sync"""
+        with self._lock:
+            changed = set()
+            related = {}
+            while True:
+                entries, has_more, self._cursor = ChangeLogEntry.changes_since(self._cursor, limit=5000)
+                for entry in entries:
+                    if entry.model == 'venue':
+                        changed.add(entry.object_id)
+                    elif entry.model in self.related_models:
+                        related.setdefault(entry.model, set()).add(entry.object_id)
+                if not has_more:
+                    break
+            if changed:
+                self.refresh(changed)
+            for model, pks in related.items():
+                self.refresh_related(model, sorted(pks))
+            self._synced_at = time.monotonic()
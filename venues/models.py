@@ -1,8 +1,19 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, models, router
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.utils.text import slugify
+from venue_rating_system.db_backends.transactions import write_atomic
+
+from .slugs import SlugAllocator, LRUCache
+from .tags import TAG_FIELDS, venue_tags
+from .fuzzy import FUZZY_FIELDS, venue_trigrams
+from .text import clean_place, fold
 
 
 class Category(models.Model):
@@ -21,6 +32,93 @@ class Category(models.Model):
         return self.name
 
 
+class Place(models.Model):
+    """Shared fields of the normalized country and city tables"""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, editable=False)  # Folded name, compared on lookup
+    venue_count = models.PositiveIntegerField(default=0, editable=False)  # Active venues
+    
+    # Foreign key on Venue pointing at this table
+    venue_field = None
+    
+    class Meta:
+        abstract = True
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        """Derive the lookup key from the name, which must fold to a key not yet taken"""
+        super().clean()
+        self.name = clean_place(self.name)
+        self.key = fold(self.name)
+        if not self.key:
+            raise ValidationError({'name': 'Enter a name.'})
+        if self.siblings().filter(key=self.key).exclude(pk=self.pk).exists():
+            raise ValidationError({'name': f'A {self._meta.verbose_name} with this name already exists.'})
+    
+    def siblings(self):
+        """Places whose keys must differ from this one's"""
+        return type(self).objects.all()
+    
+    @classmethod
+    def adjust(cls, pk, delta, using=None):
+        """Add ``delta`` to one place's venue count without reading it"""
+        if pk is not None and delta:
+            cls.objects.using(using).filter(pk=pk).update(venue_count=models.F('venue_count') + delta)
+    
+    @classmethod
+    def recount(cls, pks=None, using=None):
+        """Recompute venue counts from the venue table, for the given places or all of them"""
+        places = cls.objects.using(using).only('pk', 'venue_count').order_by('pk')
+        if pks is not None:
+            places = places.filter(pk__in=list(pks))
+        counts = dict(
+            Venue.objects.using(using).filter(is_active=True, **{f'{cls.venue_field}__in': places.values('pk')})
+            .order_by().values_list(cls.venue_field).annotate(count=models.Count('id'))
+        )
+        changed = []
+        for place in places:
+            count = counts.get(place.pk, 0)
+            if place.venue_count != count:
+                place.venue_count = count
+                changed.append(place)
+        cls.objects.using(using).bulk_update(changed, ['venue_count'], batch_size=1000)
+        return len(changed)
+
+
+class Country(Place):
+    """Normalized country a venue is in"""
+    venue_field = 'country_ref'
+    
+    class Meta(Place.Meta):
+        verbose_name_plural = "Countries"
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='country_key_uniq'),
+        ]
+
+
+class City(Place):
+    """Normalized city, unique by folded name within its country"""
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name='cities')
+    
+    venue_field = 'city_ref'
+    
+    class Meta(Place.Meta):
+        verbose_name_plural = "Cities"
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'key'], name='city_country_key_uniq'),
+        ]
+        indexes = [
+            # Prefix lookups from the city filter, across countries
+            models.Index(fields=['key'], name='city_key_idx'),
+        ]
+    
+    def siblings(self):
+        return City.objects.filter(country_id=self.country_id)
+
+
 class Venue(models.Model):
     """Main venue model for hotels, restaurants, cafes, etc."""
     name = models.CharField(max_length=200)
@@ -32,6 +130,13 @@ class Venue(models.Model):
     address = models.TextField()
     city = models.CharField(max_length=100)
     country = models.CharField(max_length=100)
+    # Normalized copies of city and country (maintained in save)
+    city_ref = models.ForeignKey(
+        City, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='venues'
+    )
+    country_ref = models.ForeignKey(
+        Country, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='venues'
+    )
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     
@@ -65,22 +170,229 @@ class Venue(models.Model):
     total_ratings = models.PositiveIntegerField(default=0)
     total_reviews = models.PositiveIntegerField(default=0)
     
+    # Lowercased, accent-stripped copies for search (maintained in save)
+    name_folded = models.CharField(max_length=200, blank=True, editable=False)
+    city_folded = models.CharField(max_length=100, blank=True, editable=False)
+    country_folded = models.CharField(max_length=100, blank=True, editable=False)
+    
+    FOLDED_FIELDS = {
+        'name': 'name_folded',
+        'city': 'city_folded',
+        'country': 'country_folded',
+    }
+    # Fields that decide which searches find a venue (see ChangeLogEntry.affects_search)
+    SEARCH_FIELDS = ('name', 'city', 'country', 'category', 'is_active')
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Public listings: active venues ordered by rating, optionally per category
+            models.Index(
+                fields=['-average_rating', '-total_ratings'],
+                condition=models.Q(is_active=True),
+                name='venue_active_rating_idx',
+            ),
+            models.Index(
+                fields=['category', '-average_rating', '-total_ratings'],
+                condition=models.Q(is_active=True),
+                name='venue_cat_active_rating_idx',
+            ),
+            # Featured venues on the homepage and recent venues on the dashboard
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_active=True, is_featured=True),
+                name='venue_featured_created_idx',
+            ),
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_active=True),
+                name='venue_active_created_idx',
+            ),
+            # Nearby venues on the detail page; also serves the admin city filter
+            models.Index(fields=['city_ref', '-created_at'], name='venue_cityref_created_idx'),
+            # Admin listings filtered by category, newest first
+            models.Index(fields=['category', '-created_at'], name='venue_cat_created_idx'),
+            # Accent-insensitive equality and prefix lookups
+            models.Index(fields=['name_folded'], name='venue_name_folded_idx'),
+            models.Index(fields=['city_folded'], name='venue_city_folded_idx'),
+            models.Index(fields=['country_folded'], name='venue_country_folded_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored slug so renames can be recorded in the history
+        instance._loaded_slug = instance.__dict__.get('slug')
+        # ...and the stored place, so venue counts can be moved incrementally
+        instance._loaded_place = instance._place_state()
+        instance._loaded_names = (instance.__dict__.get('city'), instance.__dict__.get('country'))
+        # ...and the stored search fields, so edits that cannot change search results are told apart
+        instance._loaded_search = instance._search_state()
+        return instance
+    
+    def _search_state(self):
+        return {field: self.__dict__.get(self._meta.get_field(field).attname) for field in self.SEARCH_FIELDS}
+    
+    def _written(self, fields, update_fields):
+        if update_fields is None:
+            return set(fields)
+        return set(fields) & {self._meta.get_field(field).name for field in update_fields}
+    
+    def search_changed(self, update_fields=None, fields=SEARCH_FIELDS):
+        """Whether saving ``update_fields`` (all fields if None) changes one of ``fields``.
+        
+        ``fields`` must be among ``SEARCH_FIELDS``; venues not loaded from the
+        database always count as changed.
+        """
+        loaded = getattr(self, '_loaded_search', None)
+        if loaded is None:
+            return True
+        state = self._search_state()
+        return any(loaded[field] != state[field] for field in self._written(fields, update_fields))
+    
+    def fold_fields(self):
+        """Refresh the folded search copies of name, city and country"""
+        for field, folded_field in self.FOLDED_FIELDS.items():
+            setattr(self, folded_field, fold(getattr(self, field) or ''))
+    
+    def _place_state(self):
+        """City and country ids this venue counts towards (none while inactive)"""
+        if not self.__dict__.get('is_active'):
+            return (None, None)
+        return (self.__dict__.get('city_ref_id'), self.__dict__.get('country_ref_id'))
+    
+    @classmethod
+    def assign_places(cls, venues, using=None):
+        """Point venues at their City and Country rows, creating missing ones.
+        
+        Works on any number of unsaved or saved venues with a fixed number of
+        queries, so the importer can call it per batch.
+        """
+        venues = list(venues)
+        names = {}
+        for venue in venues:
+            venue.country = clean_place(venue.country)
+            venue.city = clean_place(venue.city)
+            names.setdefault(fold(venue.country), venue.country)
+        countries = {c.key: c for c in Country.objects.using(using).filter(key__in=list(names))}
+        missing = [Country(key=key, name=name) for key, name in names.items() if key not in countries]
+        if missing:
+            Country.objects.using(using).bulk_create(missing, ignore_conflicts=True)
+            countries = {c.key: c for c in Country.objects.using(using).filter(key__in=list(names))}
+        
+        names = {}
+        for venue in venues:
+            country = countries[fold(venue.country)]
+            venue.country_ref = country
+            names.setdefault((country.pk, fold(venue.city)), venue.city)
+        city_keys = {key for _, key in names}
+        cities = {
+            (c.country_id, c.key): c
+            for c in City.objects.using(using).filter(key__in=list(city_keys), country__in=countries.values())
+        }
+        missing = [
+            City(country_id=country_id, key=key, name=name)
+            for (country_id, key), name in names.items() if (country_id, key) not in cities
+        ]
+        if missing:
+            City.objects.using(using).bulk_create(missing, ignore_conflicts=True)
+            cities = {
+                (c.country_id, c.key): c
+                for c in City.objects.using(using).filter(key__in=list(city_keys), country__in=countries.values())
+            }
+        for venue in venues:
+            venue.city_ref = cities[(venue.country_ref_id, fold(venue.city))]
+    
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            # Ensure uniqueness
-            original_slug = self.slug
-            counter = 1
-            while Venue.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+        # Slug history, place counts, the change log, tags and trigrams are
+        # written with the row or not at all
+        using = kwargs.get('using') or router.db_for_write(Venue, instance=self)
+        with write_atomic(using=using):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                self.fold_fields()
+            else:
+                folded = [self.FOLDED_FIELDS[field] for field in update_fields if field in self.FOLDED_FIELDS]
+                if folded:
+                    self.fold_fields()
+                    kwargs['update_fields'] = list(update_fields) + folded
+            update_fields = kwargs.get('update_fields')
+            names_changed = getattr(self, '_loaded_names', None) != (self.city, self.country)
+            if (names_changed or self.city_ref_id is None) and (
+                update_fields is None or {'city', 'country'} & set(update_fields)
+            ):
+                self.assign_places([self], using=kwargs.get('using'))
+                self._loaded_names = (self.city, self.country)
+                if update_fields is not None:
+                    kwargs['update_fields'] = list(update_fields) + ['city_ref', 'country_ref']
+            if not self.slug:
+                # Ensure uniqueness with a single prefix query
+                allocator = SlugAllocator(Venue.objects.exclude(pk=self.pk))
+                self.slug = allocator.allocate(self.name)
+            old_slug = getattr(self, '_loaded_slug', None)
+            update_fields = kwargs.get('update_fields')
+            super().save(*args, **kwargs)
+            if old_slug != self.slug and (update_fields is None or 'slug' in update_fields):
+                VenueSlugHistory.record_change(self, old_slug)
+                self._loaded_slug = self.slug
+            if update_fields is None or {'is_active', 'city_ref', 'country_ref'} & set(update_fields):
+                self._move_place_counts(using=kwargs.get('using'))
+            if getattr(self, '_loaded_search', None) is None:
+                self._loaded_search = self._search_state()
+            else:
+                state = self._search_state()
+                self._loaded_search.update(
+                    {field: state[field] for field in self._written(self.SEARCH_FIELDS, update_fields)}
+                )
+    
+    def _move_place_counts(self, using=None):
+        old_city, old_country = getattr(self, '_loaded_place', (None, None))
+        new_city, new_country = self._place_state()
+        if old_city != new_city:
+            City.adjust(old_city, -1, using=using)
+            City.adjust(new_city, 1, using=using)
+        if old_country != new_country:
+            Country.adjust(old_country, -1, using=using)
+            Country.adjust(new_country, 1, using=using)
+        self._loaded_place = (new_city, new_country)
+    
+    @classmethod
+    def recount_places(cls, venues):
+        """Recount the cities and countries of venues changed by a bulk update"""
+        rows = list(venues.values_list('city_ref_id', 'country_ref_id'))
+        City.recount({city for city, _ in rows if city is not None}, using=venues.db)
+        Country.recount({country for _, country in rows if country is not None}, using=venues.db)
+    
+    @classmethod
+    def bulk_insert(cls, venues, allocator=None, recount_places=True):
+        """Insert unsaved venues in one batch, doing what save() and its signals would.
+        
+        Folds the search fields, allocates slugs (from ``allocator``, a
+        SlugAllocator reused across batches), links cities and countries,
+        records the change log and indexes tags and trigrams, all in one
+        transaction. Callers that recount every place once at the end can
+        pass ``recount_places=False``.
+        """
+        venues = list(venues)
+        allocator = allocator or SlugAllocator(cls.objects.all())
+        with write_atomic():
+            for venue, slug in zip(venues, allocator.allocate_many(venue.name for venue in venues)):
+                venue.fold_fields()
+                venue.slug = slug
+            cls.assign_places(venues)
+            cls.objects.bulk_create(venues, batch_size=len(venues) or None)
+            if recount_places:
+                City.recount({venue.city_ref_id for venue in venues})
+                Country.recount({venue.country_ref_id for venue in venues})
+            ChangeLogEntry.record_many(cls, [venue.pk for venue in venues if venue.pk], 'create')
+            VenueTag.sync(venues)
+            VenueTrigram.sync(venues)
+        # Prefixes are reloaded for the next batch, which sees this one's slugs
+        allocator.clear()
+        return venues
     
     def update_rating_stats(self):
         """Update average rating and total counts"""
@@ -96,6 +408,193 @@ class Venue(models.Model):
         self.save(update_fields=['average_rating', 'total_ratings', 'total_reviews'])
 
 
+legacy_slug_cache = LRUCache(maxsize=10000, ttl=300)
+
+
+class VenueSlugHistory(models.Model):
+    """Slugs a venue used to have, so old links can redirect to the current page"""
+    old_slug = models.SlugField(max_length=200, unique=True)
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='slug_history')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = "Venue slug history"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.old_slug} -> {self.venue.slug}"
+    
+    @classmethod
+    def record_change(cls, venue, old_slug):
+        """Point ``old_slug`` at ``venue`` and retire history for its new slug"""
+        history = cls.objects.using(venue._state.db)
+        # A slug in use again by a live venue must resolve to that venue
+        history.filter(old_slug=venue.slug).delete()
+        if old_slug:
+            history.update_or_create(old_slug=old_slug, defaults={'venue': venue})
+    
+    @classmethod
+    def resolve(cls, old_slug):
+        """Return the current slug for a legacy slug, or None.
+        
+        Lookups (including misses) are cached in-process so repeated crawler
+        hits on old URLs skip the history join. Entries are keyed on the
+        change-log head, so a rename or history edit in any worker retires them.
+        """
+        key = (ChangeLogEntry.latest_seq(), old_slug)
+        hit, current_slug = legacy_slug_cache.get(key)
+        if hit:
+            return current_slug
+        current_slug = cls.objects.filter(
+            old_slug=old_slug, venue__is_active=True
+        ).values_list('venue__slug', flat=True).first()
+        legacy_slug_cache.set(key, current_slug)
+        return current_slug
+
+
+class VenueTag(models.Model):
+    """Canonical facility, amenity or language, linked to the venues that list it"""
+    KIND_CHOICES = [
+        ('facility', 'Facility'),
+        ('amenity', 'Amenity'),
+        ('language', 'Language'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.SlugField(max_length=100)
+    name = models.CharField(max_length=100)
+    venues = models.ManyToManyField(Venue, related_name='tags', blank=True)
+    
+    class Meta:
+        ordering = ['kind', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='venuetag_kind_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.name}"
+    
+    @classmethod
+    def ids_for(cls, tags, using='default'):
+        """Return ``{(kind, key): pk}`` for ``{(kind, key): name}``, creating missing tags"""
+        manager = cls.objects.using(using)
+        ids = {}
+        for kind in {kind for kind, _ in tags}:
+            keys = [key for tag_kind, key in tags if tag_kind == kind]
+            for pk, key in manager.filter(kind=kind, key__in=keys).values_list('pk', 'key'):
+                ids[(kind, key)] = pk
+        missing = [tag for tag in tags if tag not in ids]
+        if missing:
+            manager.bulk_create(
+                [cls(kind=kind, key=key, name=tags[(kind, key)]) for kind, key in missing],
+                ignore_conflicts=True,
+            )
+            for kind in {kind for kind, _ in missing}:
+                keys = [key for tag_kind, key in missing if tag_kind == kind]
+                for pk, key in manager.filter(kind=kind, key__in=keys).values_list('pk', 'key'):
+                    ids[(kind, key)] = pk
+        return ids
+    
+    @classmethod
+    def sync(cls, venues, using=None):
+        """Make the tag links of ``venues`` match their JSON list fields.
+        
+        Works on any number of venues with a fixed number of queries, so bulk
+        imports can call it once per batch.
+        """
+        venues = [venue for venue in venues if venue.pk]
+        if not venues:
+            return
+        using = using or venues[0]._state.db or 'default'
+        wanted = {venue.pk: venue_tags(venue) for venue in venues}
+        names = {}
+        for tags in wanted.values():
+            for tag, name in tags.items():
+                names.setdefault(tag, name)
+        tag_ids = cls.ids_for(names, using=using)
+        desired = {
+            (venue_id, tag_ids[tag]) for venue_id, tags in wanted.items() for tag in tags
+        }
+        
+        through = cls.venues.through.objects.using(using)
+        existing = {}
+        for pk, venue_id, tag_id in through.filter(venue_id__in=wanted).values_list(
+            'pk', 'venue_id', 'venuetag_id'
+        ):
+            existing[(venue_id, tag_id)] = pk
+        stale = [pk for link, pk in existing.items() if link not in desired]
+        if stale:
+            through.filter(pk__in=stale).delete()
+        through.bulk_create(
+            [
+                cls.venues.through(venue_id=venue_id, venuetag_id=tag_id)
+                for venue_id, tag_id in desired if (venue_id, tag_id) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+    
+    @classmethod
+    def filter_venues(cls, venues, tags):
+        """Restrict ``venues`` to those carrying every ``(kind, key)`` in ``tags``"""
+        if not tags:
+            return venues
+        tag_ids = []
+        for kind in {kind for kind, _ in tags}:
+            keys = [key for tag_kind, key in tags if tag_kind == kind]
+            tag_ids.extend(cls.objects.filter(kind=kind, key__in=keys).values_list('pk', flat=True))
+        if len(tag_ids) < len(tags):
+            return venues.none()
+        # One join per tag keeps every lookup on the link table's indexes
+        for tag_id in tag_ids:
+            venues = venues.filter(tags=tag_id)
+        return venues
+    
+    @classmethod
+    def facets(cls, venues, limit=20):
+        """Return ``{kind: [tag, ...]}`` with ``venue_count`` for the venues given"""
+        tags = cls.objects.filter(
+            venues__in=venues.order_by().values('pk')
+        ).annotate(venue_count=models.Count('venues')).order_by()
+        facets = {kind: [] for kind, _ in cls.KIND_CHOICES}
+        # The grouped rows are few, so they are ranked here rather than by the database
+        for tag in sorted(tags, key=lambda tag: (-tag.venue_count, tag.name)):
+            if len(facets[tag.kind]) < limit:
+                facets[tag.kind].append(tag)
+        return facets
+
+
+class VenueTrigram(models.Model):
+    """Trigram posting list for fuzzy search on databases without pg_trgm"""
+    trigram = models.CharField(max_length=3)
+    venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='trigrams')
+    
+    class Meta:
+        constraints = [
+            # Also the index fuzzy lookups count shared trigrams on
+            models.UniqueConstraint(fields=['trigram', 'venue'], name='venuetrigram_trigram_venue_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigram!r} -> {self.venue_id}"
+    
+    @classmethod
+    def sync(cls, venues, using=None):
+        """Replace the trigrams of ``venues`` with ones computed from their fields"""
+        venues = [venue for venue in venues if venue.pk]
+        if not venues:
+            return
+        using = using or venues[0]._state.db or 'default'
+        # PostgreSQL searches the venue columns directly through pg_trgm
+        if connections[using].vendor == 'postgresql':
+            return
+        manager = cls.objects.using(using)
+        manager.filter(venue_id__in=[venue.pk for venue in venues]).delete()
+        manager.bulk_create(
+            [cls(trigram=gram, venue_id=venue.pk) for venue in venues for gram in venue_trigrams(venue)],
+            batch_size=5000,
+        )
+
+
 class VenueImage(models.Model):
     """Images for venues"""
     venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='images')
@@ -126,6 +625,11 @@ class Rating(models.Model):
     class Meta:
         unique_together = ['venue', 'user']  # One rating per user per venue
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['venue', '-created_at'], name='rating_venue_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='rating_user_created_idx'),
+            models.Index(fields=['-created_at'], name='rating_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.venue.name} ({self.rating}/5)"
@@ -205,5 +709,174 @@ class Statistics(models.Model):
         self.total_attractions = category_counts.get('Amusement Parks', 0) + category_counts.get('Attractions', 0)
         self.total_users = User.objects.count()
         self.total_ratings = Rating.objects.count()
-        self.total_cities = Venue.objects.filter(is_active=True).values('city').distinct().count()
-        self.save()
\ No newline at end of file
+        self.total_cities = City.objects.filter(venue_count__gt=0).count()
+        self.save()
+
+
+class ChangeLogEntry(models.Model):
+    """Append-only feed of catalogue changes for incremental consumers"""
+    ACTION_CHOICES = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+    
+    # The primary key doubles as the monotonically increasing cursor
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Whether the change can alter which venues a search finds; rating and
+    # image changes, and venue edits outside Venue.SEARCH_FIELDS, cannot
+    affects_search = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='venues_chg_model_obj_idx'),
+            models.Index(fields=['seq'], condition=models.Q(affects_search=True), name='venues_chg_search_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
+    
+    @classmethod
+    def record(cls, instance, action, using=None, affects_search=True):
+        """Record a change to a single tracked instance"""
+        return cls.objects.using(using or instance._state.db).create(
+            model=instance._meta.model_name, object_id=instance.pk, action=action, affects_search=affects_search
+        )
+    
+    @classmethod
+    def record_many(cls, model, object_ids, action, using=None, affects_search=True):
+        """Record changes made by bulk operations that bypass model signals"""
+        model_name = model._meta.model_name
+        cls.objects.using(using).bulk_create(
+            [
+                cls(model=model_name, object_id=object_id, action=action, affects_search=affects_search)
+                for object_id in object_ids
+            ],
+            batch_size=1000,
+        )
+    
+    @classmethod
+    def latest_seq(cls):
+        """Cursor of the newest entry, usable as a catalogue version number"""
+        return cls.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+    
+    @classmethod
+    def latest_search_seq(cls):
+        """Cursor of the newest entry that can change search results"""
+        return cls.objects.filter(affects_search=True).order_by('-seq').values_list('seq', flat=True).first() or 0
+    
+    @staticmethod
+    def gap_timeout():
+        return timedelta(seconds=getattr(settings, 'CHANGE_FEED_GAP_TIMEOUT', 60))
+    
+    @classmethod
+    def settled_seq(cls):
+        """Newest cursor that no transaction still in flight can fall behind.
+        
+        Sequence numbers are handed out at insert time, not at commit, so an
+        entry written in the last ``CHANGE_FEED_GAP_TIMEOUT`` seconds may
+        still be joined by an older, uncommitted one.
+        """
+        recent = cls.objects.filter(created_at__gte=timezone.now() - cls.gap_timeout())
+        first_recent = recent.order_by('seq').values_list('seq', flat=True).first()
+        return first_recent - 1 if first_recent is not None else cls.latest_seq()
+    
+    @classmethod
+    def changes_since(cls, cursor=0, limit=1000):
+        """Return ``(entries, has_more, next_cursor)`` for up to ``limit`` entries after ``cursor``.
+        
+        A missing sequence number followed by a recent entry may belong to a
+        transaction that has not committed yet, so ``next_cursor`` stops
+        before it and the entries after it are sent again on the next call;
+        consumers de-duplicate by ``seq``. Gaps followed by entries older than
+        ``CHANGE_FEED_GAP_TIMEOUT`` (rollbacks, compaction) are skipped.
+        """
+        entries = list(cls.objects.filter(seq__gt=cursor).order_by('seq')[:limit + 1])
+        page = entries[:limit]
+        settled_before = timezone.now() - cls.gap_timeout()
+        next_cursor = cursor
+        for entry in page:
+            if entry.seq != next_cursor + 1 and entry.created_at > settled_before:
+                break
+            next_cursor = entry.seq
+        # Paging on from a gap would only return the same entries again
+        has_more = len(entries) > limit and bool(page) and next_cursor == page[-1].seq
+        return page, has_more, next_cursor
+    
+    @classmethod
+    def compact(cls, before):
+        """Drop entries older than ``before`` that a later entry supersedes.
+        
+        The newest entry for every object is kept, so a consumer resuming from
+        any cursor still learns about the final state of each object.
+        """
+        latest = cls.objects.values('model', 'object_id').annotate(
+            latest_seq=models.Max('seq')
+        ).values('latest_seq')
+        deleted, _ = cls.objects.filter(created_at__lt=before).exclude(seq__in=latest).delete()
+        return deleted
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Venue)
+@receiver(post_save, sender=VenueImage)
+@receiver(post_save, sender=Rating)
+def record_catalogue_save(sender, instance, created, raw=False, **kwargs):
+    """Append a change-log entry when a catalogue object is saved"""
+    if not raw:
+        affects_search = sender is Venue and (created or instance.search_changed(kwargs.get('update_fields')))
+        ChangeLogEntry.record(
+            instance, 'create' if created else 'update', using=kwargs.get('using'), affects_search=affects_search
+        )
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Venue)
+@receiver(post_delete, sender=VenueImage)
+@receiver(post_delete, sender=Rating)
+def record_catalogue_delete(sender, instance, **kwargs):
+    """Append a change-log entry when a catalogue object is deleted"""
+    ChangeLogEntry.record(
+        instance, 'delete', using=kwargs.get('using'), affects_search=sender in (Category, Venue)
+    )
+
+
+@receiver(post_save, sender=VenueSlugHistory)
+@receiver(post_delete, sender=VenueSlugHistory)
+def record_slug_history_change(sender, instance, raw=False, **kwargs):
+    """Record a venue change when its old links are edited, retiring cached redirects"""
+    if not raw:
+        ChangeLogEntry.record_many(
+            Venue, [instance.venue_id], 'update', using=kwargs.get('using'), affects_search=False
+        )
+
+
+@receiver(post_delete, sender=Venue)
+def release_venue_place(sender, instance, **kwargs):
+    """Stop counting a deleted venue towards its city and country"""
+    city, country = instance._place_state()
+    City.adjust(city, -1, using=kwargs.get('using'))
+    Country.adjust(country, -1, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Venue)
+def sync_venue_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the normalized tags in step with a venue's JSON list fields"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(TAG_FIELDS):
+        return
+    VenueTag.sync([instance], using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Venue)
+def sync_venue_trigrams(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-index a venue for fuzzy search when its name or place changes"""
+    if raw or not instance.search_changed(update_fields, fields=FUZZY_FIELDS):
+        return
+    VenueTrigram.sync([instance], using=kwargs.get('using'))
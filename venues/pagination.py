@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedPage(Page):
+    """Page that knows the handful of page numbers worth linking to"""
+
+    @property
+    def nearby_page_range(self):
+        """Page numbers within two of the current page, without walking every page"""
+        first = max(self.number - 2, 1)
+        last = min(self.number + 2, self.paginator.num_pages)
+        return range(first, last + 1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids exact ``COUNT(*)`` queries over large result sets.
+
+    On PostgreSQL the planner's row estimate is used (``pg_class.reltuples``
+    for unfiltered tables, the EXPLAIN estimate otherwise). Elsewhere an exact
+    count is cached for a while once it is known to be large. Below
+    ``ESTIMATED_COUNT_THRESHOLD`` rows counts are always exact.
+    ``is_estimated`` tells templates whether to say "about N".
+    """
+
+    def __init__(self, *args, threshold=None, cache_timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold or getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000)
+        self.cache_timeout = cache_timeout or getattr(settings, 'ESTIMATED_COUNT_CACHE_TIMEOUT', 300)
+        self.is_estimated = False
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedPage(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            estimate = self._planner_estimate(queryset, connection)
+            if estimate is not None and estimate > self.threshold:
+                self.is_estimated = True
+                return estimate
+            return queryset.count()
+
+        key = self._cache_key(queryset)
+        cached = cache.get(key)
+        if cached is not None and cached > self.threshold:
+            self.is_estimated = True
+            return cached
+        count = queryset.count()
+        if count > self.threshold:
+            cache.set(key, count, self.cache_timeout)
+        return count
+
+    def _planner_estimate(self, queryset, connection):
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # -1 means the table has never been analyzed
+                if row and row[0] >= 0:
+                    return row[0]
+                return None
+            sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+    def _cache_key(self, queryset):
+        sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()
+        return f'paginator-count:{queryset.db}:{digest}'
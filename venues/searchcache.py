@@ -0,0 +1,275 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+
+from django.conf import settings
+
+from .models import ChangeLogEntry
+from .text import fold
+
+
+class FrequencySketch:
+    """Approximate access counts in fixed memory (a count-min sketch).
+
+    Counters saturate at 15 and are all halved once ``sample_size``
+    increments have been recorded, so the sketch follows recent popularity
+    rather than all-time totals.
+    """
+
+    def __init__(self, width=4096, depth=4, sample_size=None):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or width * 10
+        self._rows = [array('B', bytes(width)) for _ in range(depth)]
+        self._additions = 0
+
+    def _slots(self, key):
+        digest = blake2b(repr(key).encode('utf-8'), digest_size=4 * self.depth).digest()
+        for row in range(self.depth):
+            yield row, int.from_bytes(digest[row * 4:row * 4 + 4], 'little') % self.width
+
+    def increment(self, key):
+        for row, slot in self._slots(key):
+            if self._rows[row][slot] < 15:
+                self._rows[row][slot] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key):
+        return min(self._rows[row][slot] for row, slot in self._slots(key))
+
+    def _age(self):
+        for row in self._rows:
+            for slot in range(self.width):
+                row[slot] >>= 1
+        self._additions //= 2
+
+
+class TinyLFUCache:
+    """Bounded mapping that keeps the most frequently requested keys.
+
+    New keys enter a small LRU window. Keys pushed out of the window only
+    move into the main LRU area if the frequency sketch says they are
+    requested more often than the main area's eviction candidate, so a burst
+    of one-off queries cannot flush the popular ones (W-TinyLFU admission).
+    """
+
+    def __init__(self, maxsize=2000, window_fraction=0.01):
+        self.maxsize = maxsize
+        self.window_size = max(1, int(maxsize * window_fraction))
+        self.main_size = max(1, maxsize - self.window_size)
+        self.sketch = FrequencySketch(width=max(64, maxsize * 4))
+        self._window = OrderedDict()
+        self._main = OrderedDict()
+
+    def __len__(self):
+        return len(self._window) + len(self._main)
+
+    def __contains__(self, key):
+        return key in self._window or key in self._main
+
+    def record(self, key):
+        """Count one request for ``key``, whether or not it is cached"""
+        self.sketch.increment(key)
+
+    def get(self, key):
+        """Return ``(hit, value)``"""
+        for area in (self._main, self._window):
+            if key in area:
+                area.move_to_end(key)
+                return True, area[key]
+        return False, None
+
+    def set(self, key, value):
+        for area in (self._main, self._window):
+            if key in area:
+                area[key] = value
+                area.move_to_end(key)
+                return
+        self._window[key] = value
+        if len(self._window) > self.window_size:
+            candidate, candidate_value = self._window.popitem(last=False)
+            self._admit(candidate, candidate_value)
+
+    def _admit(self, candidate, value):
+        if len(self._main) < self.main_size:
+            self._main[candidate] = value
+            return
+        victim = next(iter(self._main))
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            del self._main[victim]
+            self._main[candidate] = value
+
+    def clear(self):
+        """Drop every entry; the frequency sketch is kept"""
+        self._window.clear()
+        self._main.clear()
+
+
+class CachedResults:
+    """Search results held as a ranked id list, for use with a paginator.
+
+    The first ids are cached; pages past them are read from the queryset
+    returned by ``fallback``. Only the venues actually displayed are loaded,
+    by primary key.
+    """
+
+    def __init__(self, ids, total, queryset, fallback):
+        self.ids = ids
+        self.total = total
+        self.queryset = queryset
+        self._fallback = fallback
+        self._ordered = None
+
+    def fallback(self):
+        if self._ordered is None:
+            self._ordered = self._fallback()
+        return self._ordered
+
+    def __len__(self):
+        return self.total
+
+    def count(self):
+        return self.total
+
+    def __iter__(self):
+        for start in range(0, self.total, 100):
+            yield from self[start:start + 100]
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = self.total if item.stop is None else min(item.stop, self.total)
+        if stop <= start:
+            return []
+        if stop > len(self.ids):
+            pks = list(self.fallback()[start:stop].values_list('pk', flat=True))
+        else:
+            pks = self.ids[start:stop]
+        venues = self.queryset.in_bulk(pks)
+        return [venues[pk] for pk in pks if pk in venues]
+
+
+class SearchCache:
+    """Per-process cache of ranked search results.
+
+    Entries are keyed by the normalized ``(scope, query, category,
+    location, filters)`` and hold up to ``max_ids`` venue ids plus the full
+    match count. Every entry belongs to a search version (the newest
+    change-log entry that can change search results: venues created or
+    deleted, renamed, moved, re-categorized or (de)activated), so such a
+    write empties the cache on the next request; popularity counts survive
+    that, so popular queries are re-admitted straight away. Other writes,
+    such as new ratings, only reach the cached rankings when entries expire
+    after ``ttl`` seconds. Hits and misses are counted per key.
+    """
+
+    def __init__(self, maxsize=None, max_ids=None, ttl=None, stats_size=1000):
+        self.maxsize = maxsize or getattr(settings, 'SEARCH_CACHE_SIZE', 2000)
+        self.max_ids = max_ids or getattr(settings, 'SEARCH_CACHE_MAX_IDS', 500)
+        self.ttl = ttl or getattr(settings, 'SEARCH_CACHE_TTL', 300)
+        self.stats_size = stats_size
+        self._lock = threading.Lock()
+        self._entries = TinyLFUCache(self.maxsize)
+        self._version = None
+        self._stats = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(scope, query, category='', location='', filters=''):
+        """``filters`` is any other restriction of the results, in a canonical string form"""
+        return (scope, fold(query or ''), (category or '').strip().lower(), fold(location or ''), filters)
+
+    def _check_version(self, version):
+        # Versions read by slower concurrent requests may arrive out of order
+        if self._version is None or version > self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _count(self, key, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        stats = self._stats.get(key)
+        if stats is None:
+            if len(self._stats) >= self.stats_size:
+                self._prune_stats()
+            stats = self._stats[key] = [0, 0]
+        stats[0 if hit else 1] += 1
+
+    def _prune_stats(self):
+        # Forget the least requested half so the table stays bounded
+        ranked = sorted(self._stats, key=lambda key: sum(self._stats[key]))
+        for key in ranked[:len(ranked) // 2]:
+            del self._stats[key]
+
+    def search(self, key, run, queryset):
+        """Return ``(results, fuzzy)`` for ``key``, calling ``run`` on a miss.
+
+        ``run()`` returns ``(ordered queryset, fuzzy)``; ``queryset`` loads
+        the venues that are displayed.
+        """
+        # Read outside the lock so requests do not queue behind the query
+        version = ChangeLogEntry.latest_search_seq()
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            self._entries.record(key)
+            hit, entry = self._entries.get(key)
+            hit = hit and now - entry[3] < self.ttl
+            self._count(key, hit)
+        if hit:
+            ids, total, fuzzy, _ = entry
+            return CachedResults(ids, total, queryset, lambda: run()[0]), fuzzy
+
+        venues, fuzzy = run()
+        ids = list(venues.values_list('pk', flat=True)[:self.max_ids + 1])
+        total = len(ids) if len(ids) <= self.max_ids else venues.count()
+        ids = ids[:self.max_ids]
+        with self._lock:
+            self._entries.set(key, (ids, total, fuzzy, now))
+        return CachedResults(ids, total, queryset, lambda: venues), fuzzy
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._version = None
+            self.hits = self.misses = 0
+
+    def stats(self, limit=50):
+        """Overall and per-query hit ratios, most requested queries first"""
+        with self._lock:
+            requests = self.hits + self.misses
+            queries = sorted(self._stats.items(), key=lambda item: -sum(item[1]))[:limit]
+            return {
+                'version': self._version,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / requests if requests else 0.0,
+                'queries': [
+                    {
+                        'scope': key[0],
+                        'query': key[1],
+                        'category': key[2],
+                        'location': key[3],
+                        'filters': key[4],
+                        'hits': hits,
+                        'misses': misses,
+                        'hit_ratio': hits / (hits + misses),
+                        'cached': key in self._entries,
+                    }
+                    for key, (hits, misses) in queries
+                ],
+            }
+
+
+search_cache = SearchCache()
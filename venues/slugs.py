@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+# SQLite limits expression depth to 1000, so OR-ed prefix lookups are
+# chunked well below that.
+PREFIX_QUERY_CHUNK = 200
+
+
+# Room kept at the end of every base for a "-<counter>" de-duplication suffix
+SUFFIX_LENGTH = 11
+
+
+def base_slug(name, max_length=200):
+    """Return the slug a venue name would get before de-duplication.
+
+    Long names are cut short enough that a numbered copy still fits in
+    ``max_length``.
+    """
+    return slugify(name)[:max_length - SUFFIX_LENGTH].strip('-') or 'venue'
+
+
+class SlugAllocator:
+    """Allocate unique slugs for many names with one prefix query per batch.
+
+    Existing slugs that share a base prefix are loaded once and the next free
+    numeric suffix is tracked in memory, so allocating slugs for a batch costs
+    a single query instead of one ``exists()`` query per collision.
+    """
+
+    def __init__(self, queryset, field='slug'):
+        self.queryset = queryset
+        self.field = field
+        self._taken = {}
+        self._next_suffix = {}
+        self._allocated = set()
+
+    def load(self, bases):
+        """Load slugs already used for any of ``bases`` that are not cached yet"""
+        missing = sorted({base for base in bases if base not in self._taken})
+        for base in missing:
+            self._taken[base] = set()
+        for start in range(0, len(missing), PREFIX_QUERY_CHUNK):
+            chunk = missing[start:start + PREFIX_QUERY_CHUNK]
+            query = Q()
+            for base in chunk:
+                query |= Q(**{f'{self.field}__startswith': base})
+            existing = self.queryset.filter(query).values_list(self.field, flat=True)
+            for slug in existing.iterator():
+                self._remember(slug, chunk)
+
+    def _remember(self, slug, bases):
+        for base in bases:
+            if slug == base:
+                self._taken[base].add(0)
+            elif slug.startswith(base + '-'):
+                suffix = slug[len(base) + 1:]
+                if suffix.isdigit() and not suffix.startswith('0'):
+                    self._taken[base].add(int(suffix))
+
+    def allocate(self, name):
+        """Return a unique slug for ``name`` and reserve it"""
+        base = base_slug(name)
+        if base not in self._taken:
+            self.load([base])
+        taken = self._taken[base]
+        if 0 not in taken and base not in self._allocated:
+            taken.add(0)
+            self._allocated.add(base)
+            return base
+        counter = self._next_suffix.get(base, 1)
+        while counter in taken or f"{base}-{counter}" in self._allocated:
+            counter += 1
+        taken.add(counter)
+        self._next_suffix[base] = counter + 1
+        slug = f"{base}-{counter}"
+        self._allocated.add(slug)
+        return slug
+
+    def allocate_many(self, names):
+        """Allocate a slug for each name, loading all prefixes in one pass"""
+        names = list(names)
+        self.load(base_slug(name) for name in names)
+        return [self.allocate(name) for name in names]
+
+    def clear(self):
+        """Drop cached prefixes so the next batch reloads them"""
+        self._taken.clear()
+        self._next_suffix.clear()
+        self._allocated.clear()
+
+
+def repair_slugs(queryset, batch_size=1000, allocator=None, on_batch=None):
+    """Assign unique slugs to every venue in ``queryset`` in batches.
+
+    Each batch costs one read, one prefix query for names not seen before and
+    one ``bulk_update``. ``queryset`` must stop matching a venue once it has a
+    slug, since it is re-evaluated for every batch.
+    """
+    if allocator is None:
+        allocator = SlugAllocator(queryset.model.objects.all())
+    fixed = 0
+    while True:
+        batch = list(queryset.order_by('pk').only('pk', 'name', 'slug')[:batch_size])
+        if not batch:
+            return fixed
+        slugs = allocator.allocate_many(venue.name for venue in batch)
+        for venue, slug in zip(batch, slugs):
+            venue.slug = slug
+        queryset.model.objects.bulk_update(batch, ['slug'], batch_size=batch_size)
+        fixed += len(batch)
+        if on_batch:
+            on_batch(batch)
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU cache with a per-entry time to live.
+
+    ``None`` is a valid cached value, so ``get`` returns a ``(hit, value)``
+    pair and negative lookups can be cached too.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
@@ -0,0 +1,57 @@
+from django.utils.text import slugify
+
+
+# Venue JSON list fields and the tag kind each one is normalized into
+TAG_FIELDS = {
+    'facilities': 'facility',
+    'amenities': 'amenity',
+    'languages_spoken': 'language',
+}
+
+# Spellings that mean the same thing, keyed by slugified spelling
+TAG_ALIASES = {
+    'wi-fi': 'wifi',
+    'free-wifi': 'wifi',
+    'free-wi-fi': 'wifi',
+    'wireless-internet': 'wifi',
+    'swimming-pool': 'pool',
+    'car-park': 'parking',
+    'free-parking': 'parking',
+    'ac': 'air-conditioning',
+    'a-c': 'air-conditioning',
+}
+
+
+def canonical_tag(value):
+    """Return the ``(key, name)`` a raw tag value normalizes to, or None"""
+    name = ' '.join(str(value).split())
+    key = slugify(name)[:100].strip('-')
+    if not key:
+        return None
+    key = TAG_ALIASES.get(key, key)
+    return key, name[:1].upper() + name[1:100]
+
+
+def venue_tags(venue):
+    """Return ``{(kind, key): name}`` for the tags a venue's JSON fields describe"""
+    tags = {}
+    for field, kind in TAG_FIELDS.items():
+        values = getattr(venue, field) or []
+        if isinstance(values, str):
+            values = values.split(',')
+        for value in values:
+            tag = canonical_tag(value)
+            if tag:
+                tags.setdefault((kind, tag[0]), tag[1])
+    return tags
+
+
+def parse_tag_filters(params):
+    """Return the ``(kind, key)`` pairs requested through query parameters"""
+    requested = []
+    for kind in TAG_FIELDS.values():
+        for value in params.getlist(kind):
+            tag = canonical_tag(value)
+            if tag and (kind, tag[0]) not in requested:
+                requested.append((kind, tag[0]))
+    return requested
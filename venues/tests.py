@@ -1,3 +1,1360 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from venue_rating_system import routers
+from venue_rating_system.db_backends.pool import ConnectionPool, PoolTimeout
+from venue_rating_system.db_backends.transactions import write_atomic
+from venue_rating_system.metrics import Histogram, exposition
+from venue_rating_system.middleware import ReplicaRoutingMiddleware
+from venue_rating_system.profiling import StackSampler
+
+from .apps import build_venue_indexes
+from .autocomplete import venue_autocomplete
+from .bitmaps import venue_index
+from .exports import iter_export
+from .fuzzy import fuzzy_venue_ids, trigram_frequencies, trigrams
+from .models import (
+    Category, ChangeLogEntry, City, ContactMessage, Country, Venue, VenueImage, VenueSlugHistory, VenueTag,
+    VenueTrigram, Rating, Statistics, legacy_slug_cache,
+)
+from .pagination import EstimatedCountPaginator
+from .searchcache import search_cache
+
+
+# Tables whose row counts grow with the catalogue; small lookup tables such as
+# categories may be scanned freely.
+LARGE_TABLES = ('venues_venue', 'venues_rating')
+
+
+class QueryPlanTests(TestCase):
+    """Fail when the main query of a view regresses to a full table scan.
+
+    Every query a view issues against a large table is re-run under EXPLAIN
+    (EXPLAIN QUERY PLAN on SQLite) and the plan is checked for sequential
+    scans and, on SQLite, for sorts that no index satisfies. Searches may
+    sort their matches once an index has found them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hotels = Category.objects.create(name='Hotels', slug='hotels')
+        cls.cafes = Category.objects.create(name='Cafes', slug='cafes')
+        cls.admin = User.objects.create_superuser('planner', 'planner@example.com', 'password')
+        cls.admin.profile.is_admin = True
+        cls.admin.profile.save()
+        cls.user = User.objects.create_user('visitor', 'visitor@example.com', 'password')
+        cls.venues = []
+        for i in range(20):
+            cls.venues.append(Venue.objects.create(
+                name=f'Venue {i}',
+                description='A place to stay',
+                category=cls.hotels if i % 2 else cls.cafes,
+                address=f'{i} Main Street',
+                city='Paris' if i % 3 else 'Lyon',
+                country='France',
+                is_featured=i % 5 == 0,
+            ))
+        for venue in cls.venues[:10]:
+            Rating.objects.create(venue=venue, user=cls.user, rating=4, comment='Lovely')
+            Rating.objects.create(venue=venue, user=cls.admin, rating=5)
+            venue.update_rating_stats()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so make the planner cost them like
+            # production-sized ones
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return '\n'.join(row[-1] for row in cursor.fetchall())
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def plan_problems(self, plan, sorts_matches=False):
+        problems = []
+        for line in plan.splitlines():
+            if connection.vendor == 'sqlite':
+                match = re.search(r'\bSCAN (\w+)(.*)', line)
+                if match and match.group(1) in LARGE_TABLES and 'USING' not in match.group(2):
+                    problems.append(line.strip())
+                if 'USE TEMP B-TREE FOR ORDER BY' in line and not sorts_matches:
+                    problems.append(line.strip())
+            else:
+                match = re.search(r'Seq Scan on (\w+)', line)
+                if match and match.group(1) in LARGE_TABLES:
+                    problems.append(line.strip())
+        return problems
+
+    def assertIndexedQueries(self, url, user=None, sorts_matches=False):
+        if user:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+
+        checked = 0
+        for query in captured:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(f'"{table}"' in sql for table in LARGE_TABLES):
+                continue
+            checked += 1
+            plan = self.explain(sql)
+            problems = self.plan_problems(plan, sorts_matches)
+            if problems:
+                self.fail(
+                    f'{url} issued a query without a usable index:\n{sql}\n\n'
+                    f'Plan:\n{plan}\n\nProblems: {problems}'
+                )
+        self.assertGreater(checked, 0, f'{url} issued no queries against {LARGE_TABLES}')
+
+    def test_home(self):
+        self.assertIndexedQueries(reverse('venues:home'))
+
+    def test_venue_list(self):
+        self.assertIndexedQueries(reverse('venues:venue_list'))
+        self.assertIndexedQueries(reverse('venues:venue_list') + '?category=hotels')
+        self.assertIndexedQueries(reverse('venues:venue_list') + '?page=2')
+
+    def test_venue_search(self):
+        for query in ('venue', 'ue 1&category=hotels', 'pa'):
+            self.assertIndexedQueries(reverse('venues:venue_search') + f'?q={query}', sorts_matches=True)
+
+    def test_venue_list_by_category(self):
+        self.assertIndexedQueries(reverse('venues:venue_list_by_category', args=['hotels']))
+
+    def test_venue_detail(self):
+        self.assertIndexedQueries(reverse('venues:venue_detail', args=[self.venues[1].slug]))
+        self.assertIndexedQueries(reverse('venues:venue_detail', args=[self.venues[1].slug]), self.user)
+
+    def test_about(self):
+        self.assertIndexedQueries(reverse('venues:about'))
+
+    def test_profile(self):
+        self.assertIndexedQueries(reverse('accounts:profile'), self.user)
+
+    def test_admin_dashboard(self):
+        self.assertIndexedQueries(reverse('venues:admin_dashboard'), self.admin)
+
+    def test_admin_venues_by_category(self):
+        self.assertIndexedQueries(reverse('venues:admin_venues_by_category', args=['hotels']), self.admin)
+
+    def test_admin_venue_changelist(self):
+        url = reverse('admin:venues_venue_changelist')
+        self.assertIndexedQueries(f'{url}?category__id__exact={self.hotels.pk}', self.admin)
+
+    def test_admin_rating_changelist(self):
+        self.assertIndexedQueries(reverse('admin:venues_rating_changelist'), self.admin)
+
+
+class QueryBudgetTests(TestCase):
+    """Fail when a page's query count grows with the data or exceeds its budget.
+
+    Every URL in venues/urls.py and accounts/urls.py is requested as an
+    anonymous visitor, a signed-in user and an admin. The catalogue is then
+    grown and every request repeated: a page whose query count changed has
+    an N+1 somewhere, and the failure lists the SQL it ran.
+    """
+
+    # Most queries a page may issue for any visitor
+    BUDGETS = {
+        'venues:home': 7,
+        'venues:venue_list': 17,
+        'venues:venue_search': 10,
+        'venues:venue_list_by_category': 12,
+        'venues:venue_detail': 9,
+        'venues:rate_venue': 7,
+        'venues:admin_dashboard': 8,
+        'venues:admin_venues_by_category': 10,
+        'venues:admin_edit_venues': 6,
+        'venues:admin_bulk_action': 4,
+        'venues:add_venue': 4,
+        'venues:edit_venue': 8,
+        'venues:delete_venue': 5,
+        'venues:admin_export': 4,
+        'venues:admin_search_cache': 3,
+        'venues:change_feed': 4,
+        'venues:autocomplete': 4,
+        'venues:contact': 3,
+        'venues:about': 4,
+        'accounts:profile': 4,
+        'accounts:edit_profile': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(name=name, slug=slug)
+            for name, slug in [('Hotels', 'hotels'), ('Restaurants', 'restaurants'), ('Cafes', 'cafes')]
+        ]
+        cls.admin = User.objects.create_superuser('budget-admin', 'admin@example.com', 'password')
+        cls.admin.profile.is_admin = True
+        cls.admin.profile.save()
+        cls.user = User.objects.create_user('budget-user', 'user@example.com', 'password')
+        cls.raters = [User.objects.create_user(f'rater{i}', f'rater{i}@example.com', 'password') for i in range(3)]
+        # Enough venues per category that searches never fall back to fuzzy matching
+        cls.venue = cls.seed(5)[0]
+        ContactMessage.objects.create(name='Visitor', email='visitor@example.com', subject='Hello', message='Hi')
+        Statistics.get_or_create_stats()
+
+    @classmethod
+    def seed(cls, per_category):
+        """Add ``per_category`` venues to every category, each with images and ratings"""
+        venues = []
+        for category in cls.categories:
+            for _ in range(per_category):
+                number = Venue.objects.count()
+                venue = Venue.objects.create(
+                    name=f'{category.name} {number}',
+                    description='A place worth a visit',
+                    category=category,
+                    address=f'{number} Main Street',
+                    city=['Paris', 'Lyon', 'Nice'][number % 3],
+                    country='France',
+                    facilities=['WiFi', 'Parking'],
+                    amenities=['Pool'] if number % 2 else [],
+                    languages_spoken=['English', 'French'],
+                    price_range_min=20 + number,
+                    is_featured=number % 4 == 0,
+                )
+                for order in range(3):
+                    VenueImage.objects.create(venue=venue, image=f'venues/images/{number}-{order}.jpg', order=order)
+                for rater in cls.raters + [cls.user, cls.admin]:
+                    Rating.objects.create(venue=venue, user=rater, rating=1 + number % 5, comment='Nice')
+                venue.update_rating_stats()
+                venues.append(venue)
+        return venues
+
+    def urls(self):
+        """(budget key, url) for every route, with realistic arguments"""
+        category = self.categories[0].slug
+        return [
+            ('venues:home', reverse('venues:home')),
+            ('venues:venue_list', reverse('venues:venue_list')),
+            ('venues:venue_list', reverse('venues:venue_list') + '?search=hotels&city=par&facility=wifi'),
+            ('venues:venue_search', reverse('venues:venue_search') + '?q=hotels&location=france'),
+            ('venues:venue_list_by_category', reverse('venues:venue_list_by_category', args=[category])),
+            ('venues:venue_detail', reverse('venues:venue_detail', args=[self.venue.slug])),
+            ('venues:rate_venue', reverse('venues:rate_venue', args=[self.venue.slug])),
+            ('venues:admin_dashboard', reverse('venues:admin_dashboard')),
+            ('venues:admin_venues_by_category', reverse('venues:admin_venues_by_category', args=[category])),
+            ('venues:admin_edit_venues', reverse('venues:admin_edit_venues', args=[category])),
+            ('venues:admin_bulk_action', reverse('venues:admin_bulk_action', args=[category])),
+            ('venues:add_venue', reverse('venues:add_venue')),
+            ('venues:edit_venue', reverse('venues:edit_venue', args=[self.venue.pk])),
+            ('venues:delete_venue', reverse('venues:delete_venue', args=[self.venue.pk])),
+            ('venues:admin_export', reverse('venues:admin_export', args=['venues']) + '?format=csv'),
+            ('venues:admin_export', reverse('venues:admin_export', args=['ratings']) + '?format=ndjson'),
+            ('venues:admin_search_cache', reverse('venues:admin_search_cache')),
+            ('venues:change_feed', reverse('venues:change_feed')),
+            ('venues:autocomplete', reverse('venues:autocomplete') + '?q=ho'),
+            ('venues:contact', reverse('venues:contact')),
+            ('venues:about', reverse('venues:about')),
+            ('accounts:profile', reverse('accounts:profile')),
+            ('accounts:edit_profile', reverse('accounts:edit_profile')),
+        ]
+
+    def reset_caches(self):
+        # Cached pages cost fewer queries; measure every page cold
+        cache.clear()
+        search_cache.clear()
+        legacy_slug_cache.clear()
+        venue_autocomplete.clear()
+
+    def measure(self, url, user):
+        self.client.logout()
+        if user:
+            self.client.force_login(user)
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        # Redirects and 403s for visitors without access are measured too
+        self.assertLess(response.status_code, 500, url)
+        return [query['sql'] for query in captured]
+
+    def measure_all(self):
+        return {
+            (key, url, role): self.measure(url, user)
+            for key, url in self.urls()
+            for role, user in [('anonymous', None), ('user', self.user), ('admin', self.admin)]
+        }
+
+    def test_query_budgets(self):
+        before = self.measure_all()
+        self.seed(3)
+        after = self.measure_all()
+
+        problems = []
+        for (key, url, role), queries in after.items():
+            if len(queries) != len(before[(key, url, role)]):
+                problems.append(
+                    f'{url} as {role}: {len(before[(key, url, role)])} queries grew to {len(queries)} '
+                    f'with more data:\n  ' + '\n  '.join(queries)
+                )
+            elif len(queries) > self.BUDGETS[key]:
+                problems.append(
+                    f'{url} as {role}: {len(queries)} queries, budget {self.BUDGETS[key]}:\n  '
+                    + '\n  '.join(queries)
+                )
+        if problems:
+            self.fail('\n\n'.join(problems))
+
+
+class ImportVenuesTests(TestCase):
+    """Row handling of the import_venues command"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(name='Hotels', slug='hotels')
+
+    def import_csv(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as handle:
+            handle.write(text)
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_venues', handle.name, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_blank_boolean_cells_keep_the_default(self):
+        self.import_csv(
+            'name,description,category,address,city,country,is_active,is_featured\n'
+            'Blank Inn,Nice,hotels,1 Road,Paris,France,,\n'
+            'Closed Inn,Nice,hotels,2 Road,Paris,France,no,yes\n'
+        )
+        self.assertTrue(Venue.objects.get(name='Blank Inn').is_active)
+        self.assertFalse(Venue.objects.get(name='Blank Inn').is_featured)
+        self.assertFalse(Venue.objects.get(name='Closed Inn').is_active)
+        self.assertTrue(Venue.objects.get(name='Closed Inn').is_featured)
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_venues', '/nonexistent/venues.csv')
+
+
+class ExportTests(TestCase):
+    """Exports stream every row, compressed or not, to admins only"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        self.admin = User.objects.create_user('exporter', 'exporter@example.com', 'pw')
+        self.admin.profile.is_admin = True
+        self.admin.profile.save()
+        self.user = User.objects.create_user('visitor', 'visitor@example.com', 'pw')
+        self.grand, self.lumiere = (
+            Venue.objects.create(
+                name=name, description='x', category=category, address='1 Road', city=city, country='France',
+                facilities=['Wifi'],
+            )
+            for name, city in (('Grand Hotel', 'Paris'), ('Hôtel Lumière', 'Lyon'))
+        )
+        Rating.objects.create(venue=self.grand, user=self.user, rating=4, comment='Quiet, "clean"')
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse('venues:admin_export', args=[dataset]), params)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_has_a_header_and_every_row(self):
+        self.client.force_login(self.admin)
+        response, body = self.export('venues', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8'))))
+        self.assertEqual([row['name'] for row in rows], ['Grand Hotel', 'Hôtel Lumière'])
+        self.assertEqual(rows[0]['category_slug'], 'hotels')
+        self.assertEqual(json.loads(rows[0]['facilities']), ['Wifi'])
+        _, body = self.export('venues', format='csv', city='paris')
+        self.assertEqual(len(body.decode('utf-8').splitlines()), 2)
+
+    def test_gzip_decompresses_to_the_same_ndjson(self):
+        self.client.force_login(self.admin)
+        _, plain = self.export('ratings', format='ndjson')
+        response, compressed = self.export('ratings', format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="ratings.ndjson.gz"')
+        self.assertEqual(gzip.decompress(compressed), plain)
+        rows = [json.loads(line) for line in plain.decode('utf-8').splitlines()]
+        self.assertEqual(rows, [{
+            **rows[0], 'venue_id': self.grand.pk, 'venue_slug': self.grand.slug, 'comment': 'Quiet, "clean"',
+        }])
+
+    def test_compression_spans_buffer_boundaries(self):
+        with mock.patch('venues.exports.EXPORT_BUFFER_SIZE', 16):
+            chunks = list(iter_export('venues', export_format='csv', compress=True, chunk_size=1))
+            plain = b''.join(iter_export('venues', export_format='csv', chunk_size=1))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), plain)
+
+    def test_non_admins_are_refused(self):
+        url = reverse('venues:admin_export', args=['venues'])
+        self.assertTrue(self.client.get(url)['Location'].startswith(reverse('account_login')))
+        self.client.force_login(self.user)
+        self.assertRedirects(self.client.get(url, {'format': 'ndjson'}), reverse('venues:home'))
+
+    def test_export_data_command_writes_a_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'venues.ndjson.gz')
+            call_command('export_data', 'venues', '--format', 'ndjson', '--gzip', '-o', path, stderr=io.StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as handle:
+                names = [json.loads(line)['name'] for line in handle]
+        self.assertEqual(names, ['Grand Hotel', 'Hôtel Lumière'])
+
+
+class MaintenanceCommandTests(TestCase):
+    """Commands that bulk-update venues record their changes in the change log"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        self.venue = Venue.objects.create(
+            name='Grand Hôtel', description='x', category=category, address='1 Road', city='Paris', country='France',
+        )
+
+    def assertRecorded(self, command, *args):
+        before = ChangeLogEntry.latest_search_seq()
+        call_command(command, *args, stdout=io.StringIO())
+        self.assertGreater(ChangeLogEntry.latest_search_seq(), before)
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(seq__gt=before).values_list('model', 'object_id').get(),
+            ('venue', self.venue.pk),
+        )
+
+    def test_sync_places(self):
+        Venue.objects.filter(pk=self.venue.pk).update(city_ref=None, country_ref=None)
+        self.assertRecorded('sync_places')
+        self.assertIsNotNone(Venue.objects.get(pk=self.venue.pk).city_ref)
+
+    def test_backfill_folded_fields(self):
+        Venue.objects.filter(pk=self.venue.pk).update(name_folded='')
+        self.assertRecorded('backfill_folded_fields')
+        self.assertEqual(Venue.objects.get(pk=self.venue.pk).name_folded, 'grand hotel')
+
+    def test_rebuild_trigrams(self):
+        VenueTrigram.objects.filter(venue=self.venue).delete()
+        self.assertRecorded('rebuild_trigrams')
+        self.assertTrue(VenueTrigram.objects.filter(venue=self.venue, trigram='hot').exists())
+        before = ChangeLogEntry.latest_seq()
+        call_command('rebuild_trigrams', stdout=io.StringIO())
+        self.assertEqual(ChangeLogEntry.latest_seq(), before)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Large counts are served from the cache and labelled as estimates"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Hotels', slug='hotels')
+        for number in range(3):
+            self.venue(f'Venue {number}')
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw'))
+
+    def venue(self, name):
+        return Venue.objects.create(
+            name=name, description='x', category=self.category, address='1 Road', city='Paris', country='France',
+        )
+
+    def test_small_counts_are_exact(self):
+        paginator = EstimatedCountPaginator(Venue.objects.all(), 2, threshold=5)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.is_estimated)
+        self.venue('Venue 3')
+        self.assertEqual(EstimatedCountPaginator(Venue.objects.all(), 2, threshold=5).count, 4)
+
+    def test_large_counts_are_cached_and_marked_as_estimates(self):
+        paginator = EstimatedCountPaginator(Venue.objects.all(), 2, threshold=2)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.is_estimated)
+        self.venue('Venue 3')
+        paginator = EstimatedCountPaginator(Venue.objects.all(), 2, threshold=2)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.is_estimated)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+    def test_admin_changelist_says_about(self):
+        url = reverse('admin:venues_venue_changelist')
+        self.assertNotContains(self.client.get(url), 'about 3 venues')
+        self.assertContains(self.client.get(url), 'about 3 venues')
+
+
+class SlugTests(TestCase):
+    """Slug allocation limits"""
+
+    def test_long_colliding_names_fit_the_slug_column(self):
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        name = 'Grand ' + 'x' * 194
+        max_length = Venue._meta.get_field('slug').max_length
+        slugs = []
+        for _ in range(12):
+            venue = Venue.objects.create(
+                name=name, description='Long', category=category, address='1 Road', city='Paris', country='France',
+            )
+            slugs.append(venue.slug)
+        self.assertEqual(len(set(slugs)), len(slugs))
+        for slug in slugs:
+            self.assertLessEqual(len(slug), max_length)
+            self.assertFalse(slug.endswith('-'))
+
+
+class SlugRedirectTests(TestCase):
+    """Old venue links redirect to the current page"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        self.venue = Venue.objects.create(
+            name='Old Place', description='x', category=category, address='1 Road', city='Paris', country='France',
+        )
+
+    def get(self, slug):
+        return self.client.get(reverse('venues:venue_detail', args=[slug]))
+
+    def rename(self, venue, slug):
+        venue.slug = slug
+        venue.save()
+
+    def test_chained_renames_redirect_to_the_current_slug(self):
+        self.rename(self.venue, 'new-place')
+        self.rename(self.venue, 'newest-place')
+        for slug in ('old-place', 'new-place'):
+            response = self.get(slug)
+            self.assertEqual(response.status_code, 301)
+            self.assertEqual(response['Location'], reverse('venues:venue_detail', args=['newest-place']))
+        self.assertEqual(self.get('newest-place').status_code, 200)
+
+    def test_unknown_slugs_are_not_found(self):
+        self.assertEqual(self.get('no-such-place').status_code, 404)
+        self.assertEqual(self.get('no-such-place').status_code, 404)
+
+    def test_a_reused_slug_serves_the_live_venue(self):
+        self.rename(self.venue, 'new-place')
+        self.assertEqual(self.get('old-place').status_code, 301)
+        other = Venue.objects.create(
+            name='Other', slug='old-place', description='x', category=self.venue.category, address='2 Road',
+            city='Lyon', country='France',
+        )
+        response = self.get('old-place')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['venue'], other)
+
+    def test_history_edits_retire_cached_redirects(self):
+        self.rename(self.venue, 'new-place')
+        self.assertEqual(self.get('old-place').status_code, 301)
+        VenueSlugHistory.objects.get(old_slug='old-place').delete()
+        self.assertEqual(self.get('old-place').status_code, 404)
+
+
+class ChangeFeedTests(TestCase):
+    """The change-feed cursor never skips an entry that commits late"""
+
+    def entry(self, seq, age=0):
+        return ChangeLogEntry.objects.create(
+            seq=seq, model='venue', object_id=seq, action='update',
+            created_at=timezone.now() - timedelta(seconds=age),
+        )
+
+    def test_out_of_order_commit_is_not_skipped(self):
+        self.entry(1)
+        # Seq 2 was handed out first but its transaction commits after seq 3
+        self.entry(3)
+        entries, has_more, cursor = ChangeLogEntry.changes_since(0)
+        self.assertEqual([entry.seq for entry in entries], [1, 3])
+        self.assertEqual(cursor, 1)
+        self.assertFalse(has_more)
+
+        self.entry(2)
+        entries, has_more, cursor = ChangeLogEntry.changes_since(cursor)
+        self.assertEqual([entry.seq for entry in entries], [2, 3])
+        self.assertEqual(cursor, 3)
+
+    def test_old_gaps_are_skipped(self):
+        # A rolled-back or compacted entry never shows up
+        self.entry(1, age=3600)
+        self.entry(3, age=3600)
+        self.entry(4)
+        entries, has_more, cursor = ChangeLogEntry.changes_since(0)
+        self.assertEqual([entry.seq for entry in entries], [1, 3, 4])
+        self.assertEqual(cursor, 4)
+
+    def test_paging_stops_at_an_unsettled_gap(self):
+        self.entry(1)
+        self.entry(3)
+        self.entry(4)
+        entries, has_more, cursor = ChangeLogEntry.changes_since(0, limit=2)
+        self.assertEqual(cursor, 1)
+        self.assertFalse(has_more)
+
+    def test_settled_seq_stays_behind_recent_entries(self):
+        self.entry(1, age=3600)
+        self.entry(2)
+        self.assertEqual(ChangeLogEntry.settled_seq(), 1)
+
+
+class VenueSaveTests(TestCase):
+    """A venue and the rows derived from it are written together"""
+
+    def test_failed_side_write_rolls_back_the_venue(self):
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        with mock.patch.object(VenueTag, 'sync', side_effect=RuntimeError('tag index down')):
+            with self.assertRaises(RuntimeError):
+                Venue.objects.create(
+                    name='Half Saved', description='x', category=category, address='1 Road',
+                    city='Paris', country='France', facilities=['WiFi'],
+                )
+        self.assertFalse(Venue.objects.exists())
+        self.assertFalse(ChangeLogEntry.objects.filter(model='venue').exists())
+        self.assertFalse(City.objects.filter(venue_count__gt=0).exists())
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_READ_VIEWS=['venues:venue_list'])
+class ReplicaRoutingTests(TestCase):
+    """Reads go to a replica only inside replica-eligible requests"""
+
+    def setUp(self):
+        self.addCleanup(routers._health.clear)
+        self.factory = RequestFactory()
+
+    def request(self, method='get', **cookies):
+        request = getattr(self.factory, method)(reverse('venues:venue_list'))
+        request.COOKIES.update(cookies)
+        request.resolver_match = resolve(request.path)
+        return request
+
+    def test_router_follows_the_selected_replica(self):
+        router = routers.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Venue))
+        token = routers.use_replica('replica')
+        try:
+            self.assertEqual(router.db_for_read(Venue), 'replica')
+        finally:
+            routers.reset_replica(token)
+        self.assertIsNone(router.db_for_read(Venue))
+
+        venue = Venue(name='Read Elsewhere')
+        venue._state.db = 'replica'
+        self.assertEqual(router.db_for_write(Venue, instance=venue), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'venues'))
+        self.assertTrue(router.allow_migrate('default', 'venues'))
+
+    def test_replica_is_released_after_the_request(self):
+        seen = []
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            seen.append(routers._read_alias.get())
+            raise RuntimeError('view failed')
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        with mock.patch('venue_rating_system.middleware.choose_replica', return_value='replica'):
+            with self.assertRaises(RuntimeError):
+                middleware(self.request())
+        self.assertEqual(seen, ['replica'])
+        self.assertIsNone(routers._read_alias.get())
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        response = middleware(self.request('post'))
+        pin = response.cookies['primary_pin']
+        self.assertEqual(pin['max-age'], 10)
+
+        with mock.patch('venue_rating_system.middleware.choose_replica', return_value='replica') as choose:
+            request = self.request(primary_pin=pin.value)
+            request.replica_token = request.replica_alias = None
+            middleware.process_view(request, None, (), {})
+            choose.assert_not_called()
+            self.assertIsNone(routers._read_alias.get())
+
+            request = self.request(primary_pin='0')
+            middleware.process_view(request, None, (), {})
+            self.addCleanup(routers.reset_replica, request.replica_token)
+            self.assertEqual(routers._read_alias.get(), 'replica')
+
+    def test_failed_replica_read_retries_on_the_primary(self):
+        aliases = []
+
+        def view(request):
+            aliases.append(routers._read_alias.get())
+            if routers._read_alias.get() == 'replica':
+                raise OperationalError('replica went away')
+            return HttpResponse('from primary')
+
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        request = self.request()
+        with mock.patch('venue_rating_system.middleware.choose_replica', return_value='replica'), \
+                mock.patch('venue_rating_system.middleware.connections') as connections:
+            middleware.process_view(request, view, (), {})
+            with self.assertRaises(OperationalError) as raised:
+                view(request)
+            response = middleware.process_exception(request, raised.exception)
+
+        self.assertEqual(response.content, b'from primary')
+        self.assertEqual(aliases, ['replica', None])
+        connections.__getitem__.assert_called_with('replica')
+        self.assertFalse(routers.replica_is_healthy('replica'))
+        self.assertIsNone(middleware.process_exception(request, OperationalError('primary down')))
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingEndToEndTests(TransactionTestCase):
+    """Requests read from the mirrored replica alias unless pinned or unhealthy"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.addCleanup(routers._health.clear)
+        category = Category.objects.create(name='Hotels', slug='hotels')
+        Venue.objects.create(
+            name='Grand Hotel', description='x', category=category, address='1 Road', city='Paris', country='France',
+        )
+
+    def replica_reads(self, url):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(replica)
+
+    def test_listed_views_read_from_the_replica(self):
+        self.assertGreater(self.replica_reads(reverse('venues:venue_list')), 0)
+        self.assertEqual(self.replica_reads(reverse('venues:contact')), 0)
+
+    def test_a_write_pins_the_next_reads_to_the_primary(self):
+        response = self.client.post(reverse('venues:contact'), {})
+        self.assertIn('primary_pin', response.cookies)
+        self.assertEqual(self.replica_reads(reverse('venues:venue_list')), 0)
+        # Once the pin has expired the replica is used again
+        self.client.cookies['primary_pin'] = '0'
+        self.assertGreater(self.replica_reads(reverse('venues:venue_list')), 0)
+
+    def test_a_failed_health_check_falls_back_to_the_primary(self):
+        replica = connections['replica']
+        with mock.patch.object(replica, 'cursor', side_effect=OperationalError('replica down')) as cursor:
+            self.assertEqual(self.replica_reads(reverse('venues:venue_list')), 0)
+            self.assertEqual(self.replica_reads(reverse('venues:venue_list')), 0)
+        # Probed once, then skipped until the next health check is due
+        cursor.assert_called_once()
+        self.assertFalse(routers.replica_is_healthy('replica'))
+
+
+class VenueBitmapIndexTests(TestCase):
+    """The bitmap index follows committed venue changes"""
+
+    def setUp(self):
+        self.hotels = Category.objects.create(name='Hotels', slug='hotels')
+        self.bars = Category.objects.create(name='Bars', slug='bars')
+        self.low = self.venue('Low Hotel', self.hotels, 2.5, 4)
+        self.high = self.venue('High Hotel', self.hotels, 4.5, 10)
+        self.bar = self.venue('Corner Bar', self.bars, 4.0, 3)
+        venue_index.build()
+        self.addCleanup(venue_index.clear)
+
+    def venue(self, name, category, rating, count):
+        return Venue.objects.create(
+            name=name, description='x', category=category, address='1 Road', city='Paris',
+            country='France', average_rating=rating, total_ratings=count,
+        )
+
+    def listed(self, **filters):
+        return venue_index.ordered(venue_index.filter(**filters))
+
+    def test_filter_and_order_follow_saves_and_deletes(self):
+        self.assertEqual(self.listed(category=self.hotels.pk), [self.high.pk, self.low.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.venue('Top Hotel', self.hotels, 5.0, 1)
+        self.assertEqual(self.listed(category=self.hotels.pk), [added.pk, self.high.pk, self.low.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.low.average_rating = 4.8
+            self.low.category = self.bars
+            self.low.save()
+        self.assertEqual(self.listed(category=self.hotels.pk), [added.pk, self.high.pk])
+        self.assertEqual(self.listed(category=self.bars.pk), [self.low.pk, self.bar.pk])
+        self.assertEqual(self.listed(), [added.pk, self.low.pk, self.high.pk, self.bar.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.high.delete()
+        self.assertEqual(self.listed(category=self.hotels.pk), [added.pk])
+        self.assertEqual(venue_index.ordered(venue_index.filter(), offset=1, limit=2), [self.low.pk, self.bar.pk])
+        self.assertEqual(venue_index.verify(), [])
+
+    def test_uncommitted_changes_are_not_indexed(self):
+        high_pk = self.high.pk
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.bar.category = self.hotels
+            self.bar.save()
+            self.high.delete()
+        self.assertTrue(callbacks)
+        self.assertEqual(self.listed(category=self.hotels.pk), [high_pk, self.low.pk])
+        self.assertEqual(self.listed(category=self.bars.pk), [self.bar.pk])
+
+    @mock.patch('venues.apps.connections')
+    def test_enabled_index_is_built_at_startup(self, connections):
+        venue_index.clear()
+        with override_settings(VENUE_BITMAP_INDEX=False):
+            build_venue_indexes()
+        self.assertFalse(venue_index.is_built)
+        with override_settings(VENUE_BITMAP_INDEX=True):
+            build_venue_indexes()
+        self.assertTrue(venue_index.is_built)
+        connections.close_all.assert_called()
+
+
+class AutocompleteTests(TestCase):
+    """Suggestions follow venue and category changes"""
+
+    def setUp(self):
+        self.hotels = Category.objects.create(name='Hotels', slug='hotels')
+        self.grand = self.venue('Grand Hotel', 'Paris', 5)
+        self.venue('Hotel Lumière', 'Lyon', 2)
+        venue_autocomplete.build()
+        self.addCleanup(venue_autocomplete.clear)
+
+    def venue(self, name, city, count, category=None):
+        return Venue.objects.create(
+            name=name, description='x', category=category or self.hotels, address='1 Road', city=city,
+            country='France', total_ratings=count,
+        )
+
+    def suggest(self, query):
+        response = self.client.get(reverse('venues:autocomplete'), {'q': query})
+        return [(result['type'], result['label']) for result in response.json()['results']]
+
+    def test_venues_cities_and_categories_are_suggested_by_popularity(self):
+        response = self.client.get(reverse('venues:autocomplete'), {'q': 'HOT'})
+        results = response.json()['results']
+        self.assertEqual(results[0], {
+            'type': 'venue', 'label': 'Grand Hotel', 'url': reverse('venues:venue_detail', args=[self.grand.slug]),
+        })
+        self.assertIn({
+            'type': 'category', 'label': 'Hotels', 'url': reverse('venues:venue_list_by_category', args=['hotels']),
+        }, results)
+        self.assertIn(('venue', 'Hotel Lumière'), self.suggest('hotel lu'))
+        self.assertEqual(self.suggest('lyo'), [('city', 'Lyon')])
+        self.assertEqual(self.client.get(reverse('venues:autocomplete'), {'limit': 'x'}).status_code, 400)
+
+    def test_saves_and_deletes_update_the_suggestions(self):
+        bars = Category.objects.create(name='Bars', slug='bars')
+        with self.captureOnCommitCallbacks(execute=True):
+            hostel = self.venue('Hostel Nord', 'Lille', 1)
+            self.venue('Corner Bar', 'Lille', 1, bars)
+        self.assertIn(('venue', 'Hostel Nord'), self.suggest('hos'))
+        self.assertIn(('category', 'Bars'), self.suggest('bar'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotels.name = 'Lodging'
+            self.hotels.save()
+        self.assertEqual(self.suggest('lodg'), [('category', 'Lodging')])
+        self.assertNotIn(('category', 'Hotels'), self.suggest('hot'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hostel.delete()
+            bars.delete()
+        self.assertEqual(self.suggest('hos'), [])
+        self.assertEqual(self.suggest('bar'), [])
+
+    def test_category_changes_made_elsewhere_are_replayed(self):
+        Category.objects.filter(pk=self.hotels.pk).update(name='Inns')
+        ChangeLogEntry.record(self.hotels, 'update')
+        venue_autocomplete.sync()
+        self.assertEqual(self.suggest('inn'), [('category', 'Inns')])
+
+    @override_settings(VENUE_AUTOCOMPLETE_INDEX=False)
+    def test_suggestions_are_queried_when_the_index_is_disabled(self):
+        venue_autocomplete.clear()
+        self.assertEqual(self.suggest('hot'), [('venue', 'Hotel Lumière'), ('category', 'Hotels')])
+        self.assertEqual(self.suggest('grand h'), [('venue', 'Grand Hotel')])
+        self.assertEqual(self.suggest('par'), [('city', 'Paris')])
+        self.assertFalse(venue_autocomplete.is_built)
+
+
+class VenueTagTests(TestCase):
+    """Facility spellings collapse into one tag that listings filter on"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Hotels', slug='hotels')
+        self.wired = self.venue('Wired Hotel', ['Wi-Fi', 'wifi', 'Free WiFi', 'Parking'])
+        self.wireless = self.venue('Wireless Hotel', ['Wireless Internet'])
+        self.offline = self.venue('Offline Hotel', ['Parking'])
+
+    def venue(self, name, facilities):
+        return Venue.objects.create(
+            name=name, description='x', category=self.category, address='1 Road', city='Paris', country='France',
+            facilities=facilities,
+        )
+
+    def listed(self, **params):
+        response = self.client.get(reverse('venues:venue_list'), params)
+        return {venue.pk for venue in response.context['venues']}
+
+    def test_aliases_share_one_canonical_tag(self):
+        self.assertEqual(
+            set(self.wired.tags.filter(kind='facility').values_list('key', flat=True)), {'wifi', 'parking'}
+        )
+        wifi = VenueTag.objects.get(kind='facility', key='wifi')
+        self.assertEqual(set(wifi.venues.all()), {self.wired, self.wireless})
+
+    def test_listing_filters_on_the_canonical_tag(self):
+        self.assertEqual(self.listed(facility='Wi-Fi'), {self.wired.pk, self.wireless.pk})
+        self.assertEqual(self.listed(facility=['wifi', 'parking']), {self.wired.pk})
+        self.wired.facilities = ['Parking']
+        self.wired.save()
+        self.assertEqual(self.listed(facility='free wi-fi'), {self.wireless.pk})
+
+
+class FacetTests(TestCase):
+    """Each facet is counted with every filter except its own"""
+
+    def setUp(self):
+        cache.clear()
+        self.hotels = Category.objects.create(name='Hotels', slug='hotels')
+        self.bars = Category.objects.create(name='Bars', slug='bars')
+        for name, category, city, price in (
+            ('Paris Hotel', self.hotels, 'Paris', 40),
+            ('Lyon Hotel', self.hotels, 'Lyon', 200),
+            ('Paris Bar', self.bars, 'Paris', 20),
+            ('Lyon Bar', self.bars, 'Lyon', 30),
+        ):
+            Venue.objects.create(
+                name=name, description='x', category=category, address='1 Road', city=city,
+                country='France', price_range_min=price,
+            )
+
+    def counts(self, response, facet):
+        if facet == 'category':
+            return {item['slug']: item['count'] for item in response.context['facets'][facet]}
+        field = 'value' if facet == 'city' else 'key'
+        return {item[field]: item['count'] for item in response.context['facets'][facet] if item['count']}
+
+    def test_selected_facet_keeps_its_alternatives(self):
+        response = self.client.get(reverse('venues:venue_list'), {'category': 'hotels', 'city': 'Paris'})
+        self.assertEqual(len(response.context['venues']), 1)
+        self.assertEqual(self.counts(response, 'category'), {'hotels': 1, 'bars': 1})
+        self.assertEqual(self.counts(response, 'city'), {'Paris': 1, 'Lyon': 1})
+        self.assertEqual(self.counts(response, 'price'), {'budget': 1})
+
+        response = self.client.get(reverse('venues:venue_list'), {'price': 'budget'})
+        self.assertEqual(self.counts(response, 'price'), {'budget': 3, 'upscale': 1})
+        self.assertEqual(self.counts(response, 'category'), {'hotels': 1, 'bars': 2})
+
+    def test_category_page_counts_other_categories(self):
+        response = self.client.get(reverse('venues:venue_list_by_category', args=['hotels']))
+        self.assertEqual(len(response.context['venues']), 2)
+        self.assertEqual(self.counts(response, 'category'), {'hotels': 2, 'bars': 2})
+        self.assertEqual(self.counts(response, 'city'), {'Paris': 1, 'Lyon': 1})
+
+
+class CategorySearchTests(TestCase):
+    """The category page searches like the main listing"""
+
+    def setUp(self):
+        self.hotels = Category.objects.create(name='Hotels', slug='hotels')
+        self.venue = Venue.objects.create(
+            name='Restaurant Lumière', description='Rooftop garden', category=self.hotels,
+            address='1 Road', city='Paris', country='France',
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('venues:venue_list_by_category', args=['hotels']), {'search': query})
+        return [venue.pk for venue in response.context['venues']], response.context['fuzzy_search']
+
+    def test_search_is_accent_insensitive_and_falls_back_to_close_spellings(self):
+        self.assertEqual(self.search('lumiere'), ([self.venue.pk], False))
+        self.assertEqual(self.search('restuarant'), ([self.venue.pk], True))
+
+    def test_descriptions_are_not_searched(self):
+        self.assertEqual(self.search('garden'), ([], False))
+
+    def test_names_match_inside_words_and_short_words_at_word_starts(self):
+        self.assertEqual(self.search('staura'), ([self.venue.pk], False))
+        self.assertEqual(self.search('lu'), ([self.venue.pk], False))
+        self.assertEqual(self.search('um'), ([], False))
+
+
+class SearchCacheTests(TestCase):
+    """Cached searches are only dropped by changes that can alter results"""
+
+    def setUp(self):
+        search_cache.clear()
+        self.addCleanup(search_cache.clear)
+        self.category = Category.objects.create(name='Hotels', slug='hotels')
+        self.venue = Venue.objects.create(
+            name='Grand Hotel', description='x', category=self.category, address='1 Road',
+            city='Paris', country='France',
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('venues:venue_list'), {'search': query})
+        return [venue.pk for venue in response.context['venues']]
+
+    def test_listing_searches_are_cached_until_a_search_field_changes(self):
+        self.assertEqual(self.search('hotel'), [self.venue.pk])
+        self.assertEqual((search_cache.hits, search_cache.misses), (0, 1))
+
+        venue = Venue.objects.get(pk=self.venue.pk)
+        venue.description = 'Renovated'
+        venue.save()
+        venue.average_rating = 4
+        venue.save(update_fields=['average_rating'])
+        self.assertEqual(self.search('hotel'), [self.venue.pk])
+        self.assertEqual((search_cache.hits, search_cache.misses), (1, 1))
+
+        venue.name = 'Grand Palace'
+        venue.save()
+        self.assertEqual(self.search('hotel'), [])
+        self.assertEqual(search_cache.misses, 2)
+
+    def test_change_log_marks_search_changes(self):
+        venue = Venue.objects.get(pk=self.venue.pk)
+        venue.total_ratings = 3
+        venue.save(update_fields=['total_ratings'])
+        venue.city = 'Lyon'
+        venue.save(update_fields=['city'])
+        venue.is_active = False
+        venue.save()
+        flags = list(ChangeLogEntry.objects.filter(model='venue').values_list('action', 'affects_search'))
+        self.assertEqual(flags, [('create', True), ('update', False), ('update', True), ('update', True)])
+
+    def test_older_versions_do_not_clear_the_cache(self):
+        with mock.patch.object(ChangeLogEntry, 'latest_search_seq', return_value=10):
+            self.search('hotel')
+        with mock.patch.object(ChangeLogEntry, 'latest_search_seq', return_value=9):
+            self.search('hotel')
+        self.assertEqual((search_cache.hits, search_cache.misses), (1, 1))
+
+
+class FuzzySearchTests(TestCase):
+    """Close spellings are ranked among the venues being searched"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Restaurants', slug='restaurants')
+        self.paris, self.lyon = (
+            Venue.objects.create(
+                name=name, description='x', category=category, address='1 Road', city=city, country='France',
+            )
+            for name, city in (('Restuarant Paris', 'Paris'), ('Restaurant Lyon', 'Lyon'))
+        )
+
+    def test_candidates_are_ranked_within_the_queryset(self):
+        self.assertEqual(fuzzy_venue_ids(Venue.objects.all(), 'restuarant', limit=1), [self.paris.pk])
+        self.assertEqual(fuzzy_venue_ids(Venue.objects.filter(city='Lyon'), 'restuarant', limit=1), [self.lyon.pk])
+
+    def test_trigrams_are_rewritten_only_when_name_or_place_changes(self):
+        venue = Venue.objects.get(pk=self.lyon.pk)
+        with mock.patch.object(VenueTrigram, 'sync') as sync:
+            venue.description = 'Bistro'
+            venue.save()
+            sync.assert_not_called()
+            venue.name = 'Brasserie Lyon'
+            venue.save()
+            sync.assert_called_once()
+
+    def test_common_trigrams_cap_the_postings_read(self):
+        for number in range(10):
+            Venue.objects.create(
+                name=f'Restaurant {number}', description='x', category=self.lyon.category, address='1 Road',
+                city='Lyon', country='France',
+            )
+        with mock.patch('venues.fuzzy.FUZZY_SCAN_LIMIT', 3):
+            self.assertEqual(max(trigram_frequencies(trigrams('restaurant')).values()), 3)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(fuzzy_venue_ids(Venue.objects.all(), 'restaurnt')), 3)
+            self.assertIn('LIMIT 3', queries[-1]['sql'])
+            self.assertEqual(fuzzy_venue_ids(Venue.objects.all(), 'restuarant paris', limit=1), [self.paris.pk])
+
+
+class PlaceAdminTests(TestCase):
+    """Places added in the admin get a usable, unique lookup key"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw'))
+        self.france = Country.objects.create(name='France', key='france')
+
+    def add_city(self, name):
+        return self.client.post(reverse('admin:venues_city_add'), {'name': name, 'country': self.france.pk})
+
+    def test_key_is_derived_from_the_name(self):
+        self.assertEqual(self.add_city('  Saint-Étienne ').status_code, 302)
+        city = City.objects.get()
+        self.assertEqual((city.name, city.key), ('Saint-Étienne', 'saint-etienne'))
+
+    def test_names_without_a_key_or_with_a_taken_key_are_rejected(self):
+        City.objects.create(name='Lyon', key='lyon', country=self.france)
+        for name in ('   ', 'LYON', ' lyon '):
+            response = self.add_city(name)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['adminform'].form.errors['name'])
+        response = self.client.post(reverse('admin:venues_country_add'), {'name': ' '})
+        self.assertTrue(response.context['adminform'].form.errors['name'])
+        self.assertEqual(City.objects.count(), 1)
+        self.assertEqual(Country.objects.count(), 1)
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Checkout, return and discard rules of the pooled database backends"""
+
+    def pool(self, healthy=True, **options):
+        opened = []
+
+        def connect():
+            opened.append(FakeConnection(len(opened)))
+            return opened[-1]
+
+        pool = ConnectionPool(connect, lambda connection: healthy, **options)
+        return pool, opened
+
+    def test_returned_connections_are_reused(self):
+        pool, opened = self.pool()
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        pool.release(second)
+        self.assertEqual(len(opened), 2)
+        self.assertEqual(pool.stats.as_dict()['checkouts'], 3)
+
+    def test_checkout_beyond_the_pool_size_times_out(self):
+        pool, opened = self.pool(max_size=1, timeout=0.01)
+        connection = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats.as_dict()['timeouts'], 1)
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+
+    def test_broken_connections_are_discarded(self):
+        pool, opened = self.pool()
+        connection = pool.acquire()
+        connection.closed = True
+        pool.release(connection)
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        pool.release(replacement, discard=True)
+        self.assertTrue(replacement.closed)
+        self.assertEqual(pool.stats.as_dict()['connections_closed'], 2)
+
+    def test_stale_and_unhealthy_connections_are_replaced(self):
+        pool, opened = self.pool(healthy=False, max_idle=60, health_check_interval=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats.as_dict()['health_check_failures'], 1)
+
+        pool, opened = self.pool(max_idle=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.stats.as_dict()['health_check_failures'], 0)
+
+    def test_counters_are_exported_with_the_total_suffix(self):
+        pool, opened = self.pool()
+        pool.release(pool.acquire())
+        with mock.patch('venue_rating_system.metrics.pool_stats', return_value={'default': pool.stats.as_dict()}):
+            text = exposition()
+        self.assertIn('# TYPE db_pool_checkouts_total counter', text)
+        self.assertIn('db_pool_connections_opened_total{alias="default"} 1', text)
+        self.assertIn('# TYPE db_pool_wait_seconds_max gauge', text)
+        self.assertNotRegex(
+            text, r'db_pool_(checkouts|timeouts|connections_opened|connections_closed|health_check_failures)\{'
+        )
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    """Pragmas of the tuned SQLite backend, and which transactions take the write lock"""
+
+    alias = 'sqlite_tuned'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        configured = connections.configure_settings({
+            'default': connections.settings['default'],
+            self.alias: {
+                'ENGINE': 'venue_rating_system.db_backends.sqlite3',
+                'NAME': os.path.join(directory.name, 'tuned.sqlite3'),
+                'PRAGMAS': {'cache_size': -1000},
+            },
+        })
+        connections.settings[self.alias] = configured[self.alias]
+        self.addCleanup(connections.settings.pop, self.alias)
+        self.connection = connections[self.alias]
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -1000)
+
+    def test_only_write_atomic_begins_immediate(self):
+        with CaptureQueriesContext(self.connection) as queries:
+            with transaction.atomic(using=self.alias):
+                self.pragma('user_version')
+            with write_atomic(using=self.alias):
+                with write_atomic(using=self.alias):
+                    pass
+            with transaction.atomic(using=self.alias):
+                pass
+        begins = [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN', 'BEGIN IMMEDIATE', 'BEGIN'])
+        self.assertFalse(self.connection.begin_immediate)
+
+class MetricsTests(TestCase):
+    """The scrape endpoint is gated, and histograms follow the exposition format"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user('scraper-admin', 'admin@example.com', 'pw')
+        self.admin.profile.is_admin = True
+        self.admin.profile.save()
+        self.user = User.objects.create_user('scraper-user', 'user@example.com', 'pw')
+
+    def scrape(self, user=None, token=None):
+        if user:
+            self.client.force_login(user)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token is not None else {}
+        return self.client.get(reverse('metrics'), **headers)
+
+    @override_settings(METRICS_ENABLED=False, METRICS_TOKEN='secret')
+    def test_disabled_metrics_are_not_found(self):
+        self.assertEqual(self.scrape(token='secret').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+    def test_scrapes_need_the_token_or_an_admin(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(token='wrong').status_code, 403)
+        self.assertEqual(self.scrape(self.user).status_code, 403)
+        self.assertEqual(self.scrape(token='secret').status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.scrape(self.admin).status_code, 200)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_an_empty_token_authorizes_nobody(self):
+        self.assertEqual(self.scrape(token='').status_code, 403)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+    def test_requests_are_recorded_per_view(self):
+        self.client.get(reverse('venues:about'))
+        response = self.scrape(token='secret')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertRegex(
+            text,
+            r'http_request_duration_seconds_bucket\{view="venues:about",method="GET",status="200",le="\+Inf"\} [1-9]',
+        )
+        self.assertRegex(text, r'http_request_db_queries_count\{view="venues:about"\} [1-9]')
+
+    def test_buckets_are_cumulative_with_sum_and_count(self):
+        histogram = Histogram('test_seconds', 'Test.', (0.1, 1), ('view',))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'home')
+        histogram.observe(0.2, 'about "x"')
+        self.assertEqual(histogram.exposition(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="about \\"x\\"",le="0.1"} 0',
+            'test_seconds_bucket{view="about \\"x\\"",le="1"} 1',
+            'test_seconds_bucket{view="about \\"x\\"",le="+Inf"} 1',
+            'test_seconds_sum{view="about \\"x\\""} 0.200000',
+            'test_seconds_count{view="about \\"x\\""} 1',
+            'test_seconds_bucket{view="home",le="0.1"} 1',
+            'test_seconds_bucket{view="home",le="1"} 2',
+            'test_seconds_bucket{view="home",le="+Inf"} 3',
+            'test_seconds_sum{view="home"} 5.550000',
+            'test_seconds_count{view="home"} 3',
+        ])
+
+
+class ProfilingTests(TestCase):
+    """Admins can profile a request; everyone else gets the page untouched"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user('profiler', 'profiler@example.com', 'pw')
+        self.admin.profile.is_admin = True
+        self.admin.profile.save()
+        self.user = User.objects.create_user('curious', 'curious@example.com', 'pw')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(PROFILE_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_admins_get_stored_profiles(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('venues:venue_list'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertRegex(response['X-Profile-Summary'], r'^total=[\d.]+ms queries=[1-9]\d* db=[\d.]+ms$')
+        self.assertNotIn('_profile', response.context['request'].GET)
+        queries = json.loads(self.client.get(reverse('profile_file', args=[profile_id, 'sql'])).getvalue())
+        self.assertEqual(queries['path'], reverse('venues:venue_list') + '?_profile=1')
+        self.assertTrue(queries['queries'])
+        pstats_response = self.client.get(reverse('profile_file', args=[profile_id, 'pstats']))
+        self.assertIn('attachment', pstats_response['Content-Disposition'])
+        self.assertEqual(self.client.get(reverse('profile_file', args=['..etc', 'sql'])).status_code, 404)
+
+    def test_report_mode_returns_the_report(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('venues:about'), HTTP_X_PROFILE='report')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertContains(response, f'GET {reverse("venues:about")}')
+        self.assertContains(response, 'function calls')
+
+    def test_other_users_are_not_profiled(self):
+        for user in (None, self.user):
+            if user:
+                self.client.force_login(user)
+            response = self.client.get(reverse('venues:about'), {'_profile': 'report'})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+            self.assertTemplateUsed(response, 'venues/about.html')
+        self.assertEqual(os.listdir(self.directory), [])
+        response = self.client.get(reverse('profile_file', args=['20260101-000000-0123abcd', 'sql']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_sampler_keeps_only_frames_below_the_root(self):
+        def handle_request():
+            root = sys._getframe()
+            sampler = StackSampler(threading.get_ident(), root=root)
+            return nested(sampler)
+
+        def nested(sampler):
+            return sampler.sample()
+
+        self.assertEqual([name.split(' ')[0] for name in handle_request().split(';')], ['nested', 'sample'])
+        # A thread outside the profiled request is not sampled
+        self.assertIsNone(StackSampler(threading.get_ident(), root=object()).sample())
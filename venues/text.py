@@ -0,0 +1,32 @@
+import unicodedata
+
+from django.db.models import Q
+
+
+def fold(value):
+    """Lowercase ``value``, strip accents and collapse whitespace.
+
+    "Café  Zürich" and "cafe zurich" fold to the same string, which is what
+    search keys are compared on.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def clean_place(value):
+    """Trim and collapse the whitespace of a city or country name, keeping its case"""
+    return ' '.join(str(value).split())
+
+
+def prefix_q(field, prefix):
+    """Q object for ``field`` starting with ``prefix``, written as an index range.
+
+    The ``>=``/``<`` bounds let the database walk a plain B-tree index where
+    ``LIKE 'prefix%'`` would scan; ``startswith`` keeps the match exact under
+    collations that do not sort by code point.
+    """
+    if not prefix:
+        return Q()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper, f'{field}__startswith': prefix})
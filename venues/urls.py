@@ -26,6 +26,14 @@ urlpatterns = [
     path('admin-dashboard/add-venue/', views.add_venue, name='add_venue'),
     path('admin-dashboard/edit-venue/<int:venue_id>/', views.edit_venue, name='edit_venue'),
     path('admin-dashboard/delete-venue/<int:venue_id>/', views.delete_venue, name='delete_venue'),
+    path('admin-dashboard/export/<str:dataset>/', views.admin_export, name='admin_export'),
+    path('admin-dashboard/search-cache/', views.admin_search_cache, name='admin_search_cache'),
+    
+    # Change feed
+    path('api/changes/', views.change_feed, name='change_feed'),
+    
+    # Search suggestions
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
     
     # Contact
     path('contact/', views.contact, name='contact'),
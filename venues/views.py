@@ -2,14 +2,65 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Avg, Count
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.urls import reverse
+from urllib.parse import urlencode
 import json
 
-from .models import Venue, Category, Rating, ContactMessage, Statistics, VenueImage
+from .models import Venue, Category, City, Country, Rating, ContactMessage, Statistics, VenueImage, ChangeLogEntry, VenueSlugHistory, VenueTag
 from .forms import VenueForm, ContactForm, RatingForm
+from .exports import EXPORTS, EXPORT_FORMATS, iter_export, parse_since
+from .pagination import EstimatedCountPaginator
+from .tags import parse_tag_filters
+from .facets import venue_facets, normalize_filters, price_band_q, rating_band_q
+from .bitmaps import IndexedVenueList, get_venue_index
+from .autocomplete import database_suggestions, get_venue_autocomplete
+from .fuzzy import name_contains_q, search_with_fallback
+from .searchcache import search_cache
+from .text import fold, prefix_q
+
+
+def _filter_query(request, **replace):
+    """Current filters as a query string, for pagination and facet links"""
+    params = request.GET.copy()
+    params.pop('page', None)
+    for name, value in replace.items():
+        params[name] = value
+    return params.urlencode()
+
+
+def _facet_context(request, facets, categories):
+    """Template context for the facet counts of a venue listing"""
+    counts = {item['slug']: item['count'] for item in facets['category']}
+    for cat in categories:
+        cat.venue_count = counts.get(cat.slug, 0)
+    for city in facets['city']:
+        city['query'] = _filter_query(request, city=city['value'])
+    return {
+        'categories': categories,
+        'facets': facets,
+        'tag_facets': [
+            ('Facilities', facets['facility']),
+            ('Amenities', facets['amenity']),
+            ('Languages', facets['language']),
+        ],
+        'selected_price': request.GET.get('price', ''),
+        'selected_rating': request.GET.get('rating', ''),
+        'filter_query': _filter_query(request),
+    }
+
+
+def _band_filters(request):
+    """The price and rating band filters shared by the listings, as ``{facet: Q}``"""
+    selected = {}
+    for param, band_q in (('price', price_band_q), ('rating', rating_band_q)):
+        q = band_q(request.GET.get(param, ''))
+        if q is not None:
+            selected[param] = q
+    return selected
 
 
 def home(request):
@@ -18,7 +69,7 @@ def home(request):
     stats = Statistics.get_or_create_stats()
     
     # Get featured venues
-    featured_venues = Venue.objects.filter(is_active=True, is_featured=True)[:6]
+    featured_venues = Venue.objects.filter(is_active=True, is_featured=True).select_related('category').prefetch_related('images')[:6]
     
     # Get categories for the search form
     categories = Category.objects.all()
@@ -31,46 +82,130 @@ def home(request):
     return render(request, 'venues/home.html', context)
 
 
+def _place_q(text, country=True):
+    """Venues whose city (or country) name starts with ``text``, ignoring case and accents.
+    
+    The prefix is looked up in the small City and Country tables, so the venue
+    table is only filtered on its indexed foreign keys.
+    """
+    folded = fold(text)
+    if not folded:
+        return Q()
+    q = Q(city_ref__in=City.objects.filter(prefix_q('key', folded)).values('pk'))
+    if country:
+        q |= Q(country_ref__in=Country.objects.filter(prefix_q('key', folded)).values('pk'))
+    return q
+
+
+def _search_q(text):
+    """Accent- and case-insensitive match on name, city and country.
+
+    Descriptions are left out: matching inside them scans every venue row.
+    Names are matched through the trigram index, places by prefix.
+    """
+    folded = fold(text) or text
+    return (
+        name_contains_q(folded) |
+        prefix_q('city_folded', folded) |
+        prefix_q('country_folded', folded)
+    )
+
+
+def _search_listing(venues, facet_venues, search_query, filters):
+    """Search a listing's results, falling back to close spellings.
+
+    ``filters`` is the listing's normalized filter set, which keys the
+    result cache. The venues its facets count get the same search. Returns
+    ``(venues, facet_venues, fuzzy)``; results are ordered by rating, or by
+    relevance when fuzzy.
+    """
+    if not search_query:
+        return venues, facet_venues, False
+    search_q = _search_q(search_query)
+    
+    def run_search():
+        results, fuzzy = search_with_fallback(venues, search_query, search_q)
+        if not fuzzy:
+            results = results.order_by('-average_rating', '-total_ratings')
+        return results, fuzzy
+    
+    results, fuzzy = search_cache.search(
+        search_cache.make_key('list', search_query, filters=json.dumps(filters, sort_keys=True)),
+        run_search,
+        Venue.objects.select_related('category').prefetch_related('images'),
+    )
+    if fuzzy:
+        # Close spellings are capped well below the cached ids, so these are all the matches
+        search_q |= Q(pk__in=results.ids)
+    return results, facet_venues.filter(search_q), fuzzy
+
+
 def venue_list(request):
     """List all venues with filtering and pagination"""
     venues = Venue.objects.filter(is_active=True).select_related('category').prefetch_related('images')
     
-    # Filter by category
+    # Filter by facilities, amenities and languages (all must match)
+    selected_tags = parse_tag_filters(request.GET)
+    venues = VenueTag.filter_venues(venues, selected_tags)
+    
+    # Category, city, price and rating filters; each facet is counted without its own
+    selected = {}
     category_slug = request.GET.get('category')
     if category_slug:
-        venues = venues.filter(category__slug=category_slug)
-    
-    # Filter by city
+        selected['category'] = Q(category__slug=category_slug)
     city = request.GET.get('city')
     if city:
-        venues = venues.filter(city__icontains=city)
+        selected['city'] = _place_q(city, country=False)
+    selected.update(_band_filters(request))
+    facet_venues = venues
+    venues = venues.filter(*selected.values())
     
-    # Filter by search query
     search_query = request.GET.get('search')
-    if search_query:
-        venues = venues.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(city__icontains=search_query) |
-            Q(country__icontains=search_query)
-        )
+    filters = normalize_filters(
+        category=category_slug, city=city, search=search_query,
+        price=request.GET.get('price'), rating=request.GET.get('rating'), tags=selected_tags,
+    )
+    
+    # Filter by search query, falling back to close spellings; searches are
+    # answered from the result cache
+    venues, facet_venues, fuzzy_search = _search_listing(venues, facet_venues, search_query, filters)
+    
+    # Counts for every facet of the current results, cached per filter set
+    facets = venue_facets(facet_venues, filters, selected)
     
     # Order by rating (highest first)
-    venues = venues.order_by('-average_rating', '-total_ratings')
+    if not search_query:
+        venues = venues.order_by('-average_rating', '-total_ratings')
+    
+    categories = list(Category.objects.all())
+    
+    # Plain category and band filters can be answered by the in-memory index
+    index = get_venue_index()
+    if index is not None and not (city or search_query or selected_tags):
+        category_ids = {cat.slug: cat.pk for cat in categories}
+        price = request.GET.get('price')
+        rating = request.GET.get('rating')
+        mask = index.filter(
+            active=True,
+            category=category_ids.get(category_slug, 0) if category_slug else None,
+            price=price if price_band_q(price or '') is not None else None,
+            rating=rating if rating_band_q(rating or '') is not None else None,
+        )
+        venues = IndexedVenueList(index, mask, Venue.objects.select_related('category').prefetch_related('images'))
     
     # Pagination
-    paginator = Paginator(venues, 12)
+    paginator = EstimatedCountPaginator(venues, 12)
     page_number = request.GET.get('page')
     venues = paginator.get_page(page_number)
     
-    categories = Category.objects.all()
-    
     context = {
         'venues': venues,
-        'categories': categories,
         'selected_category': category_slug,
         'search_query': search_query,
+        'fuzzy_search': fuzzy_search,
         'city_filter': city,
+        'selected_tags': [f'{kind}:{key}' for kind, key in selected_tags],
+        **_facet_context(request, facets, categories),
     }
     return render(request, 'venues/venue_list.html', context)
 
@@ -82,32 +217,42 @@ def venue_search(request):
         category = request.GET.get('category', '')
         location = request.GET.get('location', '')
         
-        venues = Venue.objects.filter(is_active=True)
-        
-        if search_query:
-            venues = venues.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(city__icontains=search_query) |
-                Q(country__icontains=search_query)
-            )
-        
-        if category:
-            venues = venues.filter(category__slug=category)
+        def run_search():
+            venues = Venue.objects.filter(is_active=True)
+            
+            if category:
+                venues = venues.filter(category__slug=category)
+            
+            if location:
+                venues = venues.filter(_place_q(location))
+            
+            fuzzy_search = False
+            if search_query:
+                venues, fuzzy_search = search_with_fallback(
+                    venues, search_query, _search_q(search_query)
+                )
+            
+            if not fuzzy_search:
+                venues = venues.order_by('-average_rating', '-total_ratings')
+            return venues, fuzzy_search
         
-        if location:
-            venues = venues.filter(
-                Q(city__icontains=location) |
-                Q(country__icontains=location)
-            )
+        # Popular searches are answered from the ranked id lists in the result cache
+        venues, fuzzy_search = search_cache.search(
+            search_cache.make_key('search', search_query, category, location),
+            run_search,
+            Venue.objects.select_related('category').prefetch_related('images'),
+        )
         
-        venues = venues.order_by('-average_rating', '-total_ratings')
+        paginator = EstimatedCountPaginator(venues, 12)
+        venues = paginator.get_page(request.GET.get('page'))
         
         context = {
             'venues': venues,
             'search_query': search_query,
+            'fuzzy_search': fuzzy_search,
             'category_filter': category,
             'location_filter': location,
+            'filter_query': _filter_query(request),
         }
         return render(request, 'venues/search_results.html', context)
     
@@ -117,42 +262,59 @@ def venue_search(request):
 def venue_list_by_category(request, category_slug):
     """List venues by category"""
     category = get_object_or_404(Category, slug=category_slug)
-    venues = Venue.objects.filter(is_active=True, category=category).select_related('category').prefetch_related('images')
+    venues = Venue.objects.filter(is_active=True).select_related('category').prefetch_related('images')
     
-    # Apply additional filters
+    # Apply additional filters; each facet is counted without its own
+    selected = {'category': Q(category=category)}
     city = request.GET.get('city')
     if city:
-        venues = venues.filter(city__icontains=city)
+        selected['city'] = _place_q(city, country=False)
+    selected.update(_band_filters(request))
+    facet_venues = venues
+    venues = venues.filter(*selected.values())
     
     search_query = request.GET.get('search')
-    if search_query:
-        venues = venues.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+    filters = normalize_filters(
+        category=category.slug, city=city, search=search_query, scope='category',
+        price=request.GET.get('price'), rating=request.GET.get('rating'),
+    )
     
-    venues = venues.order_by('-average_rating', '-total_ratings')
+    # Filter by search query, falling back to close spellings
+    venues, facet_venues, fuzzy_search = _search_listing(venues, facet_venues, search_query, filters)
+    
+    facets = venue_facets(facet_venues, filters, selected)
+    
+    if not search_query:
+        venues = venues.order_by('-average_rating', '-total_ratings')
     
     # Pagination
-    paginator = Paginator(venues, 12)
+    paginator = EstimatedCountPaginator(venues, 12)
     page_number = request.GET.get('page')
     venues = paginator.get_page(page_number)
     
-    categories = Category.objects.all()
+    categories = list(Category.objects.all())
     
     context = {
         'venues': venues,
         'category': category,
-        'categories': categories,
         'search_query': search_query,
+        'fuzzy_search': fuzzy_search,
         'city_filter': city,
+        **_facet_context(request, facets, categories),
     }
     return render(request, 'venues/venue_list.html', context)
 
 
 def venue_detail(request, venue_slug):
     """Detailed view of a venue"""
-    venue = get_object_or_404(Venue, slug=venue_slug, is_active=True)
+    try:
+        venue = Venue.objects.select_related('category').prefetch_related('images').get(slug=venue_slug, is_active=True)
+    except Venue.DoesNotExist:
+        # Old links from before a rename redirect to the canonical page
+        current_slug = VenueSlugHistory.resolve(venue_slug)
+        if current_slug is None:
+            raise Http404('No Venue matches the given query.')
+        return redirect('venues:venue_detail', venue_slug=current_slug, permanent=True)
     
     # Get ratings and reviews
     ratings = venue.ratings.all().select_related('user').order_by('-created_at')
@@ -160,8 +322,8 @@ def venue_detail(request, venue_slug):
     # Get nearby venues (same city, different venue)
     nearby_venues = Venue.objects.filter(
         is_active=True,
-        city=venue.city
-    ).exclude(id=venue.id)[:6]
+        city_ref=venue.city_ref_id
+    ).exclude(id=venue.id).select_related('category').prefetch_related('images')[:6]
     
     # Check if user has already rated this venue
     user_rating = None
@@ -183,7 +345,7 @@ def venue_detail(request, venue_slug):
 @login_required
 def rate_venue(request, venue_slug):
     """Rate a venue"""
-    venue = get_object_or_404(Venue, slug=venue_slug, is_active=True)
+    venue = get_object_or_404(Venue.objects.prefetch_related('images'), slug=venue_slug, is_active=True)
     
     if request.method == 'POST':
         form = RatingForm(request.POST)
@@ -240,7 +402,7 @@ def admin_dashboard(request):
     stats = Statistics.get_or_create_stats()
     
     # Get recent venues
-    recent_venues = Venue.objects.filter(is_active=True).order_by('-created_at')[:5]
+    recent_venues = Venue.objects.filter(is_active=True).select_related('category').order_by('-created_at')[:5]
     
     # Get recent ratings
     recent_ratings = Rating.objects.select_related('venue', 'user').order_by('-created_at')[:5]
@@ -353,7 +515,7 @@ def delete_venue(request, venue_id):
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('venues:home')
     
-    venue = get_object_or_404(Venue, id=venue_id)
+    venue = get_object_or_404(Venue.objects.select_related('category').prefetch_related('images'), id=venue_id)
     
     if request.method == 'POST':
         venue_name = venue.name
@@ -409,17 +571,14 @@ def admin_venues_by_category(request, category_slug):
     category = get_object_or_404(Category, slug=category_slug)
     venues = Venue.objects.filter(category=category).select_related('category').prefetch_related('images')
     
-    # Apply search filter
+    # Apply search filter, falling back to close spellings
     search_query = request.GET.get('search')
+    fuzzy_search = False
     if search_query:
-        venues = venues.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(city__icontains=search_query) |
-            Q(country__icontains=search_query)
-        )
+        venues, fuzzy_search = search_with_fallback(venues, search_query, _search_q(search_query))
     
-    venues = venues.order_by('-created_at')
+    if not fuzzy_search:
+        venues = venues.order_by('-created_at')
     
     # Get statistics for this category
     active_venues = venues.filter(is_active=True)
@@ -487,10 +646,14 @@ def admin_bulk_action(request, category_slug):
     venues = Venue.objects.filter(id__in=venue_ids, category=category)
     
     if action == 'activate':
+        ChangeLogEntry.record_many(Venue, venues.values_list('id', flat=True), 'update', using=venues.db)
         venues.update(is_active=True)
+        Venue.recount_places(venues)
         messages.success(request, f'{venues.count()} venues activated successfully!')
     elif action == 'deactivate':
+        ChangeLogEntry.record_many(Venue, venues.values_list('id', flat=True), 'update', using=venues.db)
         venues.update(is_active=False)
+        Venue.recount_places(venues)
         messages.success(request, f'{venues.count()} venues deactivated successfully!')
     elif action == 'delete':
         count = venues.count()
@@ -499,4 +662,114 @@ def admin_bulk_action(request, category_slug):
     else:
         messages.error(request, 'Invalid action.')
     
-    return redirect('venues:admin_edit_venues', category_slug=category.slug)
\ No newline at end of file
+    return redirect('venues:admin_edit_venues', category_slug=category.slug)
+
+
+@login_required
+def admin_export(request, dataset):
+    """Stream venues or ratings as CSV or NDJSON (admin only)"""
+    if not request.user.is_authenticated or not hasattr(request.user, 'profile') or not request.user.profile.is_admin:
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('venues:home')
+    
+    if dataset not in EXPORTS:
+        raise Http404('Unknown export')
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unsupported format "{export_format}"'}, status=400)
+    
+    try:
+        since = parse_since(request.GET.get('since'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    filename = f'{dataset}.{export_format}'
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    
+    response = StreamingHttpResponse(
+        iter_export(
+            dataset,
+            export_format=export_format,
+            compress=compress,
+            category=request.GET.get('category'),
+            city=request.GET.get('city'),
+            since=since,
+        ),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def change_feed(request):
+    """Page through catalogue changes after a cursor (admin only)"""
+    if not request.user.is_authenticated or not hasattr(request.user, 'profile') or not request.user.profile.is_admin:
+        return JsonResponse({'error': 'You do not have permission to access this page.'}, status=403)
+    
+    try:
+        cursor = int(request.GET.get('since', 0))
+        limit = min(max(int(request.GET.get('limit', 1000)), 1), 10000)
+    except ValueError:
+        return JsonResponse({'error': 'since and limit must be integers'}, status=400)
+    
+    # Entries after next_cursor may be sent again once an earlier gap settles
+    entries, has_more, next_cursor = ChangeLogEntry.changes_since(cursor, limit)
+    
+    return JsonResponse({
+        'changes': [
+            {
+                'seq': entry.seq,
+                'model': entry.model,
+                'object_id': entry.object_id,
+                'action': entry.action,
+                'created_at': entry.created_at.isoformat(),
+            }
+            for entry in entries
+        ],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    })
+
+
+def admin_search_cache(request):
+    """Search result cache size and hit ratios, overall and per query (admin only)"""
+    if not request.user.is_authenticated or not hasattr(request.user, 'profile') or not request.user.profile.is_admin:
+        return JsonResponse({'error': 'You do not have permission to access this page.'}, status=403)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    return JsonResponse(search_cache.stats(limit))
+
+
+@cache_control(max_age=60)
+def autocomplete(request):
+    """Typeahead suggestions for venue names, cities and categories"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    
+    suggestions = []
+    if query:
+        index = get_venue_autocomplete()
+        suggestions = index.search(query, limit) if index else database_suggestions(query, limit)
+    results = []
+    for kind, label, value in suggestions:
+        if kind == 'venue':
+            url = reverse('venues:venue_detail', args=[value])
+        elif kind == 'category':
+            url = reverse('venues:venue_list_by_category', args=[value])
+        else:
+            url = reverse('venues:venue_list') + '?' + urlencode({'city': value})
+        results.append({'type': kind, 'label': label, 'url': url})
+    
+    return JsonResponse({'query': query, 'results': results})